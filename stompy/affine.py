@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+ndarray based 2d (3x3) and 3d (4x4) homogeneous transforms
+
+Builders are closed form (no intermediate matrices are multiplied) and
+accept an optional out array to fill in place. Single point transforms
+read the matrix once and do the math in python floats to avoid allocating
+temporary arrays.
+
+transforms.py wraps these to provide the older numpy.matrix functions.
+"""
+
+import math
+
+import numpy
+
+
+def _fill(values, out):
+    if out is None:
+        return numpy.array(values, dtype='f8')
+    out[:] = values
+    return out
+
+
+def multiply(a, b, out=None):
+    """Compose transforms a and b (b is applied first)"""
+    return numpy.dot(a, b, out=out)
+
+
+def matrix_power(m, n):
+    """Apply transform m n times (by repeated squaring, O(log n))"""
+    return numpy.linalg.matrix_power(numpy.asarray(m, dtype='f8'), n)
+
+
+def matrix_powers(m, n):
+    """Returns [n, d, d] stack of m ** 1 ... m ** n
+
+    The stack is built by doubling (one batched multiply per doubling)
+    rather than n sequential multiplies.
+    """
+    m = numpy.asarray(m, dtype='f8')
+    powers = numpy.empty((n, ) + m.shape)
+    if n == 0:
+        return powers
+    powers[0] = m
+    k = 1
+    while k < n:
+        # powers[k:2k] = powers[:k] * m ** k
+        j = min(k, n - k)
+        numpy.matmul(powers[:j], powers[k - 1], out=powers[k:k + j])
+        k += j
+    return powers
+
+
+def translation_2d(x, y, out=None):
+    return _fill(
+        ((1., 0., x), (0., 1., y), (0., 0., 1.)), out)
+
+
+def rotation_2d(a, degrees=False, out=None):
+    if degrees:
+        a = math.radians(a)
+    sa = math.sin(a)
+    ca = math.cos(a)
+    return _fill(
+        ((ca, -sa, 0.), (sa, ca, 0.), (0., 0., 1.)), out)
+
+
+def affine_2d(x, y, a, degrees=False, out=None):
+    """Applied as rotation then translation"""
+    if degrees:
+        a = math.radians(a)
+    sa = math.sin(a)
+    ca = math.cos(a)
+    return _fill(
+        ((ca, -sa, x), (sa, ca, y), (0., 0., 1.)), out)
+
+
+def rotation_about_point_2d(x, y, a, degrees=False, out=None):
+    if degrees:
+        a = math.radians(a)
+    sa = math.sin(a)
+    ca = math.cos(a)
+    return _fill((
+        (ca, -sa, x - ca * x + sa * y),
+        (sa, ca, y - sa * x - ca * y),
+        (0., 0., 1.)), out)
+
+
+def transform_2d(m, x, y):
+    (m00, m01, m02), (m10, m11, m12) = numpy.asarray(m)[:2].tolist()
+    return (
+        m00 * x + m01 * y + m02,
+        m10 * x + m11 * y + m12)
+
+
+def transform_2d_array(m, pts, out=None):
+    """Expects pts of [npts, 2], returns [npts, 2]"""
+    m = numpy.asarray(m)
+    pts = numpy.asarray(pts, dtype='f8')
+    out = numpy.dot(pts, m[:2, :2].T, out=out)
+    out += m[:2, 2]
+    return out
+
+
+def translation_3d(x, y, z, out=None):
+    return _fill((
+        (1., 0., 0., x),
+        (0., 1., 0., y),
+        (0., 0., 1., z),
+        (0., 0., 0., 1.)), out)
+
+
+def _rotation_3d(xa, ya, za, degrees):
+    # rows of rz * ry * rx
+    if degrees:
+        xa = math.radians(xa)
+        ya = math.radians(ya)
+        za = math.radians(za)
+    sx = math.sin(xa)
+    cx = math.cos(xa)
+    sy = math.sin(ya)
+    cy = math.cos(ya)
+    sz = math.sin(za)
+    cz = math.cos(za)
+    return (
+        (cz * cy, cz * sy * sx - sz * cx, cz * sy * cx + sz * sx),
+        (sz * cy, sz * sy * sx + cz * cx, sz * sy * cx - cz * sx),
+        (-sy, cy * sx, cy * cx))
+
+
+def rotation_3d(xa, ya, za, degrees=False, out=None):
+    """Applied as x, y, z"""
+    r0, r1, r2 = _rotation_3d(xa, ya, za, degrees)
+    return _fill((
+        r0 + (0., ), r1 + (0., ), r2 + (0., ),
+        (0., 0., 0., 1.)), out)
+
+
+def affine_3d(x, y, z, xa, ya, za, degrees=False, out=None):
+    """Applied as rotation then translation"""
+    r0, r1, r2 = _rotation_3d(xa, ya, za, degrees)
+    return _fill((
+        r0 + (x, ), r1 + (y, ), r2 + (z, ),
+        (0., 0., 0., 1.)), out)
+
+
+def rotation_about_point_3d(x, y, z, xa, ya, za, degrees=False, out=None):
+    r0, r1, r2 = _rotation_3d(xa, ya, za, degrees)
+    # translation = p - R * p
+    return _fill((
+        r0 + (x - r0[0] * x - r0[1] * y - r0[2] * z, ),
+        r1 + (y - r1[0] * x - r1[1] * y - r1[2] * z, ),
+        r2 + (z - r2[0] * x - r2[1] * y - r2[2] * z, ),
+        (0., 0., 0., 1.)), out)
+
+
+def transform_3d(m, x, y, z):
+    (
+        (m00, m01, m02, m03),
+        (m10, m11, m12, m13),
+        (m20, m21, m22, m23)) = numpy.asarray(m)[:3].tolist()
+    return (
+        m00 * x + m01 * y + m02 * z + m03,
+        m10 * x + m11 * y + m12 * z + m13,
+        m20 * x + m21 * y + m22 * z + m23)
+
+
+def transform_3d_array(m, pts, out=None):
+    """Expects pts of [npts, 3], returns [npts, 3]"""
+    m = numpy.asarray(m)
+    pts = numpy.asarray(pts, dtype='f8')
+    out = numpy.dot(pts, m[:3, :3].T, out=out)
+    out += m[:3, 3]
+    return out
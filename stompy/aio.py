@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+asyncio transport for comando devices (leg and body teensies, joystick)
+
+Instead of polling handle_stream from update, the serial port of each
+device is registered with the event loop (loop.add_reader) and read only
+when data is available. Setting device.poll_io to False keeps update for
+everything else (heartbeats, joystick reporting). As tornado (>= 5) runs
+on the asyncio loop, this shares the loop used by remote.serve.
+
+Requests are pipelined: each request sends a command immediately
+and returns a future that is resolved with the reply arguments.
+Replies are matched to requests by command name in the order sent.
+Replies that arrive with no request outstanding are passed to the callback
+that was registered before (so blocking_trigger and reports still work)
+and stop restores the previous callbacks.
+
+The transport is the device's transport attribute while started:
+
+    aio.attach(controller, loop)
+    config = await controller.legs[1].transport.pid_joint_config('hip')
+"""
+
+import asyncio
+import collections
+import time
+import traceback
+
+from . import consts
+from .leg import teensy
+
+
+class Transport(object):
+    def __init__(self, device, loop=None):
+        if getattr(device, 'threaded', False):
+            raise ValueError(
+                "Device %s is already read by a thread" % (device, ))
+        if loop is None:
+            # raises RuntimeError if not called from a running loop
+            loop = asyncio.get_running_loop()
+        self.device = device
+        self.loop = loop
+        self.error = None
+        self._fd = device._serial.fileno()
+        self._pending = {}
+        # {callback index: callback replaced by request}
+        self._replaced = {}
+        # link stats of legs (see leg.link)
+        self._link = getattr(device, 'link', None)
+
+    def start(self):
+        self.device.poll_io = False
+        self.device.transport = self
+        self.loop.add_reader(self._fd, self._on_readable)
+
+    def stop(self):
+        self.loop.remove_reader(self._fd)
+        self.device.poll_io = True
+        self.device.transport = None
+        # restore replaced callbacks
+        callbacks = self.device.cmd.callbacks
+        for (i, cb) in self._replaced.items():
+            if cb is None:
+                callbacks.pop(i, None)
+            else:
+                callbacks[i] = cb
+        self._replaced = {}
+        for q in self._pending.values():
+            while len(q):
+                q.popleft().cancel()
+        self._pending = {}
+
+    def _on_readable(self):
+        try:
+            t0 = time.monotonic()
+            self.device.com.handle_stream()
+            if self._link is not None:
+                self._link.decode(time.monotonic() - t0)
+        except Exception as e:
+            # stop reading and fail all outstanding requests
+            self.loop.remove_reader(self._fd)
+            self.error = e
+            if self._link is not None:
+                self._link.error()
+            log = getattr(self.device, 'log', None)
+            if log is not None:
+                log.error({'error': {
+                    'traceback': traceback.format_exc(),
+                    'exception': e}})
+            for q in self._pending.values():
+                while len(q):
+                    f = q.popleft()
+                    if not f.done():
+                        f.set_exception(e)
+
+    def _on_reply(self, name, *args):
+        q = self._pending[name]
+        if not len(q):
+            # unrequested reply
+            return
+        f = q.popleft()
+        if not f.done():
+            f.set_result(args)
+
+    def _register(self, name):
+        """Handle replies to name, chaining to the previous callback"""
+        q = self._pending[name] = collections.deque()
+        callbacks = self.device.cmd.callbacks
+        before = dict(callbacks)
+        self.device.mgr.on(name, lambda *a: self._on_reply(name, *a))
+        for i in list(callbacks):
+            cb = callbacks[i]
+            prev = before.get(i)
+            if cb is prev:
+                continue
+            self._replaced[i] = prev
+
+            def chain(*args, cb=cb, prev=prev):
+                if len(q) or prev is None:
+                    return cb(*args)
+                return prev(*args)
+            callbacks[i] = chain
+
+    def request(self, name, *args):
+        """Send command name, returns future of the reply arguments"""
+        if self.error is not None:
+            raise self.error
+        if name not in self._pending:
+            self._register(name)
+        f = self.loop.create_future()
+        self._pending[name].append(f)
+        self.device.mgr.trigger(name, *args)
+        return f
+
+
+class LegTransport(Transport):
+    async def pid_joint_config(self, joint_index):
+        """Read joint config with all requests in flight at once"""
+        if joint_index in consts.JOINT_INDEX_BY_NAME:
+            joint_index = consts.JOINT_INDEX_BY_NAME[joint_index]
+        if joint_index not in consts.JOINT_NAME_BY_INDEX:
+            return {}
+        replies = await asyncio.gather(*[
+            self.request(*r)
+            for r in teensy.joint_config_requests(joint_index)])
+        return teensy.joint_config_from_replies(*replies)
+
+
+def attach(controller, loop=None):
+    """Start transports for all serial devices of a controller
+
+    loop: event loop to read from, required if not called from a
+    running loop
+
+    Returns dict of {leg_number: LegTransport, body name: Transport,
+    'joystick': Transport} for each device with a serial port
+    """
+    transports = {}
+    for ln in controller.legs:
+        if hasattr(controller.legs[ln], '_serial'):
+            transports[ln] = LegTransport(controller.legs[ln], loop)
+    for n in controller.bodies:
+        if hasattr(controller.bodies[n], '_serial'):
+            transports[n] = Transport(controller.bodies[n], loop)
+    if hasattr(controller.joy, '_serial'):
+        transports['joystick'] = Transport(controller.joy, loop)
+    for k in transports:
+        transports[k].start()
+    return transports
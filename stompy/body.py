@@ -109,13 +109,24 @@ class FakeIMU(BodyController):
 class TeensyBody(BodyController):
     def __init__(self, port):
         self.port = port
+        # if False, update does not read the port (see aio)
+        self.poll_io = True
+        # aio.Transport while attached
+        self.transport = None
+        # if False, update does not send heartbeats (see heartbeat)
+        self.auto_heartbeat = True
+        # seconds spent in each stage of connecting
+        self.connect_times = {}
+        t = time.monotonic()
         self._serial = serial.Serial(self.port, 9600)
+        t = self._time_stage('open', t)
         # set rising edge of RTS to reset comando
         self._serial.setRTS(0)
         self._serial.flushInput()
         self._serial.flushOutput()
         self._serial.setRTS(1)
         time.sleep(0.1)
+        t = self._time_stage('reset', t)
         self.com = pycomando.Comando(self._serial)
         self.cmd = pycomando.protocols.command.CommandProtocol()
         self.com.register_protocol(0, self.cmd)
@@ -124,6 +135,7 @@ class TeensyBody(BodyController):
         self._text = pycomando.protocols.text.TextProtocol()
 
         self.name = names[mgr.blocking_trigger('name')[0].value]
+        t = self._time_stage('name', t)
         super(TeensyBody, self).__init__(self.name)
 
         self._last_hb = time.time()
@@ -162,6 +174,17 @@ class TeensyBody(BodyController):
 
         self.mgr.on('heading', self._on_heading)
         self.mgr.trigger('heading', 500)
+        t = self._time_stage('reports', t)
+        self.connect_times['total'] = sum(self.connect_times.values())
+
+    def _time_stage(self, stage, t0):
+        t = time.monotonic()
+        self.connect_times[stage] = t - t0
+        return t
+
+    def close(self):
+        self._serial.close()
+        self._closed = True
 
     def _on_heading(self, roll, pitch, yaw):
         # roll + is to the right
@@ -174,7 +197,7 @@ class TeensyBody(BodyController):
         self.trigger('heading', r, p, y)
 
     def __del__(self):
-        if not hasattr(self, 'name'):
+        if not hasattr(self, 'name') or getattr(self, '_closed', False):
             return
         # disable reports
         r = reports.get(self.name, {})
@@ -182,12 +205,16 @@ class TeensyBody(BodyController):
         for k in r:
             self.mgr.trigger(k, 0)
 
+    def send_heartbeat(self):
+        self.mgr.trigger('heartbeat')
+        self._last_hb = time.time()
+
     def update(self):
         # heartbeat
-        t = time.time()
-        if (t - self._last_hb > 0.5):
-            self.mgr.trigger('heartbeat')
-            self._last_hb = t
+        if self.auto_heartbeat and (time.time() - self._last_hb > 0.5):
+            self.send_heartbeat()
+        if not self.poll_io:
+            return
         try:
             self.com.handle_stream()
         except Exception as e:
@@ -200,7 +227,13 @@ class TeensyBody(BodyController):
             raise e
 
 
-def connect_to_teensies(ports=None):
+def connect_to_teensies(ports=None, timeout=30.0):
+    """Return dict with {name: teensy body}
+
+    Teensies are connected in parallel, ports that fail to connect
+    (serial errors or take longer than timeout seconds) are reported
+    and skipped, other errors are raised.
+    """
     if ports is None:
         #tinfo = utils.find_body_teensies()
         #ports = [i['port'] for i in tinfo]
@@ -214,7 +247,17 @@ def connect_to_teensies(ports=None):
         #return {n: BodyController(n) for n in [names[0]]}
         return {}
         #raise NotImplementedError
-    teensies = [TeensyBody(p) for p in ports]
+    connected, errors = utils.connect_in_parallel(
+        TeensyBody, ports, timeout, close=lambda t: t.close())
+    for p in errors:
+        print("Failed to connect to body teensy on %s: %s" % (p, errors[p]))
+        logger.error("Failed to connect to %s: %s" % (p, errors[p]))
+    teensies = [connected[p] for p in ports if p in connected]
+    for t in teensies:
+        print("Body %s [%s] connect times: %s" % (
+            t.name, t.port, ', '.join([
+                '%s=%.3f' % (k, t.connect_times[k])
+                for k in sorted(t.connect_times)])))
     nd = {}
     for t in teensies:
         n = t.name
@@ -221,8 +221,11 @@ class CalfCalibrator(object):
         self.slope = slope.value
         self.offset = offset.value
 
-    def attach_manager(self, mgr):
-        mgr.on('calf_scale', self.on_calf_scale)
+    def attach_manager(self, mgr, on=None):
+        """on: function used to register callbacks (default mgr.on)"""
+        if on is None:
+            on = mgr.on
+        on('calf_scale', self.on_calf_scale)
         mgr.trigger('calf_scale')
 
     def compute_slope(self):
@@ -94,6 +94,9 @@ PLAN_FRAMES_BY_NAME = {
     PLAN_FRAMES_BY_NUMBER[k]: k for
     k in PLAN_FRAMES_BY_NUMBER}
 
+# seconds, plans sent to a leg within this window are merged
+PLAN_SEND_WINDOW = 0.02
+
 HIP_JOINT_INDEX = 0
 THIGH_JOINT_INDEX = 1
 KNEE_JOINT_INDEX = 2
@@ -26,6 +26,7 @@ import numpy
 
 from . import body
 from . import consts
+from . import heartbeat
 from . import joystick
 from . import kinematics
 from . import leg
@@ -81,6 +82,8 @@ class MultiLeg(signaler.Signaler):
         self.param = param.Param()
         self.legs = legs
         self.bodies = bodies
+        # HeartbeatService if heartbeats are sent from a thread
+        self.heartbeat = None
         self.stance = statics.Stance(legs)
         self.res = restriction.body.Body(legs, self.param)
         if all([isinstance(legs[ln], leg.teensy.FakeTeensy) for ln in legs]):
@@ -316,6 +319,10 @@ class MultiLeg(signaler.Signaler):
             if self._fake_legs:
                 self.playback = playback.make_leg_wiggle_playback()
 
+    def link_report(self):
+        """Returns {leg_number: link stats} (see leg.link)"""
+        return {ln: self.legs[ln].link_report() for ln in self.legs}
+
     def all_legs(self, cmd, *args, **kwargs):
         log.info({"all_legs": (cmd, args, kwargs)})
         for leg in self.legs:
@@ -645,6 +652,8 @@ class MultiLeg(signaler.Signaler):
                 restriction.body.BodyTarget((crx, cry), rs, dz))
 
     def update(self):
+        if self.heartbeat is not None:
+            self.heartbeat.feed()
         self.joy.update()
         self.all_legs('update')
         if self.mode == 'playback' and self.playback is not None:
@@ -688,7 +697,7 @@ class MultiLeg(signaler.Signaler):
         [self.bodies[k].update() for k in self.bodies]
 
 
-def build():
+def build(threaded_io=False, telemetry_mode=False, heartbeat_thread=False):
     #if joystick.ps3.available():
     #    joy = joystick.ps3.PS3Joystick()
     #elif joystick.steel.available():
@@ -696,7 +705,8 @@ def build():
     #else:
     #    joy = joystick.fake.FakeJoystick()
 
-    legs = leg.teensy.connect_to_teensies()
+    legs = leg.teensy.connect_to_teensies(
+        threaded=threaded_io, telemetry_mode=telemetry_mode)
 
     if len(legs) == 0:
         raise IOError("No teensies found")
@@ -707,7 +717,10 @@ def build():
     bodies = body.connect_to_teensies()
     #print("Connected to bodies: %s" % (sorted(bodies.keys())))
 
-    return MultiLeg(legs, bodies)
+    c = MultiLeg(legs, bodies)
+    if heartbeat_thread:
+        c.heartbeat = heartbeat.attach(c)
+    return c
 
 
 def run(controller=None):
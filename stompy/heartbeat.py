@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Heartbeats sent from a timer thread
+
+Teensies estop if they go consts.HEARTBEAT_TIMEOUT without a heartbeat.
+Sent from update, a slow main loop iteration (ui repaint, log flush)
+can trip this. HeartbeatService sends heartbeats to all devices
+(anything with send_heartbeat, legs and bodies, the joystick has no
+heartbeat) every period from its own thread and records how late each
+round was (jitter).
+
+Heartbeats are also the watchdog for the control loop, so they stop
+if the main loop hasn't called feed for stall_timeout seconds
+(so a hung or crashed program still estops the legs). This trades
+tolerating slow iterations against how long a hung loop keeps the legs
+moving: stall_timeout defaults to (and can't exceed)
+consts.HEARTBEAT_TIMEOUT so iterations up to stall_timeout keep
+heartbeats going (longer ones estop the legs if they last another
+HEARTBEAT_TIMEOUT) and a hung loop estops the legs at most
+stall_timeout + HEARTBEAT_TIMEOUT after its last iteration.
+
+    c.heartbeat = heartbeat.attach(c)
+    ...
+    c.heartbeat.feed()  # from the main loop (MultiLeg.update does this)
+"""
+
+import threading
+import time
+import traceback
+
+from . import consts
+from . import log
+from . import utils
+
+
+# jitter histogram bin edges (seconds late)
+jitter_edges = [0.001, 0.005, 0.01, 0.05, 0.1, 0.25]
+
+
+class HeartbeatService(object):
+    def __init__(self, devices, period=None, stall_timeout=None):
+        if period is None:
+            period = consts.HEARTBEAT_PERIOD
+        if stall_timeout is None:
+            stall_timeout = consts.HEARTBEAT_TIMEOUT
+        if stall_timeout > consts.HEARTBEAT_TIMEOUT:
+            raise ValueError(
+                "stall_timeout[%s] must be <= HEARTBEAT_TIMEOUT[%s]" % (
+                    stall_timeout, consts.HEARTBEAT_TIMEOUT))
+        self.devices = list(devices)
+        self.period = period
+        self.stall_timeout = stall_timeout
+        self.jitter = utils.Histogram(jitter_edges)
+        self.n_sent = 0
+        self.n_stalled = 0
+        self._last_feed = time.monotonic()
+        # held while updating or reporting stats
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def feed(self, t=None):
+        """Called from the main loop to show it is still running"""
+        if t is None:
+            t = time.monotonic()
+        self._last_feed = t
+
+    def start(self):
+        if self._thread is not None:
+            return
+        for d in self.devices:
+            # don't send heartbeats from update
+            d.auto_heartbeat = False
+        self.feed()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        for d in self.devices:
+            d.auto_heartbeat = True
+
+    def _run(self):
+        next_t = time.monotonic()
+        while True:
+            t = time.monotonic()
+            if t < next_t and self._stop.wait(next_t - t):
+                return
+            if self._stop.is_set():
+                return
+            next_t = self._round(time.monotonic(), next_t)
+
+    def _round(self, t, next_t):
+        """Send heartbeats (unless stalled) at t for the round at next_t
+
+        Returns the time of the next round
+        """
+        with self._lock:
+            self.jitter.update(t - next_t)
+        # schedule from the ideal time, skip missed rounds
+        next_t += self.period
+        if next_t < t:
+            next_t = t + self.period
+        if t - self._last_feed > self.stall_timeout:
+            with self._lock:
+                self.n_stalled += 1
+        else:
+            self.send_all()
+        return next_t
+
+    def send_all(self):
+        for d in self.devices:
+            try:
+                d.send_heartbeat()
+                with self._lock:
+                    self.n_sent += 1
+            except Exception as e:
+                log.error({'heartbeat_error': {
+                    'device': repr(d),
+                    'traceback': traceback.format_exc(),
+                    'exception': e}})
+
+    def report(self):
+        with self._lock:
+            return {
+                'sent': self.n_sent, 'stalled': self.n_stalled,
+                'jitter': self.jitter.as_dict()}
+
+
+def attach(controller, period=None, stall_timeout=None):
+    """Start a HeartbeatService for the legs and bodies of a controller"""
+    devices = [
+        d for d in (
+            list(controller.legs.values()) +
+            list(controller.bodies.values()))
+        if hasattr(d, 'send_heartbeat')]
+    s = HeartbeatService(devices, period, stall_timeout)
+    s.start()
+    return s
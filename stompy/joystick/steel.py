@@ -86,7 +86,12 @@ class SteelJoystick(base.Joystick):
                 raise IOError("Didn't find custom joystick: %s" % (ts, ))
             port = ts[0]['port']
         self.port = port
-        self.com = pycomando.Comando(serial.Serial(self.port, 9600))
+        # if False, update does not read the port (see aio)
+        self.poll_io = True
+        # aio.Transport while attached
+        self.transport = None
+        self._serial = serial.Serial(self.port, 9600)
+        self.com = pycomando.Comando(self._serial)
         self.cmd = pycomando.protocols.command.CommandProtocol()
         self.com.register_protocol(0, self.cmd)
         #self.text = pycomando.protocols.TextProtocol()
@@ -110,5 +115,6 @@ class SteelJoystick(base.Joystick):
         self.mgr.trigger('led', index, value)
 
     def update(self):
-        self.com.handle_stream()
+        if self.poll_io:
+            self.com.handle_stream()
         super(SteelJoystick, self).update()
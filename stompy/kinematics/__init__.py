@@ -2,5 +2,7 @@
 
 from . import body
 from . import leg
+from . import reachability
+from . import tables
 
-__all__ = ['body', 'leg']
+__all__ = ['body', 'leg', 'reachability', 'tables']
@@ -9,8 +9,8 @@ left is y+, right is y-
 import numpy
 #import pylab
 
+from .. import affine
 from .. import consts
-from .. import transforms
 
 
 # rotations
@@ -44,30 +44,30 @@ RRT = (23, -92.6)
 #RRT = (-92.6, -23)
 
 leg_to_body_transforms = {
-    consts.LEG_FL: transforms.affine_3d(
+    consts.LEG_FL: affine.affine_3d(
         FLT[0], FLT[1], 0, 0, 0, FLR, degrees=True),
-    consts.LEG_FR: transforms.affine_3d(
+    consts.LEG_FR: affine.affine_3d(
         FRT[0], FRT[1], 0, 0, 0, FRR, degrees=True),
-    consts.LEG_ML: transforms.affine_3d(
+    consts.LEG_ML: affine.affine_3d(
         MLT[0], MLT[1], 0, 0, 0, MLR, degrees=True),
-    consts.LEG_MR: transforms.affine_3d(
+    consts.LEG_MR: affine.affine_3d(
         MRT[0], MRT[1], 0, 0, 0, MRR, degrees=True),
-    consts.LEG_RL: transforms.affine_3d(
+    consts.LEG_RL: affine.affine_3d(
         RLT[0], RLT[1], 0, 0, 0, RLR, degrees=True),
-    consts.LEG_RR: transforms.affine_3d(
+    consts.LEG_RR: affine.affine_3d(
         RRT[0], RRT[1], 0, 0, 0, RRR, degrees=True),
-    consts.LEG_FAKE: transforms.affine_3d(
+    consts.LEG_FAKE: affine.affine_3d(
         MRT[0], MRT[1], 0, 0, 0, MRR, degrees=True),
 }
 
 leg_to_body_rotations = {
-    consts.LEG_FL: transforms.rotation_3d(0, 0, FLR, degrees=True),
-    consts.LEG_FR: transforms.rotation_3d(0, 0, FRR, degrees=True),
-    consts.LEG_ML: transforms.rotation_3d(0, 0, MLR, degrees=True),
-    consts.LEG_MR: transforms.rotation_3d(0, 0, MRR, degrees=True),
-    consts.LEG_RL: transforms.rotation_3d(0, 0, RLR, degrees=True),
-    consts.LEG_RR: transforms.rotation_3d(0, 0, RRR, degrees=True),
-    consts.LEG_FAKE: transforms.rotation_3d(0, 0, MRR, degrees=True),
+    consts.LEG_FL: affine.rotation_3d(0, 0, FLR, degrees=True),
+    consts.LEG_FR: affine.rotation_3d(0, 0, FRR, degrees=True),
+    consts.LEG_ML: affine.rotation_3d(0, 0, MLR, degrees=True),
+    consts.LEG_MR: affine.rotation_3d(0, 0, MRR, degrees=True),
+    consts.LEG_RL: affine.rotation_3d(0, 0, RLR, degrees=True),
+    consts.LEG_RR: affine.rotation_3d(0, 0, RRR, degrees=True),
+    consts.LEG_FAKE: affine.rotation_3d(0, 0, MRR, degrees=True),
 }
 
 
@@ -79,41 +79,83 @@ body_to_leg_rotations = {
     k: numpy.linalg.inv(leg_to_body_rotations[k]) for k in
     leg_to_body_rotations}
 
+# all transforms stacked as [nlegs, 4, 4] in leg number order
+leg_numbers = tuple(sorted(leg_to_body_transforms))
+_leg_indices = {k: i for (i, k) in enumerate(leg_numbers)}
+
+leg_to_body_stack = numpy.array(
+    [leg_to_body_transforms[k] for k in leg_numbers])
+leg_to_body_rotation_stack = numpy.array(
+    [leg_to_body_rotations[k] for k in leg_numbers])
+body_to_leg_stack = numpy.array(
+    [body_to_leg_transforms[k] for k in leg_numbers])
+body_to_leg_rotation_stack = numpy.array(
+    [body_to_leg_rotations[k] for k in leg_numbers])
+
+
+def _transform_all(stack, pts, legs):
+    """Transform one point per leg, pts can be [3] or [nlegs, 3]"""
+    if legs is not None:
+        stack = stack[[_leg_indices[k] for k in legs]]
+    pts = numpy.broadcast_to(
+        numpy.asarray(pts, dtype='f8'), (len(stack), 3))
+    return (
+        numpy.einsum('lij,lj->li', stack[:, :3, :3], pts) +
+        stack[:, :3, 3])
+
 
 def leg_to_body(leg, x, y, z):
-    r = transforms.transform_3d(leg_to_body_transforms[leg], x, y, z)
+    r = affine.transform_3d(leg_to_body_transforms[leg], x, y, z)
     return r[0], r[1], r[2]
 
 
 def leg_to_body_rotation(leg, x, y, z):
-    r = transforms.transform_3d(leg_to_body_rotations[leg], x, y, z)
+    r = affine.transform_3d(leg_to_body_rotations[leg], x, y, z)
     return r[0], r[1], r[2]
 
 
 def leg_to_body_array(leg, pts):
-    return transforms.transform_3d_array(leg_to_body_transforms[leg], pts)
+    return affine.transform_3d_array(leg_to_body_transforms[leg], pts)
 
 
 def leg_to_body_rotation_array(leg, pts):
-    return transforms.transform_3d_array(leg_to_body_rotations[leg], pts)
+    return affine.transform_3d_array(leg_to_body_rotations[leg], pts)
 
 
 def body_to_leg(leg, x, y, z):
-    r = transforms.transform_3d(body_to_leg_transforms[leg], x, y, z)
+    r = affine.transform_3d(body_to_leg_transforms[leg], x, y, z)
     return r[0], r[1], r[2]
 
 
 def body_to_leg_array(leg, pts):
-    return transforms.transform_3d_array(body_to_leg_transforms[leg], pts)
+    return affine.transform_3d_array(body_to_leg_transforms[leg], pts)
 
 
 def body_to_leg_rotation(leg, x, y, z):
-    r = transforms.transform_3d(body_to_leg_rotations[leg], x, y, z)
+    r = affine.transform_3d(body_to_leg_rotations[leg], x, y, z)
     return r[0], r[1], r[2]
 
 
 def body_to_leg_rotation_array(leg, pts):
-    return transforms.transform_3d_array(body_to_leg_rotations[leg], pts)
+    return affine.transform_3d_array(body_to_leg_rotations[leg], pts)
+
+
+def leg_to_body_all(pts, legs=None):
+    """Returns [nlegs, 3] for legs (default leg_numbers)"""
+    return _transform_all(leg_to_body_stack, pts, legs)
+
+
+def leg_to_body_rotation_all(pts, legs=None):
+    return _transform_all(leg_to_body_rotation_stack, pts, legs)
+
+
+def body_to_leg_all(pts, legs=None):
+    """Returns [nlegs, 3] for legs (default leg_numbers)"""
+    return _transform_all(body_to_leg_stack, pts, legs)
+
+
+def body_to_leg_rotation_all(pts, legs=None):
+    return _transform_all(body_to_leg_rotation_stack, pts, legs)
 
 
 #def body_to_leg_matrix(leg, T):
@@ -27,9 +27,13 @@ when all joints are computed, also precompute some values for kinematics:
 import copy
 import inspect
 import math
+import types
 
 import numpy
 
+from . import reachability
+from . import tables
+
 
 default_cfg = {
     'hip': {
@@ -98,7 +102,27 @@ def merge_dicts(bd, md):
     return bd
 
 
-class JointGeometry(object):
+class Freezable(object):
+    """Attributes can't be set after freeze (see get_geometry)"""
+    _frozen = False
+
+    def freeze(self):
+        object.__setattr__(self, '_frozen', True)
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(
+                "Can't set %s, %s is frozen (shared, see get_geometry)" % (
+                    name, type(self).__name__))
+        object.__setattr__(self, name, value)
+
+
+def _read_only(a):
+    a.flags.writeable = False
+    return a
+
+
+class JointGeometry(Freezable):
     def __init__(
             self, joint_type, length, rest_angle, cylinder_min, cylinder_max,
             triangle_a, triangle_b, zero_angle_length=None):
@@ -117,6 +141,7 @@ class JointGeometry(object):
             elif joint_type == 'knee':
                 zero_angle_length = cylinder_max
         self.zero_angle_length = zero_angle_length
+        self._table = None
 
         # compute zero angle
         self.zero_angle = self.raw_angle(self.zero_angle_length)
@@ -148,6 +173,102 @@ class JointGeometry(object):
         # solve for cylinder length
         return math.sqrt(a * a + b * b - 2 * a * b * math.cos(C))
 
+    def raw_angle_array(self, cylinder_lengths):
+        """raw_angle for an array, nan where there is no triangle"""
+        a = self.triangle_a
+        b = self.triangle_b
+        c = numpy.asarray(cylinder_lengths, dtype='f8')
+        with numpy.errstate(invalid='ignore'):
+            return numpy.arccos((a * a + b * b - c * c) / (2 * a * b))
+
+    def joint_angle_array(self, cylinder_lengths):
+        return self.raw_angle_array(cylinder_lengths) - self.zero_angle
+
+    def to_cylinder_length_array(self, angles):
+        C = numpy.asarray(angles, dtype='f8') + self.zero_angle
+        a = self.triangle_a
+        b = self.triangle_b
+        return numpy.sqrt(a * a + b * b - 2 * a * b * numpy.cos(C))
+
+    def cylinder_rate_array(self, angles, angle_rates):
+        """Cylinder length rate of change at joint angles moving at rates
+
+        from the cosine rule, dc/dC = a * b * sin(C) / c
+        """
+        C = numpy.asarray(angles, dtype='f8') + self.zero_angle
+        a = self.triangle_a
+        b = self.triangle_b
+        c = numpy.sqrt(a * a + b * b - 2 * a * b * numpy.cos(C))
+        return a * b * numpy.sin(C) / c * angle_rates
+
+    def cylinder_rate(self, angle, angle_rate):
+        C = angle + self.zero_angle
+        a = self.triangle_a
+        b = self.triangle_b
+        c = math.sqrt(a * a + b * b - 2 * a * b * math.cos(C))
+        return a * b * math.sin(C) / c * angle_rate
+
+    def build_table(self, n_samples=4096):
+        """Sample joint angle at n_samples cylinder lengths
+
+        joint angle is monotonic in cylinder length so the same samples are
+        interpolated in both directions. The table is built on first use
+        by the table_* functions, values outside of
+        [cylinder_min, cylinder_max] (or [min, max] angle) use the
+        exact functions.
+        """
+        lengths = numpy.linspace(
+            self.cylinder_min, self.cylinder_max, n_samples)
+        angles = self.joint_angle_array(lengths)
+        # numpy.interp needs increasing x, keep angle sorted copies
+        if angles[0] > angles[-1]:
+            self._table = (lengths, angles, angles[::-1], lengths[::-1])
+        else:
+            self._table = (lengths, angles, angles, lengths)
+        # worst case (midpoint) error of interpolating the table
+        mid = (lengths[1:] + lengths[:-1]) / 2.
+        self.table_error = numpy.max(numpy.abs(
+            self.joint_angle_array(mid) - (angles[1:] + angles[:-1]) / 2.))
+        return self._table
+
+    def _get_table(self):
+        if self._table is None:
+            return self.build_table()
+        return self._table
+
+    def freeze(self):
+        """Build the table, make it read-only and disallow changes"""
+        self._table = tuple([_read_only(a) for a in self._get_table()])
+        super(JointGeometry, self).freeze()
+
+    def table_joint_angle(self, cylinder_lengths):
+        """Interpolated joint_angle for an array of cylinder lengths"""
+        lengths, angles, _, _ = self._get_table()
+        c = numpy.asarray(cylinder_lengths, dtype='f8')
+        r = numpy.interp(c, lengths, angles)
+        out = (c < lengths[0]) | (c > lengths[-1])
+        if numpy.any(out):
+            r = numpy.where(out, self.joint_angle_array(c), r)
+        return r
+
+    def table_cylinder_length(self, angles):
+        """Interpolated to_cylinder_length for an array of joint angles
+
+        This is the exact inverse of table_joint_angle (it interpolates
+        the same samples).
+        """
+        _, _, sorted_angles, lengths = self._get_table()
+        a = numpy.asarray(angles, dtype='f8')
+        r = numpy.interp(a, sorted_angles, lengths)
+        out = (a < sorted_angles[0]) | (a > sorted_angles[-1])
+        if numpy.any(out):
+            r = numpy.where(out, self.to_cylinder_length_array(a), r)
+        return r
+
+
+# JointGeometry arguments (minus self) used to unpack cfg dicts
+_joint_args = list(inspect.signature(JointGeometry.__init__).parameters)[1:]
+
 
 def circle_intersection(c0, c1):
     x0, y0 = c0['center']
@@ -219,8 +340,8 @@ def circle_point_at_y(c, y):
     return dx + cx, cx - dx
 
 
-class LegGeometry(object):
-    def __init__(self, leg_number):
+class LegGeometry(Freezable):
+    def __init__(self, leg_number, build_tables=False):
         cfg = copy.deepcopy(default_cfg)
         # combine with any per-leg measurements
         if leg_number in per_leg_cfg:
@@ -229,13 +350,59 @@ class LegGeometry(object):
             jc = cfg[jn]
             jc['joint_type'] = jn
             # unpack settings based on argument spec
-            args, _, _, _ = inspect.getargspec(JointGeometry.__init__)
-            setattr(self, jn, JointGeometry(*[jc[n] for n in args[1:] if n in jc]))
+            setattr(self, jn, JointGeometry(
+                *[jc[n] for n in _joint_args if n in jc]))
         # base beta = pi - thigh_rest - knee_rest, see inverse kinematics
         self.base_beta = (numpy.pi - self.thigh.rest_angle + self.knee.rest_angle)
         # precompute
         # - limit circles 2d: thigh_min, thigh_max, knee_min, knee_max
+        self.tables = None
+        self.reachability = None
         self.compute_limit_circles_2d()
+        if build_tables:
+            self.build_tables()
+
+    def build_tables(self, z_step=0.5, max_error=0.01):
+        """Use interpolated tables for limit queries (see tables.py)"""
+        self.tables = tables.LimitTables(self, z_step, max_error)
+
+    def freeze(self):
+        """Build tables and reachability then disallow changes
+
+        Shared geometry (see get_geometry) is frozen, calf angle
+        dependent tables (tables.CalfTables) are kept by each user.
+        """
+        for jn in ('hip', 'thigh', 'knee'):
+            getattr(self, jn).freeze()
+        if self.tables is None:
+            self.build_tables()
+        self.get_reachability()
+        _read_only(self.reachability.inside)
+        _read_only(self.reachability.distance)
+        self.limit_circles_2d = types.MappingProxyType({
+            k: types.MappingProxyType(self.limit_circles_2d[k])
+            for k in self.limit_circles_2d})
+        super(LegGeometry, self).freeze()
+
+    def get_reachability(self, max_calf_angle=None):
+        """Reachable workspace (see reachability.py)
+
+        The workspace without a calf angle limit is built on first use
+        and kept, others are built on every call (so should be kept
+        by the caller).
+        """
+        if max_calf_angle is not None:
+            return reachability.Reachability(
+                self, max_calf_angle=max_calf_angle)
+        if self.reachability is None:
+            self.reachability = reachability.Reachability(self)
+        return self.reachability
+
+    def is_reachable(self, x, y, z, margin=0.):
+        return self.get_reachability().is_reachable(x, y, z, margin)
+
+    def distance_to_limit(self, x, y, z):
+        return self.get_reachability().distance_to_limit(x, y, z)
 
     def compute_limit_circles_2d(self):
         self.limit_circles_2d = {}
@@ -275,6 +442,9 @@ class LegGeometry(object):
             circle_intersection(
                 self.limit_circles_2d['knee_max'], self.limit_circles_2d['thigh_min']),
             key=lambda i: i[0])[1]
+        # limits changed, rebuild any tables
+        if self.tables is not None:
+            self.build_tables(self.tables.z_step, self.tables.max_error)
 
     def get_limits(self):
         return {
@@ -327,7 +497,161 @@ class LegGeometry(object):
         dz = -(p2[2] - p1[2])
         return math.atan2(dx, dz)
 
-    def x_with_calf_angle(self, z, a):
+    def angles_to_points_array(self, angles):
+        """Forward kinematics for an [N, 3] array of (hip, thigh, knee)
+
+        Returns an [N, 3, 3] array of the same 3 points (per row)
+        generated by angles_to_points: hip pin, knee pin and foot
+        """
+        angles = numpy.asarray(angles, dtype='f8').reshape(-1, 3)
+        hip = angles[:, 0]
+        thigh = angles[:, 1]
+        knee = angles[:, 2]
+        ch = numpy.cos(hip)
+        sh = numpy.sin(hip)
+        pts = numpy.empty((len(angles), 3, 3))
+
+        x = numpy.full(len(angles), self.hip.length)
+        pts[:, 0, 0] = x * ch
+        pts[:, 0, 1] = x * sh
+        pts[:, 0, 2] = 0.
+
+        a = self.thigh.rest_angle - thigh
+        x = x + self.thigh.length * numpy.cos(a)
+        z = self.thigh.length * numpy.sin(a)
+        pts[:, 1, 0] = x * ch
+        pts[:, 1, 1] = x * sh
+        pts[:, 1, 2] = z
+
+        a = self.knee.rest_angle - knee - thigh
+        x += self.knee.length * numpy.cos(a)
+        z += self.knee.length * numpy.sin(a)
+        pts[:, 2, 0] = x * ch
+        pts[:, 2, 1] = x * sh
+        pts[:, 2, 2] = z
+        return pts
+
+    def points_to_angles_array(self, pts):
+        """Inverse kinematics for an [N, 3] array of foot (x, y, z)
+
+        Returns (angles, valid) where angles is an [N, 3] array of
+        (hip, thigh, knee) and valid is an [N] boolean mask. Points that
+        cannot be reached (where point_to_angles would raise a math domain
+        error) are marked invalid and their angles are set to nan.
+        """
+        pts = numpy.asarray(pts, dtype='f8').reshape(-1, 3)
+        x = pts[:, 0]
+        y = pts[:, 1]
+        z = pts[:, 2]
+        tl = self.thigh.length
+        kl = self.knee.length
+        l = numpy.hypot(x, y) - self.hip.length
+        L = numpy.sqrt(z * z + l * l)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            ca1 = -z / L
+            ca2 = (kl * kl - tl * tl - L * L) / (-2 * tl * L)
+            cbeta = (L * L - kl * kl - tl * tl) / (-2 * kl * tl)
+            valid = (
+                (numpy.abs(ca1) <= 1.) & (numpy.abs(ca2) <= 1.) &
+                (numpy.abs(cbeta) <= 1.))
+            angles = numpy.empty((len(pts), 3))
+            angles[:, 0] = numpy.arctan2(y, x)
+            angles[:, 1] = self.thigh.rest_angle - (
+                numpy.arccos(ca1) + numpy.arccos(ca2) - numpy.pi / 2.)
+            angles[:, 2] = self.base_beta - numpy.arccos(cbeta)
+        angles[~valid] = numpy.nan
+        return angles, valid
+
+    def angles_to_calf_angle_array(self, angles):
+        """Calf angles for an [N, 3] array of (hip, thigh, knee)"""
+        pts = self.angles_to_points_array(angles)
+        dx = pts[:, 2, 0] - pts[:, 1, 0]
+        # invert dz to fix quadrant
+        dz = pts[:, 1, 2] - pts[:, 2, 2]
+        return numpy.arctan2(dx, dz)
+
+    def jacobian_array(self, angles):
+        """Foot velocity jacobians for an [N, 3] array of (hip, thigh, knee)
+
+        Returns [N, 3, 3] where J[n, i, j] = d foot[i] / d angle[j]
+        so foot velocity (x, y, z) = J * joint rates (hip, thigh, knee)
+        """
+        angles = numpy.asarray(angles, dtype='f8').reshape(-1, 3)
+        hip = angles[:, 0]
+        thigh = angles[:, 1]
+        knee = angles[:, 2]
+        ch = numpy.cos(hip)
+        sh = numpy.sin(hip)
+        a1 = self.thigh.rest_angle - thigh
+        a2 = self.knee.rest_angle - knee - thigh
+        tx = self.thigh.length * numpy.cos(a1)
+        tz = self.thigh.length * numpy.sin(a1)
+        kx = self.knee.length * numpy.cos(a2)
+        kz = self.knee.length * numpy.sin(a2)
+        # radial distance (in leg plane) and its derivatives
+        r = self.hip.length + tx + kx
+        dr_dt = tz + kz
+        dr_dk = kz
+        J = numpy.empty((len(angles), 3, 3))
+        J[:, 0, 0] = -r * sh
+        J[:, 0, 1] = ch * dr_dt
+        J[:, 0, 2] = ch * dr_dk
+        J[:, 1, 0] = r * ch
+        J[:, 1, 1] = sh * dr_dt
+        J[:, 1, 2] = sh * dr_dk
+        J[:, 2, 0] = 0.
+        J[:, 2, 1] = -(tx + kx)
+        J[:, 2, 2] = -kx
+        return J
+
+    def jacobian(self, hip, thigh, knee):
+        return self.jacobian_array([[hip, thigh, knee]])[0]
+
+    def joint_rates_array(self, angles, velocities):
+        """Joint rates (radians/s) that move the foot at velocities
+
+        angles and velocities are [N, 3] (or one can be [3]), returns [N, 3]
+        of (hip, thigh, knee) rates, nan where the jacobian is singular
+        """
+        J = self.jacobian_array(angles)
+        v = numpy.broadcast_to(
+            numpy.asarray(velocities, dtype='f8'), (len(J), 3))
+        rates = numpy.full((len(J), 3), numpy.nan)
+        ok = numpy.abs(numpy.linalg.det(J)) > 1e-9
+        if numpy.any(ok):
+            rates[ok] = numpy.linalg.solve(
+                J[ok], v[ok][:, :, numpy.newaxis])[:, :, 0]
+        return rates
+
+    def joint_rates(self, hip, thigh, knee, vx, vy, vz):
+        return tuple(self.joint_rates_array(
+            [[hip, thigh, knee]], [[vx, vy, vz]])[0])
+
+    def cylinder_rates_array(self, angles, velocities):
+        """Cylinder rates (inches/s) that move the foot at velocities
+
+        angles and velocities as in joint_rates_array, returns [N, 3]
+        of (hip, thigh, knee) cylinder rates
+        """
+        angles = numpy.asarray(angles, dtype='f8').reshape(-1, 3)
+        rates = self.joint_rates_array(angles, velocities)
+        angles = numpy.broadcast_to(angles, rates.shape)
+        return numpy.stack([
+            j.cylinder_rate_array(angles[:, i], rates[:, i])
+            for (i, j) in enumerate((self.hip, self.thigh, self.knee))],
+            axis=1)
+
+    def cylinder_rates(self, hip, thigh, knee, vx, vy, vz):
+        return tuple(self.cylinder_rates_array(
+            [[hip, thigh, knee]], [[vx, vy, vz]])[0])
+
+    def x_with_calf_angle(self, z, a, tables=None):
+        """tables: optional tables.CalfTables"""
+        if tables is not None:
+            return tables.x_with_calf_angle(z, a)
+        return self._x_with_calf_angle(z, a)
+
+    def _x_with_calf_angle(self, z, a):
         return (
             math.sqrt(1 - (
                 (z + math.cos(float(a)) * self.knee.length)
@@ -343,6 +667,11 @@ class LegGeometry(object):
             * self.thigh.length + self.hip.length)
 
     def limits_at_z_2d(self, z):
+        if self.tables is not None:
+            return self.tables.limits_at_z_2d(z)
+        return self._limits_at_z_2d(z)
+
+    def _limits_at_z_2d(self, z):
         """
         to find right edge:
         - find point on knee_max at z (and x > 0)
@@ -399,7 +728,8 @@ class LegGeometry(object):
 
 
     def limit_intersections(
-            self, c, z, min_hip_distance=None, max_calf_angle=None):
+            self, c, z, min_hip_distance=None, max_calf_angle=None,
+            tables=None):
         """
         Find points where a circle c intersects with the
         boundries of the foot position at a particular height
@@ -412,7 +742,7 @@ class LegGeometry(object):
         if min_hip_distance is not None:
             l = max(l, min_hip_distance)
         if max_calf_angle is not None:
-            rcalf = self.x_with_calf_angle(z, max_calf_angle)
+            rcalf = self.x_with_calf_angle(z, max_calf_angle, tables)
             if rcalf < r:
                 r = rcalf
         lc = {'center': (0, 0), 'radius': l}
@@ -452,42 +782,52 @@ class LegGeometry(object):
                         ipts.append(p)
         return ipts
 
-    def xy_center_at_z(
-            self, z, target_calf_angle=0, max_calf_angle=None,
-            x_offset=0, y_offset=0):
-        """
-        target_calf_angle = radians
-        max_calf_angle = radians
-        """
+    def _center_limits_at_z(self, z, target_calf_angle, max_calf_angle):
+        """Return (l, r, c0x) computed by xy_center_at_z before offsets"""
         # get x limits
-        l, r = self.limits_at_z_2d(z)
+        l, r = self._limits_at_z_2d(z)
         # if there is a max calf angle limit
         if max_calf_angle is not None:
             # check that the 'right' x (positive) limit for this height
             # doesn't have too extreme a calf angle
-            rcalf = self.x_with_calf_angle(z, max_calf_angle)
+            rcalf = self._x_with_calf_angle(z, max_calf_angle)
             if rcalf < r:
                 #print(r, rcalf)
                 # if so, set this as the 'right' x limit
                 r = rcalf
-            lcalf = self.x_with_calf_angle(z, -max_calf_angle)
+            lcalf = self._x_with_calf_angle(z, -max_calf_angle)
             if lcalf > l:
                 #print(l, lcalf)
                 l = lcalf
         # find x position where calf is at this target angle
-        c0x = self.x_with_calf_angle(z, target_calf_angle)
+        c0x = self._x_with_calf_angle(z, target_calf_angle)
         # check if x position is out of limits, if so, reset to center
         if c0x < l:
             c0x = l
         elif c0x > r:
             c0x = r
+        return l, r, c0x
+
+    def xy_center_at_z(
+            self, z, target_calf_angle=0, max_calf_angle=None,
+            x_offset=0, y_offset=0, tables=None):
+        """
+        target_calf_angle = radians
+        max_calf_angle = radians
+        tables = optional tables.CalfTables
+        """
+        if tables is not None:
+            l, r, c0x = tables.center_limits_at_z(
+                z, target_calf_angle, max_calf_angle)
+        else:
+            l, r, c0x = self._center_limits_at_z(
+                z, target_calf_angle, max_calf_angle)
 
         # add optional offsets (x and y?)
         # redo range check
         c0x += x_offset
         c0y = y_offset
-        v = numpy.array([c0x, c0y])
-        d = numpy.linalg.norm(v)
+        d = math.hypot(c0x, c0y)
         a = math.atan2(c0y, c0x)
         if a < self.hip.min_angle:
             a = self.hip.min_angle
@@ -514,9 +854,10 @@ class LegGeometry(object):
             min_hip_distance=None,
             target_calf_angle=0,
             max_calf_angle=None,
-            x_offset=0, y_offset=0):
+            x_offset=0, y_offset=0, tables=None):
         # compute center foot position
-        c0x, c0y = self.xy_center_at_z(z, target_calf_angle, max_calf_angle, x_offset, y_offset)
+        c0x, c0y = self.xy_center_at_z(
+            z, target_calf_angle, max_calf_angle, x_offset, y_offset, tables)
         if rspeed == 0:
             return c0x, c0y
         tc = {
@@ -526,7 +867,8 @@ class LegGeometry(object):
         ipts = self.limit_intersections(
             tc, z,
             min_hip_distance=min_hip_distance,
-            max_calf_angle=max_calf_angle)
+            max_calf_angle=max_calf_angle,
+            tables=tables)
         tc = [tx, ty]
         c0 = [c0x, c0y]
         # TODO clean up below, this likely doesn't work for
@@ -570,3 +912,39 @@ class LegGeometry(object):
         return (
             x * ca - y * sa + tc[0],
             x * sa + y * ca + tc[1])
+
+
+# process wide LegGeometry instances by leg number, see get_geometry
+_geometries = {}
+
+
+def get_geometry(leg_number):
+    """Shared LegGeometry for leg_number, built on first request
+
+    Instances are shared by everything in the process (controllers, ui,
+    restriction) so are frozen (see LegGeometry.freeze). Users that
+    need calf angle tables keep their own tables.CalfTables. Changes to
+    the leg measurements go through set_leg_cfg so the next request
+    rebuilds the geometry (users should get the geometry from here
+    rather than keep a reference).
+    """
+    if leg_number not in _geometries:
+        g = LegGeometry(leg_number, build_tables=True)
+        g.freeze()
+        _geometries[leg_number] = g
+    return _geometries[leg_number]
+
+
+def clear_geometry_cache(leg_number=None):
+    """Drop cached geometry for leg_number (or all legs if None)"""
+    if leg_number is None:
+        _geometries.clear()
+    else:
+        _geometries.pop(leg_number, None)
+
+
+def set_leg_cfg(leg_number, cfg):
+    """Merge cfg into per_leg_cfg[leg_number] and rebuild on next request"""
+    per_leg_cfg[leg_number] = merge_dicts(
+        per_leg_cfg.get(leg_number, {}), cfg)
+    clear_geometry_cache(leg_number)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Precomputed reachable workspace of a leg
+
+The thigh and knee only move the foot in the plane of the leg, so the
+reachable workspace is the (radial, z) region allowed by the thigh and
+knee limits (and optionally a max calf angle) swept over the hip limits.
+So instead of a 3d voxel grid this stores a 2d grid over
+radial distance from the hip (hypot(x, y)) and z containing the signed
+distance (in inches, > 0 inside) to the edge of the region:
+
+    distance_to_limit(x, y, z) = min(
+        grid distance at (hypot(x, y), z),
+        distance to the nearest hip limit plane)
+
+The grid distance is an exact euclidean distance transform of the
+sampled region (accurate to about 1/2 grid step) that is bilinearly
+interpolated. Outside of the region the min() is a lower bound of
+the true distance.
+
+As the grid is only approximate near the edge (points a fraction of
+an inch inside can have a small negative distance), is_reachable only
+uses it to decide points more than a step from the edge and checks
+the others exactly (inverse kinematics and joint limits).
+"""
+
+import math
+
+import numpy
+
+
+def _distance_1d(mask, axis):
+    """Squared distance (in cells) along axis to the nearest True cell"""
+    mask = numpy.moveaxis(mask, axis, 0)
+    n = mask.shape[0]
+    inf = float(n * n + sum(mask.shape) ** 2)
+    d = numpy.empty(mask.shape)
+    # forward then backward scan
+    d[0] = numpy.where(mask[0], 0., inf)
+    for i in range(1, n):
+        d[i] = numpy.where(mask[i], 0., d[i - 1] + 1)
+    for i in range(n - 2, -1, -1):
+        d[i] = numpy.minimum(d[i], d[i + 1] + 1)
+    d[d >= inf] = numpy.inf
+    return numpy.moveaxis(d * d, 0, axis)
+
+
+def distance_transform(mask):
+    """Exact euclidean distance (in cells) to the nearest True cell
+
+    Separable: distance along axis 0 then for each row of axis 0
+    min over axis 1 of (column distance ** 2 + offset ** 2)
+    """
+    g = _distance_1d(mask, 0)
+    n = mask.shape[1]
+    i = numpy.arange(n)
+    offsets = (i[:, numpy.newaxis] - i[numpy.newaxis, :]) ** 2.
+    d = numpy.empty(mask.shape)
+    for r in range(mask.shape[0]):
+        d[r] = numpy.min(g[r][numpy.newaxis, :] + offsets, axis=1)
+    return numpy.sqrt(d)
+
+
+class Reachability(object):
+    def __init__(self, geometry, step=1.0, max_calf_angle=None):
+        """
+        geometry: LegGeometry
+        step: grid spacing in inches
+        max_calf_angle: if not None, also limit abs(calf angle) (radians)
+        """
+        self.geometry = geometry
+        self.step = step
+        self.max_calf_angle = max_calf_angle
+        self.hip_limits = (
+            min(geometry.hip.min_angle, geometry.hip.max_angle),
+            max(geometry.hip.min_angle, geometry.hip.max_angle))
+
+        # grid extends 2 cells past the longest reach
+        reach = (
+            geometry.hip.length + geometry.thigh.length +
+            geometry.knee.length)
+        zreach = geometry.thigh.length + geometry.knee.length
+        self.r_min = 0.
+        self.z_min = -zreach - 2 * step
+        nr = int(math.ceil(reach / step)) + 3
+        nz = int(math.ceil(2 * zreach / step)) + 5
+        r = self.r_min + numpy.arange(nr) * step
+        z = self.z_min + numpy.arange(nz) * step
+        self.r_max = r[-1]
+        self.z_max = z[-1]
+
+        self.inside = self._compute_inside(r, z)
+        self.distance = (
+            distance_transform(~self.inside) -
+            distance_transform(self.inside)) * step
+        # for every cell inside the region the distance to the nearest
+        # outside cell overestimates the edge distance by 1/2 step
+        # (and likewise outside) so center the edge between cells
+        self.distance[self.inside] -= step / 2.
+        self.distance[~self.inside] += step / 2.
+
+    def _compute_inside(self, r, z):
+        rr, zz = numpy.meshgrid(r, z, indexing='ij')
+        pts = numpy.zeros((rr.size, 3))
+        pts[:, 0] = rr.ravel()
+        pts[:, 2] = zz.ravel()
+        angles, valid = self.geometry.points_to_angles_array(pts)
+        inside = valid.copy()
+        for (i, jn) in ((1, 'thigh'), (2, 'knee')):
+            j = getattr(self.geometry, jn)
+            lo = min(j.min_angle, j.max_angle)
+            hi = max(j.min_angle, j.max_angle)
+            with numpy.errstate(invalid='ignore'):
+                inside &= (angles[:, i] >= lo) & (angles[:, i] <= hi)
+        if self.max_calf_angle is not None:
+            with numpy.errstate(invalid='ignore'):
+                inside &= numpy.abs(
+                    self.geometry.angles_to_calf_angle_array(angles)) <= (
+                        self.max_calf_angle)
+        return inside.reshape(rr.shape)
+
+    def _grid_distance(self, r, z):
+        """Bilinear interpolation of the signed distance grid"""
+        fr = (r - self.r_min) / self.step
+        fz = (z - self.z_min) / self.step
+        nr, nz = self.distance.shape
+        if fr < 0 or fz < 0 or fr >= nr - 1 or fz >= nz - 1:
+            # off the grid, this is far outside of the region
+            cr = min(max(fr, 0), nr - 1)
+            cz = min(max(fz, 0), nz - 1)
+            return (
+                self.distance[int(cr), int(cz)] -
+                math.hypot(fr - cr, fz - cz) * self.step)
+        ir = int(fr)
+        iz = int(fz)
+        tr = fr - ir
+        tz = fz - iz
+        d = self.distance
+        return (
+            (d[ir, iz] * (1 - tz) + d[ir, iz + 1] * tz) * (1 - tr) +
+            (d[ir + 1, iz] * (1 - tz) + d[ir + 1, iz + 1] * tz) * tr)
+
+    def _hip_distance(self, x, y):
+        """Signed distance to the nearest hip limit plane"""
+        a = math.atan2(y, x)
+        l = math.hypot(x, y)
+        lo, hi = self.hip_limits
+        d = min(a - lo, hi - a)
+        # distance from point to plane through z axis at angle d
+        if abs(d) >= math.pi / 2.:
+            return math.copysign(l, d)
+        return l * math.sin(d)
+
+    def distance_to_limit(self, x, y, z):
+        """Signed distance (inches) to the workspace edge, > 0 is inside"""
+        return min(
+            self._grid_distance(math.hypot(x, y), z),
+            self._hip_distance(x, y))
+
+    def is_inside(self, x, y, z):
+        """Exact check that x, y, z is within the joint (and calf) limits"""
+        try:
+            angles = self.geometry.point_to_angles(x, y, z)
+        except ValueError:
+            return False
+        for (a, j) in zip(angles, (
+                self.geometry.hip, self.geometry.thigh, self.geometry.knee)):
+            if not min(j.min_angle, j.max_angle) <= a <= max(
+                    j.min_angle, j.max_angle):
+                return False
+        if self.max_calf_angle is not None:
+            return abs(self.geometry.angles_to_calf_angle(*angles)) <= (
+                self.max_calf_angle)
+        return True
+
+    def is_reachable(self, x, y, z, margin=0.):
+        """True if x, y, z is at least margin inches inside the workspace
+
+        The grid decides points more than a step from margin, closer
+        points must also pass the exact check (is_inside)
+        """
+        d = self.distance_to_limit(x, y, z)
+        if abs(d - margin) > self.step:
+            return d >= margin
+        inside = self.is_inside(x, y, z)
+        if margin > 0:
+            return inside and d >= margin
+        if margin < 0:
+            return inside or d >= margin
+        return inside
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Precomputed lookup tables for LegGeometry limit queries
+
+Each table samples an exact function of z (foot height) every z_step
+inches between the geometry z_min and z_max and linearly interpolates
+between samples. When a table is built, every interval is checked at
+its midpoint against the exact function. Intervals that interpolate with
+an error > max_error (or that contain a point with no solution) are
+marked inexact and lookups that fall in them use the exact function.
+Lookups outside of the sampled z range also use the exact function.
+
+LimitTables only depend on the leg geometry and are part of the
+(shared, read-only) LegGeometry. Tables that depend on calf angles (which
+come from res.* params) are kept in a CalfTables by each user, they are
+built on first use and dropped by clear (call this when the params change).
+"""
+
+import math
+
+
+class ZTable(object):
+    """Interpolated table of function(z) -> tuple of floats"""
+    def __init__(self, function, z_min, z_max, z_step, max_error):
+        self.function = function
+        self.z_min = z_min
+        self.z_step = z_step
+        self.max_error = max_error
+        n = int(math.ceil((z_max - z_min) / z_step)) + 1
+        self.z_max = z_min + (n - 1) * z_step
+        self._values = tuple([
+            self._sample(z_min + i * z_step) for i in range(n)])
+        exact = []
+        self.error = 0.
+        for i in range(n - 1):
+            v0 = self._values[i]
+            v1 = self._values[i + 1]
+            vm = self._sample(z_min + (i + 0.5) * z_step)
+            if v0 is None or v1 is None or vm is None:
+                exact.append(False)
+                continue
+            e = max([abs((a + b) / 2. - m) for (a, b, m) in zip(v0, v1, vm)])
+            if e > max_error:
+                exact.append(False)
+                continue
+            self.error = max(self.error, e)
+            exact.append(True)
+        self._exact = tuple(exact)
+
+    def _sample(self, z):
+        try:
+            v = self.function(z)
+        except (ValueError, TypeError):
+            return None
+        if any([i is None for i in v]):
+            return None
+        return tuple(v)
+
+    def __call__(self, z):
+        if z < self.z_min or z >= self.z_max:
+            return self.function(z)
+        r = (z - self.z_min) / self.z_step
+        i = int(r)
+        if not self._exact[i]:
+            return self.function(z)
+        t = r - i
+        v0 = self._values[i]
+        v1 = self._values[i + 1]
+        return tuple([a + (b - a) * t for (a, b) in zip(v0, v1)])
+
+
+class LimitTables(object):
+    def __init__(self, geometry, z_step=0.5, max_error=0.01):
+        self.geometry = geometry
+        self.z_step = z_step
+        self.max_error = max_error
+        self.limits = self._build(geometry._limits_at_z_2d)
+
+    def _build(self, function):
+        return ZTable(
+            function, self.geometry.z_min, self.geometry.z_max,
+            self.z_step, self.max_error)
+
+    def limits_at_z_2d(self, z):
+        return self.limits(z)
+
+
+class CalfTables(LimitTables):
+    """Calf angle dependent tables (and limits) for one user of a geometry
+
+    Pass to the LegGeometry functions that take tables.
+    """
+    def __init__(self, geometry, z_step=0.5, max_error=0.01):
+        self.geometry = geometry
+        self.z_step = z_step
+        self.max_error = max_error
+        if geometry.tables is not None:
+            self.limits = geometry.tables.limits
+        else:
+            self.limits = self._build(geometry._limits_at_z_2d)
+        self.clear()
+
+    def clear(self):
+        """Drop tables that depend on calf angles"""
+        self._calf_tables = {}
+        self._center_tables = {}
+
+    def x_with_calf_angle(self, z, a):
+        if a not in self._calf_tables:
+            self._calf_tables[a] = self._build(
+                lambda z, a=a: (self.geometry._x_with_calf_angle(z, a), ))
+        return self._calf_tables[a](z)[0]
+
+    def center_limits_at_z(self, z, target_calf_angle, max_calf_angle):
+        k = (target_calf_angle, max_calf_angle)
+        if k not in self._center_tables:
+            self._center_tables[k] = self._build(
+                lambda z, k=k: self.geometry._center_limits_at_z(z, *k))
+        return self._center_tables[k](z)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Host side timestamp correction for periodic leg reports
+
+Reports carry no device timestamp but each report is sent by the
+teensy every report period so the n-th report of a kind was sent at
+device time n * period. Receive times on the host are:
+
+    recv[n] = offset + period * n + latency + delay[n]
+
+where delay[n] >= 0 is added by serial buffering and a slow (or
+batched) decoding loop. ReportClock estimates period (which includes
+the device to host clock drift) by fitting recent (n, recv) pairs and
+offset from the lower envelope (min over the window of recv - period * n)
+so delayed reports don't move the estimate. Corrected report times are:
+
+    offset + period * n - latency
+
+where latency (1/2 of the minimum command round trip) is measured
+with measure_latency. Call reset if the report period is changed
+(Teensy does this when the teensy replies to report_time).
+
+Reports lost on the link make all later reports appear late by a
+period, this is detected when the last drop_check reports are all
+more than 1/2 period late by about the same amount (the median is
+within 1/2 period of the min, reports delayed by a stalled loop arrive
+in a burst and are late by decreasing amounts). Reports received before
+the drop is detected (drop_check - 1) are corrected to a period early.
+Drops are only checked once the period is fit to refit_every reports.
+"""
+
+import collections
+import time
+
+import numpy
+
+
+def _slope(x, y):
+    dx = x - x.mean()
+    return numpy.dot(dx, y - y.mean()) / numpy.dot(dx, dx)
+
+
+class ReportClock(object):
+    def __init__(
+            self, window=256, min_samples=8, refit_every=32,
+            drop_check=8, latency=0.):
+        self.window = window
+        self.min_samples = min_samples
+        self.refit_every = refit_every
+        self.drop_check = drop_check
+        self.latency = latency
+        # total dropped reports (kept by reset)
+        self.dropped = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the fit (call when the report period changes)"""
+        self._n = collections.deque(maxlen=self.window)
+        self._recv = collections.deque(maxlen=self.window)
+        # residuals of the most recent reports
+        self._late = collections.deque(maxlen=self.drop_check)
+        self.count = 0
+        self.offset = None
+        self.period = None
+        # number of samples the period was fit to
+        self._period_samples = 0
+        self._since_fit = 0
+
+    def fit(self):
+        """Fit period and offset (lower envelope) to the window
+
+        The period is fit to the least delayed 1/4 of the reports
+        (by residual of the previous fit or a first fit to all reports)
+        """
+        n = numpy.array(self._n, dtype='f8')
+        r = numpy.array(self._recv, dtype='f8')
+        period = self.period
+        if period is None:
+            period = _slope(n, r)
+        # keep a period fit to more samples (from before a drop)
+        if len(n) >= self._period_samples:
+            residuals = r - period * n
+            low = residuals <= numpy.percentile(residuals, 25)
+            if numpy.count_nonzero(low) >= 2 and numpy.ptp(n[low]) > 0:
+                period = _slope(n[low], r[low])
+            self._period_samples = len(n)
+        self.period = period
+        self.offset = numpy.min(r - self.period * n)
+        self._since_fit = 0
+
+    def update(self, recv_time):
+        """Add a report received at recv_time, returns corrected time"""
+        n = self.count
+        self.count += 1
+        if self.period is not None:
+            late = recv_time - (self.offset + self.period * n)
+            self._late.append(late)
+            if (
+                    self._period_samples >= self.refit_every and
+                    len(self._late) == self.drop_check and
+                    min(self._late) > self.period / 2. and
+                    numpy.median(self._late) - min(self._late) <
+                    self.period / 2.):
+                # reports were lost, skip ahead
+                skip = int(round(min(self._late) / self.period))
+                self.dropped += skip
+                self.count += skip
+                n += skip
+                self._late.clear()
+                # refit the period once refit_every reports follow the drop
+                self._period_samples = min(
+                    self._period_samples, self.refit_every)
+                # only keep samples after the drop
+                self._n = collections.deque(
+                    [i + skip for i in list(self._n)[-(
+                        self.drop_check - 1):]],
+                    maxlen=self.window)
+                self._recv = collections.deque(
+                    list(self._recv)[-(self.drop_check - 1):],
+                    maxlen=self.window)
+        self._n.append(n)
+        self._recv.append(recv_time)
+        if len(self._n) < self.min_samples:
+            return recv_time - self.latency
+        self._since_fit += 1
+        if (
+                self._since_fit >= self.refit_every or
+                self._period_samples < self.refit_every):
+            # refit every report until the period is fit to enough reports
+            self.fit()
+        elif recv_time - self.period * n < self.offset:
+            # new lower envelope
+            self.offset = recv_time - self.period * n
+        return self.offset + self.period * n - self.latency
+
+
+def measure_latency(request, n=5):
+    """Estimate one way latency as 1/2 of the min round trip of request
+
+    request: function that sends a command and blocks for the reply
+    """
+    rtts = []
+    for _ in range(n):
+        t0 = time.monotonic()
+        request()
+        rtts.append(time.monotonic() - t0)
+    return min(rtts) / 2.
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Serial link health for a leg teensy
+
+LinkStats collects (over a period, default 1 second):
+    - bytes in and out (counted by the BatchedStream wrapping the port)
+    - frames received per command name
+    - decode time (seconds spent in each handle_stream call)
+    - report queue depth (threaded mode, at each dispatch)
+    - stream errors (garbled or undecodable data)
+    - reports dropped on the link (detected by the report clocks)
+    - heartbeat interval (the teensy estops if this exceeds
+      consts.HEARTBEAT_TIMEOUT)
+and at the end of each period makes a report (a json-able dict)
+with per second rates and histograms that is signaled by the leg
+as 'link_stats' and returned by link_report.
+
+Stats are updated from the reader and heartbeat threads so all
+updates and reports hold a lock.
+"""
+
+import threading
+import time
+
+from .. import consts
+from .. import utils
+
+
+# histogram bin edges
+decode_time_edges = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05]
+queue_depth_edges = [1, 2, 5, 10, 50, 100]
+heartbeat_edges = [
+    consts.HEARTBEAT_PERIOD * s for s in (0.9, 1.1, 1.25, 1.5)] + [
+    consts.HEARTBEAT_TIMEOUT]
+
+
+class LinkStats(object):
+    def __init__(self, period=1.0):
+        self.period = period
+        self.decode_time = utils.Histogram(decode_time_edges)
+        self.queue_depth = utils.Histogram(queue_depth_edges)
+        self.heartbeat_interval = utils.Histogram(heartbeat_edges)
+        self.frames = {}
+        self.errors = 0
+        self.last_report = {}
+        self._last_heartbeat = None
+        self._last_counts = None
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def frame(self, name):
+        with self._lock:
+            self.frames[name] = self.frames.get(name, 0) + 1
+
+    def decode(self, dt):
+        with self._lock:
+            self.decode_time.update(dt)
+
+    def queue(self, depth):
+        with self._lock:
+            self.queue_depth.update(depth)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def heartbeat(self, t=None):
+        if t is None:
+            t = time.monotonic()
+        with self._lock:
+            if self._last_heartbeat is not None:
+                self.heartbeat_interval.update(t - self._last_heartbeat)
+            self._last_heartbeat = t
+
+    def due(self, t=None):
+        if t is None:
+            t = time.monotonic()
+        return t - self._start >= self.period
+
+    def report(self, stream, dropped, t=None):
+        """Make a report for the period ending now and start a new period
+
+        stream: BatchedStream (for byte counts)
+        dropped: total number of reports dropped on the link
+        """
+        if t is None:
+            t = time.monotonic()
+        counts = stream.counts() + (dropped, )
+        with self._lock:
+            return self._report(counts, t)
+
+    def _report(self, counts, t):
+        dt = max(t - self._start, 1E-9)
+        if self._last_counts is None:
+            self._last_counts = (0, 0, 0, 0)
+        d = [c - l for (c, l) in zip(counts, self._last_counts)]
+        self.last_report = {
+            'period': dt,
+            'bytes_in': d[0] / dt,
+            'bytes_out': d[1] / dt,
+            'writes': d[2] / dt,
+            'frames': {k: self.frames[k] / dt for k in self.frames},
+            'errors': self.errors,
+            'dropped': d[3],
+            'decode_time': self.decode_time.as_dict(),
+            'queue_depth': self.queue_depth.as_dict(),
+            'heartbeat_interval': self.heartbeat_interval.as_dict(),
+        }
+        self._last_counts = counts
+        self.frames = {}
+        self.errors = 0
+        self.decode_time.reset()
+        self.queue_depth.reset()
+        self.heartbeat_interval.reset()
+        self._start = t
+        return self.last_report
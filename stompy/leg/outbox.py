@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Per leg plan outbox
+
+Plans are often resent unchanged (every target update, joystick axis
+change, autoheight update...). The outbox sits between send_plan and
+the serial port and:
+    - drops plans that pack to the same bytes as the last plan sent
+    - merges bursts: a plan submitted within window seconds of the
+      last send is held and replaced by any newer plan, the latest is
+      sent by flush (called from update) once the window has passed
+    - sends stop plans immediately (dropping any held plan)
+reset (called on estop changes) forgets the last plan sent so the next
+plan is always sent.
+
+Each packed plan can be submitted with the Plan it was packed from which
+is passed to send (so the leg only reports plans that were sent).
+"""
+
+import struct
+import time
+
+from .. import consts
+
+
+def plan_bytes(packed):
+    """Packed plan as sent on the wire (2 bytes then float32s)"""
+    return struct.pack('<2B%if' % (len(packed) - 2), *packed)
+
+
+class PlanOutbox(object):
+    def __init__(self, send, window=None):
+        """send: function called with (packed plan, plan) to send it"""
+        if window is None:
+            window = consts.PLAN_SEND_WINDOW
+        self.send = send
+        self.window = window
+        self.reset()
+        self.n_sent = 0
+        self.n_dropped = 0
+        self.n_merged = 0
+
+    def reset(self):
+        self._last_bytes = None
+        self._last_time = None
+        self._pending = None
+
+    @property
+    def pending_plan(self):
+        """Plan held to be sent by flush (or None)"""
+        if self._pending is None:
+            return None
+        return self._pending[2]
+
+    def _send(self, packed, bs, plan, t):
+        self._pending = None
+        self._last_bytes = bs
+        self._last_time = t
+        self.n_sent += 1
+        self.send(packed, plan)
+
+    def submit(self, packed, t=None, plan=None):
+        """Send (now or on flush) or drop a packed plan"""
+        if t is None:
+            t = time.monotonic()
+        bs = plan_bytes(packed)
+        if bs == self._last_bytes:
+            if self._pending is not None:
+                # back to the plan that was last sent
+                self._pending = None
+                self.n_merged += 1
+            self.n_dropped += 1
+            return False
+        if (
+                packed[0] == consts.PLAN_STOP_MODE or
+                self._last_time is None or
+                t - self._last_time >= self.window):
+            if self._pending is not None:
+                self.n_merged += 1
+            self._send(packed, bs, plan, t)
+            return True
+        if self._pending is not None:
+            self.n_merged += 1
+        self._pending = (packed, bs, plan)
+        return False
+
+    def flush(self, t=None):
+        """Send the held plan if the window has passed"""
+        if self._pending is None:
+            return False
+        if t is None:
+            t = time.monotonic()
+        if t - self._last_time < self.window:
+            return False
+        self._send(*(self._pending + (t, )))
+        return True
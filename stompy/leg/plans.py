@@ -9,85 +9,132 @@ Some example plans:
         [3, 2, 20, 0, -15, 0., 0., 0., 10.]
 """
 
+import functools
+import math
+
 import numpy
 
+from .. import affine
 from .. import consts
 from .. import kinematics
-from .. import transforms
 
 
 class Plan(object):
+    """Immutable (and hashable) plan
+
+    linear and angular are stored as tuples of floats and matrix as a
+    read-only array so equal plans compare (and hash) equal and their
+    packed arguments can be cached (see packed)
+    """
+    __slots__ = (
+        'mode', 'frame', 'linear', 'angular', 'matrix', 'speed', '_key')
+
     def __init__(
             self, mode=consts.PLAN_STOP_MODE, frame=consts.PLAN_SENSOR_FRAME,
             linear=None, angular=None, matrix=None, speed=0.):
-        self.mode = mode
-        self.frame = frame
-        self.linear = linear
-        self.angular = angular
-        self.speed = speed
-        self.matrix = matrix
+        if linear is not None:
+            linear = tuple([float(v) for v in linear])
+        if angular is not None:
+            angular = tuple([float(v) for v in angular])
+        if matrix is not None:
+            matrix = numpy.array(matrix, dtype='f8')
+            matrix.flags.writeable = False
+        speed = float(speed)
+        for (k, v) in (
+                ('mode', mode), ('frame', frame), ('linear', linear),
+                ('angular', angular), ('matrix', matrix), ('speed', speed),
+                ('_key', (
+                    mode, frame, linear, angular,
+                    None if matrix is None else matrix.tobytes(), speed))):
+            object.__setattr__(self, k, v)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Plan is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, Plan) and self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __reduce__(self):
+        return (Plan, (
+            self.mode, self.frame, self.linear, self.angular, self.matrix,
+            self.speed))
 
     def packed(self, leg_number):
-        # convert from body to leg
-        if self.linear is None:
-            l = (0., 0., 0.)
-        else:
-            l = self.linear
-        if self.angular is None:
-            a = (0., 0., 0.)
-        else:
-            a = self.angular
-        f = self.frame
-        m = numpy.matrix(self.matrix)
-        if f == consts.PLAN_BODY_FRAME:
-            if leg_number in kinematics.body.body_to_leg_transforms:
-                # convert from body to leg
-                if self.mode == consts.PLAN_STOP_MODE:
-                    # stop: do nothing
-                    pass
-                elif self.mode == consts.PLAN_TARGET_MODE:
-                    # target: convert linear
-                    l = kinematics.body.body_to_leg(
-                        leg_number, l[0], l[1], l[2])
-                elif self.mode == consts.PLAN_VELOCITY_MODE:
-                    # vel: convert linear as vector, just rotate
-                    l = kinematics.body.body_to_leg_rotation(
-                        leg_number, l[0], l[1], l[2])
-                elif self.mode == consts.PLAN_ARC_MODE:
-                    # arc: raise NotImplementedError()
-                    # linear: translate to leg
-                    # angular: rotate to leg
-                    # speed: keep the same
-                    l = kinematics.body.body_to_leg(
-                        leg_number, l[0], l[1], l[2])
-                    a = kinematics.body.body_to_leg_rotation(
-                        leg_number, a[0], a[1], a[2])
-                elif self.mode == consts.PLAN_MATRIX_MODE:
-                    # combine with body transform
-                    m *= kinematics.body.body_to_leg_transforms[leg_number]
-            f = consts.PLAN_LEG_FRAME
-        if self.mode == consts.PLAN_STOP_MODE:
-            return [self.mode, f, self.speed]
-        if self.mode in (consts.PLAN_TARGET_MODE, consts.PLAN_VELOCITY_MODE):
-            return [
-                self.mode, f, l[0], l[1], l[2], self.speed]
-        if self.mode == consts.PLAN_ARC_MODE:
-            return [
-                self.mode, f,
-                l[0], l[1], l[2],
-                a[0], a[1], a[2],
-                self.speed]
-        if self.mode == consts.PLAN_MATRIX_MODE:
-            # don't send last row, assuming this is always 0, 0, 0, 1
-            # I think comando has a bug with >64 byte messages
-            return [
-                self.mode, f,
-                m[0, 0], m[0, 1], m[0, 2], m[0, 3],
-                m[1, 0], m[1, 1], m[1, 2], m[1, 3],
-                m[2, 0], m[2, 1], m[2, 2], m[2, 3],
-                #m[3, 0], m[3, 1], m[3, 2], m[3, 3],
-                self.speed]
-        raise Exception("Unknown mode: %s" % self.mode)
+        """Arguments of the plan command for leg_number (cached)"""
+        return list(_packed(self, leg_number))
+
+
+@functools.lru_cache(maxsize=1024)
+def _packed(plan, leg_number):
+    return tuple(_pack(plan, leg_number))
+
+
+def _pack(plan, leg_number):
+    # convert from body to leg
+    if plan.linear is None:
+        l = (0., 0., 0.)
+    else:
+        l = plan.linear
+    if plan.angular is None:
+        a = (0., 0., 0.)
+    else:
+        a = plan.angular
+    f = plan.frame
+    if plan.mode == consts.PLAN_MATRIX_MODE:
+        m = numpy.asarray(plan.matrix, dtype='f8')
+    if f == consts.PLAN_BODY_FRAME:
+        if leg_number in kinematics.body.body_to_leg_transforms:
+            # convert from body to leg
+            if plan.mode == consts.PLAN_STOP_MODE:
+                # stop: do nothing
+                pass
+            elif plan.mode == consts.PLAN_TARGET_MODE:
+                # target: convert linear
+                l = kinematics.body.body_to_leg(
+                    leg_number, l[0], l[1], l[2])
+            elif plan.mode == consts.PLAN_VELOCITY_MODE:
+                # vel: convert linear as vector, just rotate
+                l = kinematics.body.body_to_leg_rotation(
+                    leg_number, l[0], l[1], l[2])
+            elif plan.mode == consts.PLAN_ARC_MODE:
+                # arc: raise NotImplementedError()
+                # linear: translate to leg
+                # angular: rotate to leg
+                # speed: keep the same
+                l = kinematics.body.body_to_leg(
+                    leg_number, l[0], l[1], l[2])
+                a = kinematics.body.body_to_leg_rotation(
+                    leg_number, a[0], a[1], a[2])
+            elif plan.mode == consts.PLAN_MATRIX_MODE:
+                # combine with body transform
+                m = affine.multiply(
+                    m, kinematics.body.body_to_leg_transforms[leg_number])
+        f = consts.PLAN_LEG_FRAME
+    if plan.mode == consts.PLAN_STOP_MODE:
+        return [plan.mode, f, plan.speed]
+    if plan.mode in (consts.PLAN_TARGET_MODE, consts.PLAN_VELOCITY_MODE):
+        return [
+            plan.mode, f, l[0], l[1], l[2], plan.speed]
+    if plan.mode == consts.PLAN_ARC_MODE:
+        return [
+            plan.mode, f,
+            l[0], l[1], l[2],
+            a[0], a[1], a[2],
+            plan.speed]
+    if plan.mode == consts.PLAN_MATRIX_MODE:
+        # don't send last row, assuming this is always 0, 0, 0, 1
+        # I think comando has a bug with >64 byte messages
+        return (
+            [plan.mode, f] + m[:3].ravel().tolist() +
+            #m[3, 0], m[3, 1], m[3, 2], m[3, 3],
+            [plan.speed, ])
+    raise Exception("Unknown mode: %s" % plan.mode)
 
 
 def stop():
@@ -138,9 +185,9 @@ def follow_plan(xyz, plan, dt=None):
         ax *= plan.speed * dt
         ay *= plan.speed * dt
         az *= plan.speed * dt
-        T = transforms.rotation_about_point_3d(
+        T = affine.rotation_about_point_3d(
             lx, ly, lz, ax, ay, az, degrees=False)
-        nx, ny, nz = transforms.transform_3d(
+        nx, ny, nz = affine.transform_3d(
             T, xyz[0], xyz[1], xyz[2])
 
         #self._ddt += dt
@@ -155,14 +202,60 @@ def follow_plan(xyz, plan, dt=None):
         xyz[1] = ny
         xyz[2] = nz
     elif plan.mode == consts.PLAN_MATRIX_MODE:
-        # call many times if dt > 4 ms)
+        # matrix is applied once per tick, for dt > 1 tick apply
+        # matrix ** ticks (rounded to avoid an extra tick from float error)
         #print("_follow_plan:", plan.matrix)
-        nx, ny, nz = xyz[0], xyz[1], xyz[2]
-        while dt > 0:
-            nx, ny, nz = transforms.transform_3d(
-                plan.matrix, nx, ny, nz)
-            dt -= consts.PLAN_TICK
+        n = max(0, int(math.ceil(round(dt / consts.PLAN_TICK, 6))))
+        if n == 1:
+            T = plan.matrix
+        else:
+            T = affine.matrix_power(plan.matrix, n)
+        nx, ny, nz = affine.transform_3d(T, xyz[0], xyz[1], xyz[2])
         xyz[0] = nx
         xyz[1] = ny
         xyz[2] = nz
     return xyz
+
+
+def predict_path(xyz, plan, horizon, dt=None):
+    """Predict foot path following plan for horizon seconds
+
+    Vectorized follow_plan, returns (times, pts) where times is an [N]
+    array of seconds after xyz (dt, 2 * dt, ... <= horizon) and pts
+    is an [N, 3] array of foot positions at those times.
+    """
+    if dt is None:
+        dt = consts.PLAN_TICK
+    n = int(round(horizon / dt, 6))
+    times = numpy.arange(1, n + 1) * dt
+    xyz = numpy.array(list(xyz)[:3], dtype='f8')
+    if plan is None or plan.mode == consts.PLAN_STOP_MODE:
+        return times, numpy.tile(xyz, (n, 1))
+    if plan.frame != consts.PLAN_LEG_FRAME:
+        raise ValueError("predict_path only supports leg frame plans")
+    if plan.mode == consts.PLAN_VELOCITY_MODE:
+        v = numpy.array(plan.linear, dtype='f8') * plan.speed
+        return times, xyz + times[:, numpy.newaxis] * v
+    if plan.mode == consts.PLAN_TARGET_MODE:
+        l = numpy.array(plan.linear, dtype='f8') - xyz
+        d = numpy.linalg.norm(l)
+        if d < 0.01:
+            return times, numpy.tile(xyz + l, (n, 1))
+        s = numpy.minimum(times * plan.speed, d) / d
+        return times, xyz + s[:, numpy.newaxis] * l
+    if plan.mode == consts.PLAN_ARC_MODE:
+        lx, ly, lz = plan.linear
+        ax, ay, az = plan.angular
+        T = affine.rotation_about_point_3d(
+            lx, ly, lz,
+            ax * plan.speed * dt, ay * plan.speed * dt, az * plan.speed * dt)
+    elif plan.mode == consts.PLAN_MATRIX_MODE:
+        # matrix is per tick, step by as many ticks as follow_plan would
+        T = affine.matrix_power(
+            plan.matrix, max(0, int(math.ceil(round(
+                dt / consts.PLAN_TICK, 6)))))
+    else:
+        raise Exception("Unknown mode: %s" % plan.mode)
+    Ts = affine.matrix_powers(T, n)
+    return times, (
+        numpy.einsum('nij,j->ni', Ts[:, :3, :3], xyz) + Ts[:, :3, 3])
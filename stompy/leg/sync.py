@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""
+Leg teensy configuration sync
+
+Configuration (calibration.setup entries, geometry, ui changes) is a list
+of commands of the form (name, (args)). ConfigSync keys each command by
+what it sets on the teensy (the joint for per-joint commands and the
+joint and geometry code for set_geometry) and remembers the last
+known value of each key. Syncing a list of settings only sends commands
+that differ from the known values. Sent commands are coalesced into
+as few serial writes (usb packets) as possible (see BatchedStream, each
+command is still its own comando frame) and readable values are then
+verified by reading them back (all queries are sent before waiting
+for the replies).
+
+Geometry (set_geometry) has no reply so it can't be read back, it is
+sent the first time it is synced and when it changes.
+"""
+
+import contextlib
+import select
+import threading
+import time
+
+
+# usb full speed packet size, comando messages are not split across packets
+PACKET_SIZE = 64
+
+# commands where the first argument is the joint index
+joint_commands = (
+    'pid_config', 'pwm_limits', 'adc_limits', 'following_error_threshold')
+
+# commands that return the current value when sent with only the key args
+readable_commands = joint_commands + ('dither', 'calf_scale')
+
+
+def setting_key(name, args):
+    """Key of the teensy value set by command name with args"""
+    if name in joint_commands:
+        return (name, args[0])
+    if name == 'set_geometry':
+        return (name, args[0], args[1])
+    return (name, )
+
+
+def same_values(a, b):
+    """Compare args allowing for float32 rounding on the teensy"""
+    if a is None or b is None or len(a) != len(b):
+        return False
+    return all([
+        abs(x - y) <= 1E-6 * max(1., abs(x)) for (x, y) in zip(a, b)])
+
+
+class BatchedStream(object):
+    """Serial port wrapper that can buffer and coalesce writes
+
+    Inside a batch (with stream.batch()), each write (one comando message)
+    is buffered and on exit messages are packed into as few writes of
+    <= PACKET_SIZE bytes as possible. Everything else is passed to
+    the serial port. Bytes read and written are counted (see link).
+    Writes are locked so messages written from other threads (heartbeats)
+    are not interleaved.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self._write_lock = threading.RLock()
+        self._batch = None
+        self.n_writes = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __getattr__(self, attr):
+        return getattr(self.stream, attr)
+
+    def read(self, *args, **kwargs):
+        bs = self.stream.read(*args, **kwargs)
+        with self._write_lock:
+            self.bytes_in += len(bs)
+        return bs
+
+    def counts(self):
+        """Returns (bytes_in, bytes_out, n_writes)"""
+        with self._write_lock:
+            return (self.bytes_in, self.bytes_out, self.n_writes)
+
+    def write(self, bs):
+        with self._write_lock:
+            if self._batch is not None:
+                self._batch.append(bytes(bs))
+                return len(bs)
+            self.n_writes += 1
+            self.bytes_out += len(bs)
+            return self.stream.write(bs)
+
+    @contextlib.contextmanager
+    def batch(self):
+        if self._batch is not None:
+            # already batching
+            yield self
+            return
+        self._batch = []
+        try:
+            yield self
+        finally:
+            with self._write_lock:
+                msgs = self._batch
+                self._batch = None
+            packet = b''
+            for m in msgs:
+                if len(packet) and len(packet) + len(m) > PACKET_SIZE:
+                    self.write(packet)
+                    packet = b''
+                packet += m
+            if len(packet):
+                self.write(packet)
+
+
+class ConfigSync(object):
+    def __init__(self, leg, timeout=1.0):
+        """leg: Teensy with mgr, cmd, com, _stream and _io_lock"""
+        self.leg = leg
+        self.timeout = timeout
+        self.known = {}
+
+    def read(self, keys):
+        """Read back readable keys, returns {key: value or None}
+
+        All queries are sent (in one batch) before waiting for replies
+        which are matched by command name in the order sent. If the leg
+        has a reader thread, it handles the replies (this waits on a
+        condition), otherwise the port is read here (see _read_until).
+        """
+        keys = [k for k in keys if k[0] in readable_commands]
+        values = {}
+        if not len(keys):
+            return values
+        leg = self.leg
+        replies = {}
+        received = threading.Condition()
+
+        def on_reply(name, *args):
+            with received:
+                replies[name].append(tuple([a.value for a in args]))
+                received.notify()
+
+        def done():
+            return sum([len(replies[r]) for r in replies]) >= len(keys)
+
+        with leg._io_lock:
+            # temporarily replace callbacks (restored below)
+            callbacks = dict(leg.cmd.callbacks)
+            for name in set([k[0] for k in keys]):
+                replies[name] = []
+                leg.mgr.on(
+                    name, lambda *args, n=name: on_reply(n, *args))
+        try:
+            with leg._stream.batch():
+                for k in keys:
+                    leg.mgr.trigger(*k)
+            if getattr(leg, '_reader', None) is not None:
+                with received:
+                    received.wait_for(done, self.timeout)
+            else:
+                self._read_until(done)
+        finally:
+            with leg._io_lock:
+                leg.cmd.callbacks = callbacks
+        for k in keys:
+            r = replies[k[0]]
+            values[k] = r.pop(0) if len(r) else None
+        return values
+
+    def _read_until(self, done):
+        """Handle the port until done() or timeout (no reader thread)"""
+        leg = self.leg
+        fd = leg._serial.fileno()
+        t_end = time.monotonic() + self.timeout
+        with leg._io_lock:
+            while not done():
+                dt = t_end - time.monotonic()
+                if dt <= 0:
+                    return
+                r, _, _ = select.select([fd], [], [], dt)
+                if r:
+                    leg.com.handle_stream()
+
+    def diff(self, settings):
+        """Returns ({key: args}, [keys]) of all and changed settings
+
+        Later settings for the same key replace earlier ones.
+        """
+        desired = {}
+        order = []
+        for (name, args) in settings:
+            k = setting_key(name, args)
+            if k not in desired:
+                order.append(k)
+            desired[k] = (name, tuple(args))
+        changed = [
+            k for k in order
+            if not same_values(self.known.get(k), desired[k][1])]
+        return desired, changed
+
+    def sync(self, settings, verify=True):
+        """Send settings that differ from the known teensy state
+
+        On the first sync the readable values are read back to seed the
+        known state. Returns {key: (desired, read back)} for settings
+        that did not verify.
+        """
+        leg = self.leg
+        if not len(self.known):
+            keys = [
+                setting_key(name, args) for (name, args) in settings]
+            self.known.update({
+                k: v for (k, v) in self.read(keys).items()
+                if v is not None})
+        desired, changed = self.diff(settings)
+        leg.log.debug({'config_sync': {
+            'settings': len(desired), 'changed': changed}})
+        if not len(changed):
+            return {}
+        with leg._stream.batch():
+            for k in changed:
+                name, args = desired[k]
+                leg.mgr.trigger(name, *args)
+                self.known[k] = args
+        if not verify:
+            return {}
+        failed = {}
+        for (k, v) in self.read(changed).items():
+            if not same_values(v, desired[k][1]):
+                failed[k] = (desired[k][1], v)
+                # resend on the next sync
+                self.known[k] = v
+        if len(failed):
+            leg.log.error({'config_sync_failed': failed})
+        return failed
+
+
+def geometry_settings(geometry, geom_index_by_name):
+    """set_geometry commands for a LegGeometry"""
+    settings = []
+    for (ji, jn) in enumerate(['hip', 'thigh', 'knee']):
+        j = getattr(geometry, jn)
+        for attr in geom_index_by_name:
+            settings.append((
+                'set_geometry',
+                (ji, geom_index_by_name[attr], float(getattr(j, attr)))))
+    return settings
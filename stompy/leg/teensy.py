@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 
+import collections
 #import glob
 import logging
+import select
 #import subprocess
 import sys
+import threading
 import time
 import traceback
 
@@ -17,15 +20,25 @@ from .. import calibration
 #from .. import geometry
 from .. import kinematics
 from .. import log
+from . import clock
+from . import link
+from . import outbox
 from . import plans
+from . import sync
+from . import telemetry
 from .. import signaler
 from .. import simulation
-from .. import transforms
 from .. import utils
 
 
 logger = logging.getLogger(__name__)
 
+# consts.PLAN_TICK is set by the first leg to connect
+_plan_tick_lock = threading.Lock()
+
+# reports that are only recorded (see telemetry) in telemetry mode
+telemetry_reports = ('adc', 'pid', 'pwm', 'loop_time')
+
 cmds = {
     0: 'heartbeat',
     1: 'estop(byte)=byte',  # 0 = off, 1 = soft, 2 = hard
@@ -64,7 +77,6 @@ class LegController(signaler.Signaler):
         logger.debug("leg number = %s" % (self.leg_number, ))
 
         self.leg_name = consts.LEG_NAME_BY_NUMBER[self.leg_number]
-        self.geometry = kinematics.leg.LegGeometry(self.leg_number)
         #log.info({'leg_name': self.leg_name})
 
         self.log = log.make_logger(self.leg_name)
@@ -78,6 +90,10 @@ class LegController(signaler.Signaler):
         self.pid = {}
         self.pwm = {}
 
+    @property
+    def geometry(self):
+        return kinematics.leg.get_geometry(self.leg_number)
+
     def set_estop(self, value):
         if value != self.estop:
             self.estop = value
@@ -106,10 +122,15 @@ class LegController(signaler.Signaler):
         self.trigger('set_pwm', (hip, thigh, knee))
 
     def send_plan(self, *args, **kwargs):
-        self.plan = self._resolve_plan(*args, **kwargs)
-        self._packed_plan = self.plan.packed(self.leg_number)
-        self.log.info({'plan': self._packed_plan})
-        self.trigger('plan', self._packed_plan)
+        plan = self._resolve_plan(*args, **kwargs)
+        self._plan_sent(plan, plan.packed(self.leg_number))
+
+    def _plan_sent(self, plan, packed):
+        """Set and signal the plan the leg is following"""
+        self.plan = plan
+        self._packed_plan = packed
+        self.log.info({'plan': packed})
+        self.trigger('plan', packed)
 
     def stop(self):
         """Send stop plan"""
@@ -118,6 +139,9 @@ class LegController(signaler.Signaler):
     def pid_joint_config(self, joint_index):
         return {}
 
+    def link_report(self):
+        return {}
+
     def configure(self, settings):
         """takes a list of commands of form (name, (args))"""
         return
@@ -189,8 +213,8 @@ class FakeTeensy(LegController):
             m = pp[0]
             f = pp[1]
             s = pp[-1]
-            matrix = numpy.matrix(numpy.identity(4))
-            matrix[:3, :] = numpy.matrix(numpy.reshape(pp[2:-1], (3, 4)))
+            matrix = numpy.identity(4)
+            matrix[:3, :] = numpy.reshape(pp[2:-1], (3, 4))
             p = plans.Plan(m, f, matrix=matrix, speed=s)
         if m != consts.PLAN_STOP_MODE:
             if f != consts.PLAN_LEG_FRAME:
@@ -307,31 +331,104 @@ def open_port(port, timeout=5.0):
     raise IOError("Failed to connect to teensy on port: %s" % port)
 
 
+def joint_config_requests(joint_index):
+    """(command, args...) needed to read the config of a joint"""
+    return (
+        ('pid_config', joint_index),
+        ('following_error_threshold', joint_index),
+        ('pwm_limits', joint_index),
+        ('adc_limits', joint_index),
+        ('dither', ),
+    )
+
+
+def joint_config_from_replies(pid, fet, pwm, adc, dither):
+    """Build joint config dict from replies to joint_config_requests"""
+    joint_config = {}
+    joint_config['pid'] = {
+        'p': pid[1].value,
+        'i': pid[2].value,
+        'd': pid[3].value,
+        'min': pid[4].value,
+        'max': pid[5].value,
+    }
+    # following error threshold
+    joint_config['following_error_threshold'] = fet[1].value
+
+    # pwm: extend/retract min/max
+    joint_config['pwm'] = {
+        'extend_min': pwm[1].value,
+        'extend_max': pwm[2].value,
+        'retract_min': pwm[3].value,
+        'retract_max': pwm[4].value,
+    }
+
+    # adc limits
+    joint_config['adc'] = {'min': adc[1].value, 'max': adc[2].value}
+
+    # dither
+    joint_config['dither'] = {'time': dither[0].value, 'amp': dither[1].value}
+    return joint_config
+
+
 class Teensy(LegController):
-    def __init__(self, port):
+    def __init__(self, port, threaded=False, telemetry_mode=False):
+        """
+        If threaded, a reader thread drains the serial port and decodes
+        reports which are queued and dispatched (as signals) by update
+
+        In telemetry mode all reports are recorded in telemetry ring
+        buffers and adc, pid, pwm and loop_time reports are only
+        recorded, update sets and signals the latest of each (once per
+        update) and full blocks of records are logged.
+        """
         print("Connecting to teensy on port: %s" % port)
         self.port = port
+        self.threaded = threaded
+        # held while reading the serial port (by handle_stream and
+        # blocking_trigger) when threaded
+        self._io_lock = threading.RLock()
+        self._reports = collections.deque()
+        # receive time of the queued report being dispatched
+        self._recv_time = None
+        self._reader = None
+        self._reader_error = None
+        self._stop_reader = threading.Event()
+        # if False, update does not read the port (see aio)
+        self.poll_io = True
+        # aio.Transport while attached
+        self.transport = None
+        # if False, update does not send heartbeats (see heartbeat)
+        self.auto_heartbeat = True
+        # seconds spent in each stage of connecting
+        self.connect_times = {}
+        t = time.monotonic()
         #self._serial = serial.Serial(self.port, 9600)
         self._serial = open_port(self.port)
+        t = self._time_stage('open', t)
         # set rising edge of RTS to reset comando
         self._serial.setRTS(0)
         self._serial.flushInput()
         self._serial.flushOutput()
         self._serial.setRTS(1)
         #time.sleep(0.5)
-        # start up comando
-        self.com = pycomando.Comando(self._serial)
+        # start up comando, writes can be batched (see sync)
+        self._stream = sync.BatchedStream(self._serial)
+        self.link = link.LinkStats()
+        self.com = pycomando.Comando(self._stream)
         self.cmd = pycomando.protocols.command.CommandProtocol()
         self._text = pycomando.protocols.text.TextProtocol()
 
         self.com.register_protocol(0, self.cmd)
         # used for callbacks
         self.mgr = pycomando.protocols.command.EventManager(self.cmd, cmds)
+        t = self._time_stage('reset', t)
         # easier for calling
         # self.ns = self.mgr.build_namespace()
         # get leg number
         logger.debug("%s Get leg number" % port)
         ln = self.mgr.blocking_trigger('leg_number')[0].value
+        t = self._time_stage('leg_number', t)
         print("Connected to leg %s on port %s" % (ln, port))
         super(Teensy, self).__init__(ln)
 
@@ -341,23 +438,20 @@ class Teensy(LegController):
         self._text.register_callback(print_text)
         self.com.register_protocol(1, self._text)
 
-        # load calibration setup
-        for v in calibration.setup.get(self.leg_number, []):
+        # send calibration setup and leg geometry, only values that
+        # differ from those read back from the teensy are sent
+        self.config = sync.ConfigSync(self)
+        setup = calibration.setup.get(self.leg_number, [])
+        for v in setup:
             self.log.debug({'calibration': v})
             print("calibration: %s" % v)
-            f, args = v
-            logger.debug("Calibration: %s, %s" % (f, args))
-            self.mgr.trigger(f, *args)
-        # write out leg geometry
-        for (ji, jn) in enumerate(['hip', 'thigh', 'knee']):
-            j = getattr(self.geometry, jn)
-            for attr in consts.GEOM_INDEX_BY_NAME:
-                code = consts.GEOM_INDEX_BY_NAME[attr]
-                value = getattr(j, attr)
-                self.log.debug({'set_geometry': (ji, code, value)})
-                self.mgr.trigger('set_geometry', ji, code, value)
-
-        self.mgr.on('estop', self.on_estop)
+        self.config.sync(setup + sync.geometry_settings(
+            self.geometry, consts.GEOM_INDEX_BY_NAME))
+        t = self._time_stage('config', t)
+
+        # drops repeated plans and merges bursts (see outbox)
+        self._outbox = outbox.PlanOutbox(self._send_packed_plan)
+        self._on('estop', self.on_estop)
         self.loop_time_stats = utils.StatsMonitor()
 
         # disable leg
@@ -365,78 +459,138 @@ class Teensy(LegController):
 
         # verify seed time against python code
         seed_time = self.mgr.blocking_trigger('pid_seed_time')[0].value
-        # set plan tick on first leg connected
-        if consts.PLAN_TICK is None:
-            # round to nearest ms
-            consts.PLAN_TICK = numpy.round(seed_time * 1000.) / 1000.
+        # set plan tick on first leg connected (legs connect in parallel)
+        with _plan_tick_lock:
+            if consts.PLAN_TICK is None:
+                # round to nearest ms
+                consts.PLAN_TICK = numpy.round(seed_time * 1000.) / 1000.
         if abs(seed_time - consts.PLAN_TICK) > 1E-9:
             raise ValueError(
                 "PID seed time [%s] for leg %s does not match python %s" %
                 (seed_time, self.leg_number, consts.PLAN_TICK))
+        t = self._time_stage('seed_time', t)
+
+        # report times are corrected by per-report clocks (see clock)
+        latency = clock.measure_latency(
+            lambda: self.mgr.blocking_trigger('report_time'))
+        self.log.info({'report_latency': latency})
+        self.clocks = {
+            n: clock.ReportClock(latency=latency)
+            for n in telemetry.report_dtypes}
+        # the clocks are reset when the report period changes
+        self.report_time = self.mgr.blocking_trigger('report_time')[0].value
+        self._on('report_time', self.on_report_time)
+        t = self._time_stage('clock', t)
 
         # send first heartbeat
         self.send_heartbeat()
 
-        self.mgr.on('report_xyz', self.on_report_xyz)
-        self.mgr.on('report_angles', self.on_report_angles)
-        self.mgr.on('report_pid', self.on_report_pid)
-        self.mgr.on('report_pwm', self.on_report_pwm)
-        self.mgr.on('report_adc', self.on_report_adc)
-        self.mgr.on('report_loop_time', self.on_report_loop_time)
+        self._on('report_xyz', self.on_report_xyz)
+        self._on('report_angles', self.on_report_angles)
+        self._on('report_pid', self.on_report_pid)
+        self._on('report_pwm', self.on_report_pwm)
+        self._on('report_adc', self.on_report_adc)
+        self._on('report_loop_time', self.on_report_loop_time)
+
+        self.telemetry_mode = telemetry_mode
+        self.telemetry = telemetry.Telemetry()
+        # count of each buffer-only report last published by update
+        self._published = {n: 0 for n in telemetry_reports}
+        if telemetry_mode:
+            for n in telemetry_reports:
+                self.telemetry.buffers[n].on(
+                    'block',
+                    lambda b, n=n: self.log.debug({'telemetry': {n: b}}))
 
         self.calibrators = {
             'calf': calibration.CalfCalibrator(),
             # hip, thigh, knee
         }
 
-        # request current calibration values
-        self.calibrators['calf'].attach_manager(self.mgr)
+        # request current calibration values, callbacks are registered
+        # with _on so they are dispatched by update in threaded mode
+        self.calibrators['calf'].attach_manager(self.mgr, on=self._on)
+
+        if self.threaded:
+            self.start_reader()
+        self.connect_times['total'] = sum(self.connect_times.values())
+
+    def _time_stage(self, stage, t0):
+        t = time.monotonic()
+        self.connect_times[stage] = t - t0
+        return t
+
+    def _on(self, name, func):
+        """Register func as callback for name
+
+        All callbacks should be registered through this (not mgr.on).
+        In threaded mode the callback is queued (with its arguments)
+        by the reader thread and called in update
+        """
+        if self.threaded:
+            self.mgr.on(
+                name, lambda *args: self._reports.append(
+                    (name, func, args, time.time())))
+        else:
+            def cb(*args):
+                self.link.frame(name)
+                func(*args)
+            self.mgr.on(name, cb)
+
+    def start_reader(self):
+        if self._reader is not None:
+            return
+        self._stop_reader.clear()
+        self._reader = threading.Thread(target=self._read_loop)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def stop_reader(self):
+        if self._reader is None:
+            return
+        self._stop_reader.set()
+        self._reader.join()
+        self._reader = None
+
+    def close(self):
+        """Stop the reader thread and close the serial port"""
+        self.stop_reader()
+        self._serial.close()
+
+    def _read_loop(self):
+        fd = self._serial.fileno()
+        while not self._stop_reader.is_set():
+            try:
+                r, _, _ = select.select([fd], [], [], 0.1)
+                if r:
+                    with self._io_lock:
+                        t0 = time.monotonic()
+                        self.com.handle_stream()
+                        self.link.decode(time.monotonic() - t0)
+            except Exception as e:
+                # re-raised in update
+                self._reader_error = (e, traceback.format_exc())
+                return
 
     def pid_joint_config(self, joint_index):
         if joint_index in consts.JOINT_INDEX_BY_NAME:
             joint_index = consts.JOINT_INDEX_BY_NAME[joint_index]
         if joint_index not in consts.JOINT_NAME_BY_INDEX:
             return {}
-        joint_config = {}
+        with self._io_lock:
+            return self._pid_joint_config(joint_index)
+
+    def _pid_joint_config(self, joint_index):
         # get pid_config
         #print("Get pid config: %s" % joint_index)
-        r = self.mgr.blocking_trigger('pid_config', joint_index)
-        joint_config['pid'] = {
-            'p': r[1].value,
-            'i': r[2].value,
-            'd': r[3].value,
-            'min': r[4].value,
-            'max': r[5].value,
-        }
-        # following error threshold
-        r = self.mgr.blocking_trigger(
-            'following_error_threshold', joint_index)
-        joint_config['following_error_threshold'] = r[1].value
-
-        # pwm: extend/retract min/max
-        r = self.mgr.blocking_trigger('pwm_limits', joint_index)
-        joint_config['pwm'] = {
-            'extend_min': r[1].value,
-            'extend_max': r[2].value,
-            'retract_min': r[3].value,
-            'retract_max': r[4].value,
-        }
-
-        # adc limits
-        r = self.mgr.blocking_trigger('adc_limits', joint_index)
-        joint_config['adc'] = {'min': r[1].value, 'max': r[2].value}
-
-        # dither
-        r = self.mgr.blocking_trigger('dither')
-        joint_config['dither'] = {'time': r[0].value, 'amp': r[1].value}
-        return joint_config
+        return joint_config_from_replies(*[
+            self.mgr.blocking_trigger(*r)
+            for r in joint_config_requests(joint_index)])
 
     def configure(self, settings):
         """takes a list of commands of form (name, (args))"""
         self.log.debug({'configure': settings})
-        for setting in settings:
-            cmd, args = setting
-            self.mgr.trigger(cmd, *args)
+        return self.config.sync(settings)
 
     def merge_calf_calibration(self):
         # merge into setup calibration
@@ -464,21 +618,39 @@ class Teensy(LegController):
             'offset': cal.offset,
             'slope': cal.slope}})
         # send new calibration to teensy
-        self.mgr.trigger('calf_scale', cal.slope, cal.offset)
+        self.config.sync(
+            [('calf_scale', (cal.slope, cal.offset))], verify=False)
         # merge into setup calibration?
         if merge:
             self.merge_calf_calibration()
 
     def on_estop(self, severity):
         #print("Received estop: %s" % severity)
+        if severity.value != self.estop:
+            self._outbox.reset()
         super(Teensy, self).set_estop(severity.value)
 
     def send_plan(self, *args, **kwargs):
-        super(Teensy, self).send_plan(*args, **kwargs)
-        self.mgr.trigger('plan', *self._packed_plan)
+        """Submit a plan to the outbox
+
+        plan is set and 'plan' is signaled when the plan is sent
+        (see pending_plan for a plan held by the outbox)
+        """
+        plan = self._resolve_plan(*args, **kwargs)
+        self._outbox.submit(plan.packed(self.leg_number), plan=plan)
+
+    def _send_packed_plan(self, packed, plan):
+        self.mgr.trigger('plan', *packed)
+        self._plan_sent(plan, packed)
+
+    @property
+    def pending_plan(self):
+        """Plan submitted but not yet sent (or None)"""
+        return self._outbox.pending_plan
 
     def set_estop(self, value):
         self.mgr.trigger('estop', value)
+        self._outbox.reset()
         super(Teensy, self).set_estop(value)
 
     def set_pwm(self, hip, thigh, knee):
@@ -489,34 +661,71 @@ class Teensy(LegController):
         self.mgr.trigger('enable_pid', value)
         super(Teensy, self).enable_pid(value)
 
+    def set_report_time(self, report_time):
+        """Set the report period (see on_report_time)"""
+        self.mgr.trigger('report_time', report_time)
+
+    def on_report_time(self, report_time):
+        """Reset report clocks if the report period changed"""
+        if report_time.value != self.report_time:
+            self.log.info({'report_time': report_time.value})
+            self.report_time = report_time.value
+            for c in self.clocks.values():
+                c.reset()
+
+    def _report_time(self, name):
+        """Returns (corrected, received) time of the current report"""
+        recv = self._recv_time
+        if recv is None:
+            recv = time.time()
+        return self.clocks[name].update(recv), recv
+
     def on_report_adc(self, hip, thigh, knee, calf):
+        t, recv = self._report_time('adc')
+        if self.telemetry_mode:
+            self.telemetry.record('adc', (
+                t, recv, hip.value, thigh.value, knee.value, calf.value))
+            return
         self.adc = {
             'hip': hip.value, 'thigh': thigh.value,
             'knee': knee.value, 'calf': calf.value,
-            'time': time.time()}
+            'time': t, 'recv_time': recv}
         self.log.debug({'adc': self.adc})
         self.trigger('adc', self.adc)
 
     def on_report_xyz(self, x, y, z):
-        t = time.time()
+        t, recv = self._report_time('xyz')
         x, y, z = x.value, y.value, z.value
+        if self.telemetry_mode:
+            self.telemetry.record('xyz', (t, recv, x, y, z))
         self.xyz = {
             'x': x, 'y': y, 'z': z,
-            'time': t}
+            'time': t, 'recv_time': recv}
         self.log.debug({'xyz': self.xyz})
         self.trigger('xyz', self.xyz)
 
     def on_report_angles(self, h, t, k, c, v):
+        ts, recv = self._report_time('angles')
+        if self.telemetry_mode:
+            self.telemetry.record('angles', (
+                ts, recv, h.value, t.value, k.value, c.value, bool(v)))
         self.angles = {
             'hip': h.value, 'thigh': t.value, 'knee': k.value,
             'calf': c.value,
-            'valid': bool(v), 'time': time.time()}
+            'valid': bool(v), 'time': ts, 'recv_time': recv}
         self.log.debug({'angles': self.angles})
         self.trigger('angles', self.angles)
 
     def on_report_pid(self, ho, to, ko, hs, ts, ks, he, te, ke):
+        t, recv = self._report_time('pid')
+        if self.telemetry_mode:
+            self.telemetry.record('pid', (
+                t, recv, ho.value, to.value, ko.value,
+                hs.value, ts.value, ks.value, he.value, te.value, ke.value))
+            return
         self.pid = {
-            'time': time.time(),
+            'time': t,
+            'recv_time': recv,
             'output': {
                 'hip': ho.value,
                 'thigh': to.value,
@@ -549,13 +758,24 @@ class Teensy(LegController):
                 'h': h.value,
                 't': time.time()}
         """
+        ts, recv = self._report_time('pwm')
+        if self.telemetry_mode:
+            self.telemetry.record(
+                'pwm', (ts, recv, h.value, t.value, k.value))
+            return
         self.pwm = {
             'hip': h.value, 'thigh': t.value, 'knee': k.value,
-            'time': time.time()}
+            'time': ts, 'recv_time': recv}
         self.log.debug({'pwm': self.pwm})
         self.trigger('pwm', self.pwm)
 
     def on_report_loop_time(self, t):
+        if self.telemetry_mode:
+            self.telemetry.record(
+                'loop_time', self._report_time('loop_time') + (t.value, ))
+            return
+        # keep the report clock counting
+        self._report_time('loop_time')
         self.loop_time_stats.update(t.value)
         self.log.debug({'loop_time': t.value})
         self.trigger('loop_time', t.value)
@@ -563,27 +783,96 @@ class Teensy(LegController):
     def send_heartbeat(self):
         self.mgr.trigger('heartbeat')
         self.last_heartbeat = time.time()
+        self.link.heartbeat()
         # print("HB: %s" % self.last_heartbeat)
 
+    def _handle_stream_error(self, e, tbs):
+        self.link.error()
+        print("Leg %s handle stream error: %s" % (self.leg_number, e))
+        self.log.error("handle_stream error: %s" % e)
+        print(tbs)
+        self.log.error({'error': {
+            'traceback': tbs,
+            'exception': e}})
+        raise e
+
+    def _dispatch_reports(self):
+        if self._reader_error is not None:
+            e, tbs = self._reader_error
+            self._reader = None
+            self._handle_stream_error(e, tbs)
+        # only dispatch reports queued before this call
+        n = len(self._reports)
+        self.link.queue(n)
+        for _ in range(n):
+            name, func, args, self._recv_time = self._reports.popleft()
+            self.link.frame(name)
+            func(*args)
+        self._recv_time = None
+
+    def _publish_telemetry(self):
+        """Set and signal the latest buffer-only reports"""
+        for n in telemetry_reports:
+            b = self.telemetry.buffers[n]
+            if b.count == self._published[n]:
+                continue
+            if n == 'loop_time':
+                records, self._published[n] = b.since(self._published[n])
+                for v in records['loop_time']:
+                    self.loop_time_stats.update(int(v))
+                self.trigger('loop_time', int(records['loop_time'][-1]))
+                continue
+            self._published[n] = b.count
+            if n == 'pid':
+                self.pid = telemetry.pid_record_to_dict(b.latest())
+            else:
+                setattr(self, n, telemetry.record_to_dict(b.latest()))
+            self.trigger(n, getattr(self, n))
+
     def update(self):
-        try:
-            self.com.handle_stream()
-        except Exception as e:
-            ex_type, ex, tb = sys.exc_info()
-            print("Leg %s handle stream error: %s" % (self.leg_number, e))
-            tbs = '\n'.join(traceback.format_tb(tb))
-            self.log.error("handle_stream error: %s" % e)
-            print(tbs)
-            self.log.error({'error': {
-                'traceback': tbs,
-                'exception': e}})
-            raise e
-        if (time.time() - self.last_heartbeat) > consts.HEARTBEAT_PERIOD:
+        if self.threaded:
+            self._dispatch_reports()
+        elif self.poll_io:
+            try:
+                t0 = time.monotonic()
+                self.com.handle_stream()
+                self.link.decode(time.monotonic() - t0)
+            except Exception as e:
+                ex_type, ex, tb = sys.exc_info()
+                self._handle_stream_error(
+                    e, '\n'.join(traceback.format_tb(tb)))
+        if self.telemetry_mode:
+            self._publish_telemetry()
+        self._outbox.flush()
+        if (
+                self.auto_heartbeat and
+                (time.time() - self.last_heartbeat) >
+                consts.HEARTBEAT_PERIOD):
             self.send_heartbeat()
-
-
-def connect_to_teensies(ports=None):
-    """Return dict with {leg_number: teensy}"""
+        if self.link.due():
+            r = self.link.report(
+                self._stream,
+                sum([self.clocks[n].dropped for n in self.clocks]))
+            self.log.debug({'link_stats': r})
+            self.trigger('link_stats', r)
+
+    def link_report(self):
+        """Link stats of the last full period (see link)"""
+        return self.link.last_report
+
+
+def connect_to_teensies(
+        ports=None, threaded=False, timeout=30.0, telemetry_mode=False):
+    """Return dict with {leg_number: teensy}
+
+    threaded: read each teensy in its own thread (see Teensy)
+    telemetry_mode: only record high rate reports (see Teensy)
+    timeout: seconds allowed to connect to each teensy
+
+    Teensies are connected in parallel, ports that fail to connect
+    (serial errors or timeouts) are reported and skipped, configuration
+    errors (a seed time mismatch) are raised.
+    """
     if ports is None:
         #tinfo = utils.find_leg_teensies()
         #ports = [i['port'] for i in tinfo]
@@ -596,7 +885,19 @@ def connect_to_teensies(ports=None):
     if len(ports) == 0:
         return {ln: FakeTeensy(ln) for ln in [1, 2, 3, 4, 5, 6]}
         #return {ln: FakeTeensy(ln) for ln in [1, 3, 4, 6]}
-    teensies = [Teensy(p) for p in ports]
+    connected, errors = utils.connect_in_parallel(
+        lambda p: Teensy(
+            p, threaded=threaded, telemetry_mode=telemetry_mode),
+        ports, timeout, close=lambda t: t.close())
+    for p in errors:
+        print("Failed to connect to leg teensy on %s: %s" % (p, errors[p]))
+        logger.error("Failed to connect to %s: %s" % (p, errors[p]))
+    teensies = [connected[p] for p in ports if p in connected]
+    for t in teensies:
+        print("Leg %s [%s] connect times: %s" % (
+            t.leg_number, t.port, ', '.join([
+                '%s=%.3f' % (k, t.connect_times[k])
+                for k in sorted(t.connect_times)])))
     lnd = {}
     for t in teensies:
         ln = t.leg_number
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Fixed layout ring buffers for leg reports
+
+In telemetry mode (see Teensy) each report (with corrected and receive
+times, see clock) is stored as one record (numpy structured array row)
+in a preallocated per-leg, per-report ring buffer. Recording a report is one
+row assignment (no dicts, logging or signals) so reports can arrive
+faster than the rest of the code wants to look at them.
+
+Consumers either poll (records since a count, the latest record) or
+subscribe to 'block' which is triggered with a copy of each block of
+block_size records as it is filled:
+
+    leg.telemetry.buffers['pid'].on('block', lambda b: b['error_hip'])
+"""
+
+import numpy
+
+from .. import signaler
+
+
+report_dtypes = {
+    'adc': numpy.dtype([
+        ('time', 'f8'), ('recv_time', 'f8'),
+        ('hip', 'u4'), ('thigh', 'u4'), ('knee', 'u4'), ('calf', 'u4')]),
+    'xyz': numpy.dtype([
+        ('time', 'f8'), ('recv_time', 'f8'),
+        ('x', 'f4'), ('y', 'f4'), ('z', 'f4')]),
+    'angles': numpy.dtype([
+        ('time', 'f8'), ('recv_time', 'f8'),
+        ('hip', 'f4'), ('thigh', 'f4'), ('knee', 'f4'), ('calf', 'f4'),
+        ('valid', '?')]),
+    'pid': numpy.dtype([('time', 'f8'), ('recv_time', 'f8')] + [
+        ('%s_%s' % (k, jn), 'f4')
+        for k in ('output', 'set_point', 'error')
+        for jn in ('hip', 'thigh', 'knee')]),
+    'pwm': numpy.dtype([
+        ('time', 'f8'), ('recv_time', 'f8'),
+        ('hip', 'i4'), ('thigh', 'i4'), ('knee', 'i4')]),
+    'loop_time': numpy.dtype([
+        ('time', 'f8'), ('recv_time', 'f8'), ('loop_time', 'u4')]),
+}
+
+
+def record_to_dict(record):
+    """Convert one record to a flat dict of python values"""
+    return {k: record[k].item() for k in record.dtype.names}
+
+
+def pid_record_to_dict(record):
+    """Convert a pid record to the nested dict used by Teensy.pid"""
+    return {
+        'time': record['time'].item(),
+        'recv_time': record['recv_time'].item(),
+        'output': {
+            jn: record['output_%s' % jn].item()
+            for jn in ('hip', 'thigh', 'knee')},
+        'set_point': {
+            jn: record['set_point_%s' % jn].item()
+            for jn in ('hip', 'thigh', 'knee')},
+        'error': {
+            jn: record['error_%s' % jn].item()
+            for jn in ('hip', 'thigh', 'knee')},
+    }
+
+
+class RingBuffer(signaler.Signaler):
+    def __init__(self, dtype, size=4096, block_size=256):
+        """size must be a multiple of block_size so blocks never wrap"""
+        super(RingBuffer, self).__init__()
+        if size % block_size:
+            raise ValueError(
+                "size[%s] must be a multiple of block_size[%s]" % (
+                    size, block_size))
+        self.data = numpy.zeros(size, dtype=dtype)
+        self.size = size
+        self.block_size = block_size
+        # total number of records appended
+        self.count = 0
+
+    def append(self, record):
+        """Append one record (a tuple in dtype field order)"""
+        i = self.count % self.size
+        self.data[i] = record
+        self.count += 1
+        if self.count % self.block_size == 0:
+            self.trigger(
+                'block', self.data[i + 1 - self.block_size:i + 1].copy())
+
+    def latest(self):
+        """Most recent record or None"""
+        if self.count == 0:
+            return None
+        return self.data[(self.count - 1) % self.size]
+
+    def last(self, n):
+        """Copy of the last n (or fewer) records, oldest first"""
+        n = min(n, self.count, self.size)
+        return self.data.take(
+            numpy.arange(self.count - n, self.count) % self.size)
+
+    def since(self, count):
+        """Records appended after count, returns (records, new count)
+
+        Records that were overwritten since count are lost
+        """
+        return self.last(self.count - count), self.count
+
+
+class Telemetry(object):
+    def __init__(self, size=4096, block_size=256):
+        self.buffers = {
+            k: RingBuffer(report_dtypes[k], size, block_size)
+            for k in report_dtypes}
+
+    def record(self, name, record):
+        self.buffers[name].append(record)
+
+    def latest(self, name):
+        return self.buffers[name].latest()
+
@@ -1,18 +1,61 @@
 #!/usr/bin/env python
 """
 Write timestamped dicts to pickle file
+
+Full batches of events are pickled and written by a background thread
+(see Writer) so logging never blocks on disk io (unless the writer
+falls behind by more than max_queued batches).
+
+Loggers can also write columns (see ColumnWriter). Events of the form
+{'timestamp': t, name: {field: value, ...}} (fields can be one level
+of nested dicts, or a single value) with numeric or bool values are
+appended to one raw binary file per event name and field:
+
+    <directory>/<name>.<field>.col
+
+with the dtypes in <directory>/schema.json (timestamp and fields ending
+with 'time' are float64, other floats are float32, ints are int64).
+All other events are pickled as before. load_columns memory maps
+the columns, load_dir merges them back into events.
+
+After each pickled file is written a line is appended to the index
+(<directory>/index.jsonl) with the file name, size (in bytes), number
+of events, first and last timestamp and number of events with each
+key. Readers (load_dir with keys, Dataset, get_by_key and
+find_adc_limits) use it to only load files with the needed keys and
+times (and fall back to loading files missing from the index).
+Each batch of columns appended is also indexed with the event name,
+row range and first and last timestamp (see load_column_index),
+Dataset uses these to find the rows of a time range.
+
+Pickled files can be compressed (Logger compression 'gzip' or 'lzma')
+and are then named .p.gz or .p.xz. Readers detect compression by name
+and unpickle while decompressing (so old uncompressed files still load).
+Columns are not compressed (so they can be memory mapped).
 """
 
 import atexit
+import collections
 import datetime
 import glob
+import gzip
+import json
 import logging
 import os
 try:
     import cPickle as pickle
 except ImportError:
     import pickle
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import threading
 import time
+try:
+    import lzma
+except ImportError:
+    lzma = None
 
 import numpy
 import pylab
@@ -28,7 +71,145 @@ def find_newest_log():
         if os.path.isdir(os.path.join(ld, d))])[-1]
 
 
-def load_dir(d=None):
+def load_columns(d):
+    """Returns {name: {field: array}} of memory mapped columns in d"""
+    ld = os.path.expanduser(d)
+    sfn = os.path.join(ld, 'schema.json')
+    if not os.path.exists(sfn):
+        return {}
+    with open(sfn, 'r') as f:
+        schema = json.load(f)
+    columns = {}
+    for name in schema:
+        cs = {}
+        for field in schema[name]:
+            fn = os.path.join(ld, column_filename(name, field))
+            dtype = numpy.dtype(schema[name][field])
+            if not os.path.exists(fn) or os.path.getsize(fn) < dtype.itemsize:
+                cs[field] = numpy.zeros(0, dtype=dtype)
+            else:
+                cs[field] = numpy.memmap(fn, dtype=dtype, mode='r')
+        # truncate to the shortest column (in case of a partial write)
+        n = min([len(cs[k]) for k in cs])
+        columns[name] = {k: cs[k][:n] for k in cs}
+    return columns
+
+
+def columns_to_events(columns):
+    """Convert load_columns output back to a list of events"""
+    evs = []
+    for name in columns:
+        cs = columns[name]
+        fields = [k for k in cs if k != 'timestamp']
+        values = {k: cs[k].tolist() for k in fields}
+        for (i, ts) in enumerate(cs['timestamp'].tolist()):
+            if fields == ['']:
+                evs.append({'timestamp': ts, name: values[''][i]})
+                continue
+            e = {}
+            for k in fields:
+                if '.' in k:
+                    h, t = k.split('.', 1)
+                    e.setdefault(h, {})[t] = values[k][i]
+                else:
+                    e[k] = values[k][i]
+            evs.append({'timestamp': ts, name: e})
+    return evs
+
+
+# pickled file name suffix by compression
+chunk_suffixes = {
+    None: '.p',
+    'gzip': '.p.gz',
+    'lzma': '.p.xz',
+}
+
+
+def chunk_name(fn):
+    """Returns (index, write time) from a pickled file name"""
+    i, t = os.path.basename(fn).split('.')[0].split('_')
+    return int(i), int(t)
+
+
+def chunk_files(d):
+    """Pickled event files in d sorted by index"""
+    fns = []
+    for suffix in chunk_suffixes.values():
+        fns.extend(glob.glob(os.path.join(d, '*' + suffix)))
+    return sorted(fns, key=lambda fn: chunk_name(fn)[0])
+
+
+def open_chunk(fn, mode='rb', level=None):
+    """Open a pickled file, (de)compressing based on the name"""
+    if fn.endswith(chunk_suffixes['gzip']):
+        if level is None:
+            return gzip.open(fn, mode)
+        return gzip.open(fn, mode, compresslevel=level)
+    if fn.endswith(chunk_suffixes['lzma']):
+        if lzma is None:
+            raise IOError("lzma is not available to open %s" % fn)
+        return lzma.open(fn, mode, preset=level)
+    return open(fn, mode)
+
+
+def load_chunk(fn):
+    with open_chunk(fn) as f:
+        return pickle.load(f, encoding='latin1')
+
+
+def load_index(d):
+    """Returns {file name: index entry} for log directory d"""
+    ifn = os.path.join(os.path.expanduser(d), 'index.jsonl')
+    index = {}
+    if not os.path.exists(ifn):
+        return index
+    with open(ifn, 'r') as f:
+        for l in f:
+            try:
+                e = json.loads(l)
+            except ValueError:
+                # partially written line
+                continue
+            if 'file' in e:
+                index[e['file']] = e
+    return index
+
+
+def load_column_index(d):
+    """Returns {name: [column batch index entry, ...]} for directory d
+
+    Entries are in the order written with rows [row0, row1) of
+    the columns of name having timestamps from t0 to t1
+    """
+    ifn = os.path.join(os.path.expanduser(d), 'index.jsonl')
+    index = {}
+    if not os.path.exists(ifn):
+        return index
+    with open(ifn, 'r') as f:
+        for l in f:
+            try:
+                e = json.loads(l)
+            except ValueError:
+                # partially written line
+                continue
+            if 'columns' in e:
+                index.setdefault(e['columns'], []).append(e)
+    return index
+
+
+def _has_keys(entry, keys):
+    return entry is None or any([k in entry['keys'] for k in keys])
+
+
+def load_dir(d=None, columns=True, keys=None):
+    """Load events from a log directory
+
+    If columns is True, columnar events are converted back to events
+    and merged (by timestamp) with the pickled events
+
+    If keys is not None, only events with one of keys are returned
+    (and only files that the index shows have one of keys are loaded)
+    """
     if d is None:
         d = find_newest_log()
     ld = os.path.expanduser(d)
@@ -37,18 +218,220 @@ def load_dir(d=None):
         if os.path.isdir(os.path.join(ld, i))]
     # update for per-leg logs
     if len(sds):
-        return {sd: load_dir(os.path.join(ld, sd)) for sd in sds}
-    fns = glob.glob(os.path.join(d, '*.p'))
-    fns = sorted(
-        fns, key=lambda fn: int(
-            os.path.splitext(os.path.basename(fn))[0].split('_')[0]))
+        return {
+            sd: load_dir(os.path.join(ld, sd), columns, keys)
+            for sd in sds}
     evs = []
-    for fn in fns:
-        with open(fn, 'rb') as f:
-            evs.extend(pickle.load(f, encoding='latin1'))
+    index = load_index(ld) if keys is not None else {}
+    for fn in chunk_files(ld):
+        if keys is None:
+            evs.extend(load_chunk(fn))
+            continue
+        if not _has_keys(index.get(os.path.basename(fn)), keys):
+            continue
+        evs.extend([
+            e for e in load_chunk(fn) if any([k in e for k in keys])])
+    if columns:
+        cs = load_columns(ld)
+        if keys is not None:
+            cs = {k: cs[k] for k in cs if k in keys}
+        cevs = columns_to_events(cs)
+        if len(cevs):
+            evs = sorted(evs + cevs, key=lambda e: e.get('timestamp', 0))
     return evs
 
 
+class Dataset(object):
+    """Lazily loaded log directory
+
+    Only the pickled files (chunks) that overlap a time range are
+    loaded (and a few are cached). Each chunk is named with the time
+    it was written so chunk i has events with timestamps between the
+    times of chunk i - 1 and chunk i (+1 second for rounding). Keys in
+    each chunk are recorded when it is first loaded so later queries
+    for other keys skip it. Columns (see ColumnWriter) are memory mapped
+    and filtered by timestamp without loading.
+
+        ds = log.Dataset()
+        for e in ds.events('fr', 'xyz', t0, t0 + 600):
+            ...
+    """
+    def __init__(self, d=None, cache_size=4):
+        if d is None:
+            d = find_newest_log()
+        self.directory = os.path.expanduser(d)
+        sds = sorted([
+            i for i in os.listdir(self.directory)
+            if os.path.isdir(os.path.join(self.directory, i))])
+        if len(sds):
+            self.dirs = {
+                sd: os.path.join(self.directory, sd) for sd in sds}
+        else:
+            self.dirs = {None: self.directory}
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._chunks = {}
+        self._columns = {}
+        self._column_index = {}
+
+    @property
+    def legs(self):
+        return sorted(self.dirs.keys())
+
+    def chunks(self, leg=None):
+        """[{'filename', 't0', 't1', 'keys' (None until loaded)}, ...]
+
+        Times and keys are from the index if the chunk is in it
+        """
+        if leg not in self._chunks:
+            chunks = []
+            t0 = -numpy.inf
+            index = load_index(self.dirs[leg])
+            for fn in chunk_files(self.dirs[leg]):
+                bn = os.path.basename(fn)
+                t = chunk_name(bn)[1]
+                if bn in index and index[bn]['t0'] is not None:
+                    e = index[bn]
+                    chunks.append({
+                        'filename': fn, 't0': e['t0'], 't1': e['t1'],
+                        'keys': set(e['keys'])})
+                else:
+                    chunks.append({
+                        'filename': fn, 't0': t0, 't1': t + 1,
+                        'keys': None})
+                t0 = t
+            self._chunks[leg] = chunks
+        return self._chunks[leg]
+
+    def columns(self, leg=None):
+        if leg not in self._columns:
+            self._columns[leg] = load_columns(self.dirs[leg])
+        return self._columns[leg]
+
+    @property
+    def time_range(self):
+        """(first, last) timestamps of all chunks and columns
+
+        Times are from the index, for chunks missing from it the
+        first chunk is loaded and the last end time is approximate
+        """
+        ts = []
+        for leg in self.legs:
+            cs = self.chunks(leg)
+            if len(cs):
+                if numpy.isfinite(cs[0]['t0']):
+                    ts.append(cs[0]['t0'])
+                else:
+                    ts.extend([
+                        e['timestamp'] for e in self._load(cs[0])
+                        if 'timestamp' in e])
+                ts.append(cs[-1]['t1'])
+            for c in self.columns(leg).values():
+                if len(c['timestamp']):
+                    ts.extend([c['timestamp'][0], c['timestamp'][-1]])
+        if not len(ts):
+            return None
+        return min(ts), max(ts)
+
+    def _load(self, chunk):
+        fn = chunk['filename']
+        if fn in self._cache:
+            self._cache.move_to_end(fn)
+            return self._cache[fn]
+        evs = load_chunk(fn)
+        if chunk['keys'] is None:
+            keys = set()
+            for e in evs:
+                keys.update(e.keys())
+            chunk['keys'] = keys
+        self._cache[fn] = evs
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return evs
+
+    def column_index(self, leg=None):
+        """Column batches (see load_column_index)"""
+        if leg not in self._column_index:
+            self._column_index[leg] = load_column_index(self.dirs[leg])
+        return self._column_index[leg]
+
+    def _column_rows(self, leg, key, t0, t1, n):
+        """Rows [r0, r1) of batches of key that overlap t0 to t1"""
+        batches = self.column_index(leg).get(key, [])
+        # batches must cover all rows to skip any
+        if (
+                not len(batches) or batches[0]['row0'] != 0 or
+                batches[-1]['row1'] < n):
+            return 0, n
+        lo = -numpy.inf if t0 is None else t0
+        hi = numpy.inf if t1 is None else t1
+        rows = [
+            (b['row0'], b['row1']) for b in batches
+            if b['t1'] >= lo and b['t0'] <= hi]
+        if not len(rows):
+            return 0, 0
+        return min([r[0] for r in rows]), min(n, max([r[1] for r in rows]))
+
+    def _column_slice(self, leg, key, t0, t1):
+        cs = self.columns(leg).get(key, None)
+        if cs is None:
+            return None
+        r0, r1 = self._column_rows(leg, key, t0, t1, len(cs['timestamp']))
+        ts = cs['timestamp'][r0:r1]
+        i0 = 0 if t0 is None else numpy.searchsorted(ts, t0, 'left')
+        i1 = len(ts) if t1 is None else numpy.searchsorted(ts, t1, 'right')
+        return {k: cs[k][r0 + i0:r0 + i1] for k in cs}
+
+    def events(self, leg=None, key=None, t0=None, t1=None):
+        """Generate events (with key if not None) from t0 to t1"""
+        lo = -numpy.inf if t0 is None else t0
+        hi = numpy.inf if t1 is None else t1
+        for c in self.chunks(leg):
+            if c['t1'] < lo or c['t0'] > hi:
+                continue
+            if key is not None and c['keys'] is not None and (
+                    key not in c['keys']):
+                continue
+            for e in self._load(c):
+                if key is not None and key not in e:
+                    continue
+                ts = e.get('timestamp', None)
+                if ts is not None and (ts < lo or ts > hi):
+                    continue
+                yield e
+        if key is None:
+            names = list(self.columns(leg).keys())
+        else:
+            names = [key]
+        for name in names:
+            cs = self._column_slice(leg, name, t0, t1)
+            if cs is not None:
+                for e in columns_to_events({name: cs}):
+                    yield e
+
+    def get_by_key(self, leg, key, t0=None, t1=None):
+        """Values of key from t0 to t1 (like get_by_key)"""
+        return [e[key] for e in self.events(leg, key, t0, t1)]
+
+    def array(self, leg, key, field=None, t0=None, t1=None):
+        """Returns (timestamps, values) arrays of key[field] from t0 to t1
+
+        field can be a dotted sub key (e.g. 'output.hip'), if None the
+        value of key is used. Columns are sliced without copying.
+        """
+        cs = self._column_slice(leg, key, t0, t1)
+        if cs is not None:
+            f = '' if field is None else field
+            if f in cs:
+                return cs['timestamp'], cs[f]
+        ts = []
+        vs = []
+        for e in self.events(leg, key, t0, t1):
+            ts.append(e.get('timestamp', numpy.nan))
+            vs.append(e[key] if field is None else _dget(e[key], field))
+        return numpy.array(ts), numpy.array(vs)
+
+
 def _dget(d, k):
     if '.' not in k:
         return d[k]
@@ -57,6 +440,9 @@ def _dget(d, k):
 
 
 def get_by_key(d, k, legs=None, remove_empty=True):
+    if isinstance(d, (str, unicode)):
+        # only load files with key
+        d = load_dir(d, keys=[k])
     if isinstance(d, (list, tuple)):
         return [i[k] for i in d if k in i]
     if legs is None:
@@ -90,21 +476,38 @@ def plot_events(d, value=None, legs=None):
 
 def plot_key(
         data, key, subkeys=None, show=True, name=None, legend=True,
-        normalize_time=True, remove_imu=True, remove_base=True):
+        normalize_time=True, remove_imu=True, remove_base=True,
+        t0=None, t1=None):
+    """Plot key for each leg in data (a directory, Dataset or load_dir)
+
+    t0, t1: only plot events with timestamps in this range, for a
+    directory or Dataset only the overlapping files are loaded
+    """
     if isinstance(data, (str, unicode)):
         if name is None:
             name = data
-        data = load_dir(data)
-    legs = sorted(data.keys())
+        data = Dataset(data)
+    if isinstance(data, Dataset):
+        legs = data.legs
+    else:
+        legs = sorted(data.keys())
     if 'base' in legs and remove_base:
         legs.remove('base')
     if 'imu' in legs and remove_imu:
         legs.remove('imu')
-    ld = {l: get_by_key(data[l], key) for l in legs}
+    if isinstance(data, Dataset):
+        ld = {l: data.get_by_key(l, key, t0, t1) for l in legs}
+    else:
+        ld = {
+            l: get_by_key(filter_events(data[l], lambda e: (
+                (t0 is None or e.get('timestamp', t0) >= t0) and
+                (t1 is None or e.get('timestamp', t1) <= t1))), key)
+            for l in legs}
+    legs = [l for l in legs if len(ld[l])]
     if subkeys is None:
         # get keys from first event
-        e = list(ld.values())[0][0]
-        ks = e.keys()
+        e = ld[legs[0]][0]
+        ks = list(e.keys())
         if 'time' in ks:
             ks.remove('time')
         subkeys = []
@@ -120,17 +523,17 @@ def plot_key(
     nsk = len(subkeys)
     if normalize_time:
         # get initial time
-        t0 = min([ld[l][0]['time'] for l in legs])
+        tn = min([ld[l][0]['time'] for l in legs])
     else:
-        t0 = 0
-    for i in xrange(len(subkeys)):
+        tn = 0
+    for i in range(len(subkeys)):
         if i == 0:
             ax = pylab.subplot(nsk, 1, 1 + i)
         else:
             pylab.subplot(nsk, 1, 1 + i, sharex=ax)
         for l in legs:
             pylab.plot(
-                [e['time'] - t0 for e in ld[l]],
+                [e['time'] - tn for e in ld[l]],
                 [_dget(e, subkeys[i]) for e in ld[l]], label=l)
         pylab.ylabel(subkeys[i])
     if name is not None:
@@ -145,11 +548,11 @@ def plot_key(
 
 def find_adc_limits(d=None, joints=None, legs=None):
     if isinstance(d, (str, unicode)) or d is None:
-        d = load_dir(d)
+        d = load_dir(d, keys=['adc'])
     if joints is None:
         joints = ['hip', 'thigh', 'knee', 'calf']
     if legs is None:
-        legs = d.keys()
+        legs = list(d.keys())
         if 'base' in legs:
             legs.remove('base')
     adc_limits = {}
@@ -167,25 +570,325 @@ def find_adc_limits(d=None, joints=None, legs=None):
     return adc_limits
 
 
+def write_events(fp, events, level=None):
+    """Pickle events to fp (compressed at level based on the name)"""
+    d = os.path.dirname(fp)
+    if not os.path.exists(d):
+        os.makedirs(d)
+    with open_chunk(fp, 'wb', level) as f:
+        pickle.dump(events, f, pickle.HIGHEST_PROTOCOL)
+    append_index(fp, events)
+
+
+def append_index(fp, events):
+    """Append the index entry of events written to fp"""
+    keys = {}
+    t0 = None
+    t1 = None
+    for e in events:
+        for k in e:
+            if k != 'timestamp':
+                keys[k] = keys.get(k, 0) + 1
+        ts = e.get('timestamp', None)
+        if ts is not None:
+            t0 = ts if t0 is None else min(t0, ts)
+            t1 = ts if t1 is None else max(t1, ts)
+    entry = {
+        'file': os.path.basename(fp), 'bytes': os.path.getsize(fp),
+        'n': len(events), 't0': t0, 't1': t1, 'keys': keys}
+    _append_index_entry(os.path.dirname(fp), entry)
+
+
+def append_column_index(directory, name, row0, timestamps):
+    """Append the index entry of a batch of columns of name
+
+    timestamps are of the batch appended at rows [row0, row1)
+    """
+    entry = {
+        'columns': name, 'row0': row0, 'row1': row0 + len(timestamps),
+        't0': float(numpy.min(timestamps)),
+        't1': float(numpy.max(timestamps))}
+    _append_index_entry(directory, entry)
+
+
+def _append_index_entry(directory, entry):
+    with open(os.path.join(directory, 'index.jsonl'), 'a') as f:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+
+
+def column_filename(name, field):
+    if field == '':
+        return '%s.col' % (name, )
+    return '%s.%s.col' % (name, field)
+
+
+def _column_dtype(field, value):
+    if isinstance(value, (bool, numpy.bool_)):
+        return '?'
+    if isinstance(value, (int, numpy.integer)):
+        return 'i8'
+    if isinstance(value, (float, numpy.floating)):
+        if field == 'timestamp' or field.endswith('time'):
+            return 'f8'
+        return 'f4'
+    return None
+
+
+def _event_columns(event):
+    """Returns (name, {field: value}) or None if event is not columnar"""
+    if len(event) != 2 or 'timestamp' not in event:
+        return None
+    name = [k for k in event if k != 'timestamp'][0]
+    if not isinstance(name, str) or '.' in name:
+        return None
+    v = event[name]
+    if not isinstance(v, dict):
+        return name, {'timestamp': event['timestamp'], '': v}
+    fields = {'timestamp': event['timestamp']}
+    for k in v:
+        if not isinstance(k, str) or '.' in k or k == 'timestamp':
+            return None
+        if isinstance(v[k], dict):
+            for sk in v[k]:
+                if not isinstance(sk, str):
+                    return None
+                fields['%s.%s' % (k, sk)] = v[k][sk]
+        else:
+            fields[k] = v[k]
+    return name, fields
+
+
+class ColumnWriter(object):
+    """Append columnar events to per name and field files in directory
+
+    The schema of each event name is set by the first event, later
+    events that don't match it are returned (to be pickled).
+    Each batch of rows appended is indexed (see append_column_index).
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        sfn = os.path.join(directory, 'schema.json')
+        self.schema = {}
+        if os.path.exists(sfn):
+            with open(sfn, 'r') as f:
+                self.schema = json.load(f)
+        # {name: number of rows written}
+        self._rows = {}
+
+    def _row_count(self, name):
+        if name not in self._rows:
+            # columns written before (by another writer)
+            fn = os.path.join(
+                self.directory, column_filename(name, 'timestamp'))
+            n = 0
+            if os.path.exists(fn):
+                n = os.path.getsize(fn) // numpy.dtype(
+                    self.schema[name]['timestamp']).itemsize
+            self._rows[name] = n
+        return self._rows[name]
+
+    def _match(self, name, fields):
+        if name not in self.schema:
+            dtypes = {}
+            for k in fields:
+                dtypes[k] = _column_dtype(k, fields[k])
+                if dtypes[k] is None:
+                    return False
+            self.schema[name] = dtypes
+            return True
+        dtypes = self.schema[name]
+        if len(dtypes) != len(fields):
+            return False
+        for k in fields:
+            if k not in dtypes:
+                return False
+            dt = _column_dtype(k, fields[k])
+            if dt is None or (dt != dtypes[k] and not (
+                    dt == 'i8' and dtypes[k] in ('f4', 'f8'))):
+                return False
+        return True
+
+    def write(self, events):
+        """Append columnar events, returns the events that aren't"""
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        n_names = len(self.schema)
+        columns = {}
+        other = []
+        for e in events:
+            r = _event_columns(e)
+            if r is None or not self._match(*r):
+                other.append(e)
+                continue
+            name, fields = r
+            cs = columns.setdefault(name, {k: [] for k in fields})
+            for k in fields:
+                cs[k].append(fields[k])
+        if len(self.schema) != n_names:
+            with open(os.path.join(self.directory, 'schema.json'), 'w') as f:
+                json.dump(self.schema, f, indent=2, sort_keys=True)
+        for name in columns:
+            row0 = self._row_count(name)
+            for k in columns[name]:
+                a = numpy.array(columns[name][k], dtype=self.schema[name][k])
+                fn = os.path.join(self.directory, column_filename(name, k))
+                with open(fn, 'ab') as f:
+                    f.write(a.tobytes())
+            ts = columns[name]['timestamp']
+            append_column_index(self.directory, name, row0, ts)
+            self._rows[name] = row0 + len(ts)
+        return other
+
+
+def write_columns(column_writer, fp, events, level=None):
+    other = column_writer.write(events)
+    if len(other):
+        write_events(fp, other, level)
+
+
+class Writer(object):
+    """Write batches of events from a background thread
+
+    At most max_queued batches wait to be written, submitting more
+    blocks (back-pressure) until one is written. stats reports the
+    queue depth and how often (and how long) submit blocked.
+    """
+    def __init__(self, max_queued=16):
+        self.max_queued = max_queued
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.n_written = 0
+        self.n_errors = 0
+        self.n_blocked = 0
+        self.blocked_time = 0.
+        self.write_time = 0.
+        self.max_depth = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                t0 = time.monotonic()
+                func, args = job
+                try:
+                    func(*args)
+                    self.n_written += 1
+                except Exception as e:
+                    self.n_errors += 1
+                    logging.getLogger(__name__).error(
+                        "Failed to write log %s: %s" % (args, e))
+                self.write_time += time.monotonic() - t0
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fp, events, level=None):
+        """Queue events to be written (pickled) to file fp"""
+        self.submit_job(write_events, fp, events, level)
+
+    def submit_job(self, func, *args):
+        """Queue func(*args) to be called by the writer thread"""
+        self._start()
+        job = (func, args)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.n_blocked += 1
+            t0 = time.monotonic()
+            self._queue.put(job)
+            self.blocked_time += time.monotonic() - t0
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def flush(self):
+        """Block until all queued events are written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self):
+        """Write all queued events and stop the thread"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'max_queued': self.max_queued,
+            'max_depth': self.max_depth,
+            'written': self.n_written,
+            'errors': self.n_errors,
+            'blocked': self.n_blocked,
+            'blocked_time': self.blocked_time,
+            'write_time': self.write_time,
+        }
+
+
+writer = Writer()
+# registered before any logger so it runs after their final writes
+atexit.register(writer.stop)
+
+
 class Logger(object):
-    def __init__(self, directory, events_per_file=10000):
+    def __init__(
+            self, directory, events_per_file=10000, writer=None,
+            columnar=False, compression=None, compression_level=None):
+        """If writer is None events are written by the module writer
+
+        If columnar, write columnar events to columns (see ColumnWriter)
+
+        compression: None, 'gzip' or 'lzma' for pickled files
+        compression_level: gzip compresslevel or lzma preset (None for
+        the module default)
+        """
+        if compression not in chunk_suffixes:
+            raise ValueError("Unknown log compression: %s" % compression)
+        if compression == 'lzma' and lzma is None:
+            raise ValueError("lzma is not available")
         self.level = logging.DEBUG
         self._dir = directory
         self._events = []
         self._file_index = 0
         self.events_per_file = events_per_file
+        self._writer = writer
+        self.columnar = columnar
+        self.compression = compression
+        self.compression_level = compression_level
+        self._column_writer = None
 
     def _write_events(self):
         if len(self._events) == 0:
             return
-        # write to disk
-        if not os.path.exists(self._dir):
-            os.makedirs(self._dir)
-        # directory/index_timestamp.p
-        fn = '%04i_%s.p' % (self._file_index, int(time.time()))
+        # directory/index_timestamp.p[.gz|.xz]
+        fn = '%04i_%s%s' % (
+            self._file_index, int(time.time()),
+            chunk_suffixes[self.compression])
         fp = os.path.join(self._dir, fn)
-        with open(fp, 'wb') as f:
-            pickle.dump(self._events, f, pickle.HIGHEST_PROTOCOL)
+        level = self.compression_level
+        w = self._writer
+        if w is None:
+            w = writer
+        if self.columnar:
+            if (
+                    self._column_writer is None or
+                    self._column_writer.directory != self._dir):
+                self._column_writer = ColumnWriter(self._dir)
+            w.submit_job(
+                write_columns, self._column_writer, fp, self._events, level)
+        else:
+            w.submit(fp, self._events, level)
         self._events = []
         self._file_index += 1
 
@@ -230,6 +933,11 @@ log_directory = os.path.join(
     '.stompy', 'logs',
     start_time.strftime('%y%m%d_%H%M%S'))
 base_log_directory = os.path.join(log_directory, 'base')
+# if True, loggers made by make_logger write columns
+default_columnar = False
+# compression (and level) of pickled files for make_logger loggers
+default_compression = None
+default_compression_level = None
 
 logger = Logger(base_log_directory)
 
@@ -242,9 +950,16 @@ debug = logger.debug
 atexit.register(logger._write_events)
 
 
-def make_logger(name):
+def make_logger(name, columnar=None, compression=None):
+    """columnar and compression default to the module settings"""
+    if columnar is None:
+        columnar = default_columnar
+    if compression is None:
+        compression = default_compression
     ldir = os.path.join(log_directory, name)
     #print("Making logger: %s" % ldir)
-    l = Logger(ldir)
+    l = Logger(
+        ldir, columnar=columnar, compression=compression,
+        compression_level=default_compression_level)
     atexit.register(l._write_events)
     return l
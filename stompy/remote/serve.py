@@ -9,6 +9,7 @@ import tornado.web
 from tornado.websocket import WebSocketHandler
 
 from . import agent
+from .. import aio
 from .. import controller
 from . import protocol
 
@@ -118,8 +119,11 @@ class ObjectHandler(WebSocketHandler):
         self.loop.add_callback(self.write_message, message)
 
 
-def serve(addr=None, port=5000):
+def serve(addr=None, port=5000, async_io=False):
     c = controller.build()
+    if async_io:
+        # read serial ports from the ioloop instead of polling in update
+        aio.attach(c, tornado.ioloop.IOLoop.current().asyncio_loop)
 
     # setup periodic update
     cb = tornado.ioloop.PeriodicCallback(c.update, 10.0)
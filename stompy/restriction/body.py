@@ -45,6 +45,8 @@ it will produce 'requests' for plans that will be 'accepted'
 
 import math
 
+import numpy
+
 from .. import consts
 from .. import kinematics
 from . import leg
@@ -197,8 +199,10 @@ class Body(signaler.Signaler):
             self.feet[i].reset()
 
     def offset_foot_centers(self, dx, dy):
-        for i in self.feet:
-            ldx, ldy, _ = kinematics.body.body_to_leg_rotation(i, dx, dy, 0.)
+        legs = sorted(self.feet)
+        ldxys = kinematics.body.body_to_leg_rotation_all(
+            (dx, dy, 0.), legs)[:, :2].tolist()
+        for (i, (ldx, ldy)) in zip(legs, ldxys):
             # TODO limit to inside limits
             # don't allow -X offset?
             if self.param['limit_center_x_shifts'] and ldx < 0:
@@ -213,14 +217,9 @@ class Body(signaler.Signaler):
 
         # find furthest foot
         x, y = bxy
-        z = 0.
-        mr = None
-        for i in self.feet:
-            tx, ty, tz = kinematics.body.body_to_leg(i, x, y, z)
-            r = tx * tx + ty * ty + tz * tz
-            if mr is None or r > mr:
-                mr = r
-        mr = math.sqrt(mr)
+        txyz = kinematics.body.body_to_leg_all(
+            (x, y, 0.), sorted(self.feet))
+        mr = math.sqrt(numpy.max(numpy.sum(txyz * txyz, axis=1)))
         # account for radius sign
         rspeed = speed / mr
         max_rspeed = (
@@ -24,13 +24,15 @@ it will produce 'requests' for plans that will be 'accepted'
 import math
 import time
 
+import numpy
+
+from .. import affine
 from .. import consts
 #from .. import geometry
 from .. import kinematics
 from ..leg import plans
 from .. import log
 from .. import signaler
-from .. import transforms
 
 
 class LegTarget(object):
@@ -42,12 +44,13 @@ class LegTarget(object):
         bx, by = body_target.rotation_center
         rx, ry, rz = kinematics.body.body_to_leg(
             leg_number, bx, by, 0)
-        lT = transforms.rotation_about_point_3d(
+        lT = affine.rotation_about_point_3d(
             rx, ry, rz, 0, 0, body_target.speed)
 
         # add z change
         if body_target.dz != 0.0:
-            lT = lT * transforms.translation_3d(0, 0, body_target.dz)
+            lT = affine.multiply(
+                lT, affine.translation_3d(0, 0, body_target.dz))
         
         self.leg_matrix = lT
         self.swing_info = (rx, ry, body_target.speed)
@@ -74,6 +77,11 @@ class Foot(signaler.Signaler):
             consts.LEG_NAME_BY_NUMBER[self.leg.leg_number])
         self.leg.on('xyz', self.on_xyz)
         self.leg.on('angles', self.on_angles)
+        # calf angle tables for this foot (the leg geometry is shared)
+        self._tables = None
+        # drop tables built for old calf angles
+        for p in ('res.target_calf_angle', 'res.fields.calf_angle.max'):
+            self.param.on(p, lambda v: self.clear_tables())
         self.last_lift_time = time.time()
 
         self.leg_target = None  # target in leg coordinates
@@ -84,11 +92,23 @@ class Foot(signaler.Signaler):
         self.state = None
         self.restriction = None
         self.xyz = None
+        # last foot position (xyz is cleared after every update)
+        self.last_xyz = None
         self.angles = None
         self.restriction_modifier = 0.
         self.center_offset = (0, 0)
         self.halted = False
 
+    def clear_tables(self):
+        self._tables = None
+
+    def get_tables(self):
+        """Calf angle tables for the current leg geometry"""
+        g = self.leg.geometry
+        if self._tables is None or self._tables.geometry is not g:
+            self._tables = kinematics.tables.CalfTables(g)
+        return self._tables
+
     def set_halt(self, value):
         self.halted = value
         self.send_plan()
@@ -99,7 +119,7 @@ class Foot(signaler.Signaler):
 
     def calculate_swing_target(self):
         if self.unloaded_height is None:
-            z = self.xyz['z'] + self.param['res.lift_height']
+            z = self.last_xyz['z'] + self.param['res.lift_height']
         else:
             z = self.unloaded_height + self.param['res.lift_height']
         min_hip_distance = (
@@ -115,9 +135,47 @@ class Foot(signaler.Signaler):
             target_calf_angle=tcar,
             max_calf_angle=mcar,
             x_offset=self.center_offset[0],
-            y_offset=self.center_offset[1])
+            y_offset=self.center_offset[1],
+            tables=self.get_tables())
         return sp[0], sp[1], z
 
+    def clamp_swing_target(self, target, steps=8):
+        """Move an unreachable swing target toward the foot
+
+        Returns target if it is reachable, else the reachable point
+        nearest to target (found by bisection over steps) on the line
+        from the last foot position (or the center position if the foot
+        position is unknown or not reachable) to target or None if
+        neither is reachable.
+        """
+        geometry = self.leg.geometry
+        if geometry.is_reachable(*target):
+            return target
+        x0 = None
+        if self.last_xyz is not None:
+            x0, y0, z0 = (
+                self.last_xyz['x'], self.last_xyz['y'], self.last_xyz['z'])
+        if x0 is None or not geometry.is_reachable(x0, y0, z0):
+            x0, y0, z0 = self.calculate_center_position()
+            if not geometry.is_reachable(x0, y0, z0):
+                return None
+
+        def point(f):
+            return (
+                x0 + (target[0] - x0) * f,
+                y0 + (target[1] - y0) * f,
+                z0 + (target[2] - z0) * f)
+
+        # reachable and unreachable fractions of the way to target
+        lo, hi = 0., 1.
+        for _ in range(steps):
+            f = (lo + hi) / 2.
+            if geometry.is_reachable(*point(f)):
+                lo = f
+            else:
+                hi = f
+        return point(lo)
+
     def should_lift(self):
         if self.restriction_modifier > 0:
             return True
@@ -149,43 +207,47 @@ class Foot(signaler.Signaler):
             return True, func
         return False, cache_function
 
+    def _joint_angle_function(self, jn):
+        cr, cf = self._in_cache(
+            jn + '_angle',
+            'res.fields.joint_angle.eps',
+            'res.fields.joint_angle.inflection',
+            'res.fields.joint_angle.range')
+        if not cr:
+            eps = math.log(self.param['res.fields.joint_angle.eps'])
+            inflection = self.param['res.fields.joint_angle.inflection']
+            range_ratio = self.param['res.fields.joint_angle.range']
+
+            # actual min/max
+            jmin, jmax = self.limits[jn]
+            
+            # limit range
+            jr = (jmax - jmin) * range_ratio
+            # centered on midpoint
+            jmid = (jmax + jmin) / 2.
+            # limited min/max
+            jmin, jmax = jmid - jr / 2, jmid + jr / 2
+
+            # inflection point
+            ipt = jr * inflection
+
+            # function needs:
+            v = eps/ipt
+            jr2 = jr / 2
+            cf = cf(
+                lambda a, v=v, jr2=jr2, jmid=jmid:
+                numpy.minimum(
+                    1.0, numpy.exp(v * (jr2 - numpy.abs(a - jmid)))))
+        return cf
+
     def calculate_joint_angle_restriction(self, angles):
         r = {}
         for jn in consts.JOINT_NAMES:
-            cr, cf = self._in_cache(
-                jn + '_angle',
-                'res.fields.joint_angle.eps',
-                'res.fields.joint_angle.inflection',
-                'res.fields.joint_angle.range')
-            if not cr:
-                eps = math.log(self.param['res.fields.joint_angle.eps'])
-                inflection = self.param['res.fields.joint_angle.inflection']
-                range_ratio = self.param['res.fields.joint_angle.range']
-
-                # actual min/max
-                jmin, jmax = self.limits[jn]
-                
-                # limit range
-                jr = (jmax - jmin) * range_ratio
-                # centered on midpoint
-                jmid = (jmax + jmin) / 2.
-                # limited min/max
-                jmin, jmax = jmid - jr / 2, jmid + jr / 2
-
-                # inflection point
-                ipt = jr * inflection
-
-                # function needs:
-                v = eps/ipt
-                jr2 = jr / 2
-                cf = cf(
-                    lambda a, v=v, jr2=jr2, jmid=jmid:
-                    min(1.0, math.exp(v * (jr2 - abs(a - jmid)))))
-            r[jn] = cf(angles[jn])
+            r[jn] = float(self._joint_angle_function(jn)(angles[jn]))
         r['r'] = max(r.values())
         return r
 
-    def calculate_calf_angle_restriction(self, angles):
+    def _calf_angle_function(self):
         cr, cf = self._in_cache(
             'calf_angle',
             'res.fields.calf_angle.max',
@@ -196,14 +258,17 @@ class Foot(signaler.Signaler):
             calf_eps = math.log(self.param['res.fields.calf_angle.eps'])
             ipt = max_calf_angle * self.param['res.fields.calf_angle.inflection']
             v = calf_eps / ipt
-            cf = cf(lambda ca, v=v: min(1.0, math.exp(v * ca)))
+            cf = cf(
+                lambda ca, v=v: numpy.minimum(1.0, numpy.exp(v * ca)))
+        return cf
 
+    def calculate_calf_angle_restriction(self, angles):
         ca = abs(self.leg.geometry.angles_to_calf_angle(
                 angles['hip'], angles['thigh'], angles['knee']))
-        r = cf(ca)
+        r = float(self._calf_angle_function()(ca))
         return {'r': r, 'calf_angle': ca}
 
-    def calculate_hip_distance_restriction(self, xyz):
+    def _hip_distance_function(self):
         cr, cf = self._in_cache(
             'hip_distance',
             'min_hip_distance',
@@ -214,11 +279,14 @@ class Foot(signaler.Signaler):
                 self.param['min_hip_distance'] +
                 self.param['res.fields.min_hip.buffer'])
             v = math.log(self.param['res.fields.min_hip.eps'])/min_hip_distance
-            cf = cf(lambda x, v=v: min(1.0, math.exp(v * x)))
-        r = cf(xyz['x'])
+            cf = cf(lambda x, v=v: numpy.minimum(1.0, numpy.exp(v * x)))
+        return cf
+
+    def calculate_hip_distance_restriction(self, xyz):
+        r = float(self._hip_distance_function()(xyz['x']))
         return {'r': r}
 
-    def calculate_foot_center_restriction(self, xyz):
+    def _foot_center_function(self):
         cr, cf = self._in_cache(
             'foot_center',
             'res.fields.center.eps',
@@ -229,12 +297,16 @@ class Foot(signaler.Signaler):
                     -math.log(self.param['res.fields.center.eps']) /
                     self.param['res.fields.center.inflection'])
             c = self.param['res.fields.center.radius']
-            cf = cf(lambda d, v=v, c=c: min(1.0, math.exp((d - c) * v)))
+            cf = cf(
+                lambda d, v=v, c=c: numpy.minimum(1.0, numpy.exp((d - c) * v)))
+        return cf
+
+    def calculate_foot_center_restriction(self, xyz):
         cx, cy, cz = self.calculate_center_position()
         dx = (xyz['x'] - cx)
         dy = (xyz['y'] - cy)
         dr = math.sqrt(dx * dx + dy * dy)
-        r = cf(dr)
+        r = float(self._foot_center_function()(dr))
         return {'r': r, 'center': (cx, cy, cz)}
     
     def calculate_restriction(self, xyz, angles):
@@ -247,6 +319,48 @@ class Foot(signaler.Signaler):
         info['r'] = max([info[k]['r'] for k in info])
         return info
 
+    def predict_restriction(self, horizon, xyz=None, plan=None, dt=None):
+        """Predict restriction over the next horizon seconds
+
+        Follows plan (default: stance plan of the current target) from xyz
+        (default: last foot position) using plans.predict_path and computes
+        joint angles and restriction for every step at once.
+        Returns a dict of arrays:
+            - time: seconds after xyz [N]
+            - xyz: foot positions [N, 3]
+            - angles: joint angles (hip, thigh, knee) [N, 3], nan if invalid
+            - valid: foot position is reachable [N]
+            - calf_angle: [N]
+            - r: restriction (including modifier, 1.0 if invalid) [N]
+        """
+        if xyz is None:
+            xyz = self.last_xyz
+        if xyz is None:
+            raise ValueError("No foot position to predict restriction from")
+        if isinstance(xyz, dict):
+            xyz = (xyz['x'], xyz['y'], xyz['z'])
+        if plan is None and self.leg_target is not None:
+            plan = self.leg_target.stance_plan
+        times, pts = plans.predict_path(xyz, plan, horizon, dt)
+        angles, valid = self.leg.geometry.points_to_angles_array(pts)
+        with numpy.errstate(invalid='ignore'):
+            rs = [
+                self._joint_angle_function(jn)(angles[:, i])
+                for (i, jn) in enumerate(consts.JOINT_NAMES)]
+            ca = numpy.abs(
+                self.leg.geometry.angles_to_calf_angle_array(angles))
+            rs.append(self._calf_angle_function()(ca))
+            rs.append(self._hip_distance_function()(pts[:, 0]))
+            cx, cy, _ = self.calculate_center_position()
+            rs.append(self._foot_center_function()(
+                numpy.hypot(pts[:, 0] - cx, pts[:, 1] - cy)))
+            r = numpy.max(rs, axis=0)
+        r[~valid] = 1.0
+        r += self.restriction_modifier
+        return {
+            'time': times, 'xyz': pts, 'angles': angles, 'valid': valid,
+            'calf_angle': ca, 'r': r}
+
     def calculate_center_position(self):
         """
         c0z: center z coordinate
@@ -259,7 +373,8 @@ class Foot(signaler.Signaler):
         max_calf_angle = math.radians(self.param['res.fields.calf_angle.max'])
         c0x, c0y = self.leg.geometry.xy_center_at_z(
             c0z, target_calf_angle, max_calf_angle,
-            self.center_offset[0], self.center_offset[1])
+            self.center_offset[0], self.center_offset[1],
+            tables=self.get_tables())
         return c0x, c0y, c0z
 
     def send_plan(self):
@@ -268,9 +383,25 @@ class Foot(signaler.Signaler):
             # TODO always stop on disable?
             return self.leg.send_plan(mode=consts.PLAN_STOP_MODE)
         if self.state == 'swing':
-            self.swing_target = self.calculate_swing_target()
-            # TODO check if point is valid
-            # TODO error out on invalid
+            target = self.calculate_swing_target()
+            self.swing_target = self.clamp_swing_target(target)
+            if self.swing_target != target:
+                self.logger.error({'invalid_swing_target': {
+                    'swing_target': target,
+                    'clamped_target': self.swing_target,
+                    'distance_to_limit':
+                        self.leg.geometry.distance_to_limit(*target),
+                }})
+            if self.swing_target is None:
+                # no reachable target to swing to, stop here (so swing
+                # finishes and the foot is lowered)
+                if self.last_xyz is None:
+                    self.swing_target = self.calculate_center_position()
+                else:
+                    self.swing_target = (
+                        self.last_xyz['x'], self.last_xyz['y'],
+                        self.last_xyz['z'])
+                return self.leg.send_plan(mode=consts.PLAN_STOP_MODE)
             self.leg.send_plan(
                 mode=consts.PLAN_TARGET_MODE,
                 frame=consts.PLAN_LEG_FRAME,
@@ -284,7 +415,7 @@ class Foot(signaler.Signaler):
                     self.param['speed.swing_scale']))
         else:  # not swing [stance, wait, lower, lift]
             if self.halted:
-                T = transforms.translation_3d(0, 0, self.leg_target.body_target.dz)
+                T = affine.translation_3d(0, 0, self.leg_target.body_target.dz)
             else:
                 T = self.leg_target.leg_matrix
             if self.state == 'lift':
@@ -292,17 +423,15 @@ class Foot(signaler.Signaler):
                     self.param['speed.foot'] *
                     self.param['speed.scalar'] *
                     self.param['speed.lift_scale'])
-                T = (
-                    T *
-                    transforms.translation_3d(0, 0, v * consts.PLAN_TICK))
+                T = affine.multiply(
+                    T, affine.translation_3d(0, 0, v * consts.PLAN_TICK))
             elif self.state == 'lower':
                 v = -(
                     self.param['speed.foot'] *
                     self.param['speed.scalar'] *
                     self.param['speed.lower_scale'])
-                T = (
-                    T *
-                    transforms.translation_3d(0, 0, v * consts.PLAN_TICK))
+                T = affine.multiply(
+                    T, affine.translation_3d(0, 0, v * consts.PLAN_TICK))
             self.leg.send_plan(
                 mode=consts.PLAN_MATRIX_MODE,
                 frame=consts.PLAN_LEG_FRAME,
@@ -377,6 +506,7 @@ class Foot(signaler.Signaler):
 
     def on_xyz(self, xyz):
         self.xyz = xyz
+        self.last_xyz = xyz
         if self.angles is not None:
             self.update()
 
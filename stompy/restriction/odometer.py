@@ -7,10 +7,10 @@ import time
 import numpy
 import pylab
 
+from .. import affine
 from .. import consts
 from .. import kinematics
 from .. import signaler
-from .. import transforms
 
 
 class Odometer(signaler.Signaler):
@@ -46,13 +46,13 @@ class Odometer(signaler.Signaler):
         p = self.position
         a = self.angle
         dz = p[2]
-        #T = transforms.affine_2d(-p[0], -p[1], -a)
-        T = (
-            transforms.rotation_2d(-a) *
-            transforms.translation_2d(-p[0], -p[1]))
+        #T = affine.affine_2d(-p[0], -p[1], -a)
+        T = affine.multiply(
+            affine.rotation_2d(-a),
+            affine.translation_2d(-p[0], -p[1]))
 
         def transform_point(pt, T=T, dz=dz, a=a):
-            x, y = transforms.transform_2d(
+            x, y = affine.transform_2d(
                 T,
                 pt['position'][0],
                 pt['position'][1])
@@ -96,13 +96,13 @@ class Odometer(signaler.Signaler):
         # store residual partial ticks to be reused if the target is the same
         self._rticks = ticks - iticks
 
-        T = transforms.rotation_about_point_2d(
+        # iticks rotations about the same point are one rotation
+        # by iticks * speed
+        T = affine.rotation_about_point_2d(
             self.target.rotation_center[0],
             self.target.rotation_center[1],
-            self.target.speed)
-        pos = [0., 0.]
-        for _ in range(iticks):
-            pos = transforms.transform_2d(T, *pos)
+            self.target.speed * iticks)
+        pos = affine.transform_2d(T, 0., 0.)
         sa = math.sin(self.angle)
         ca = math.cos(self.angle)
         self.position[0] -= ca * pos[0] - sa * pos[1]
@@ -168,9 +168,9 @@ class FakeTerrain(signaler.Signaler):
         if self.im is None:
             return
         # compute foot positions in pixel coordinates from pose
-        T = (
-            transforms.rotation_2d(pose['angle']) *
-            transforms.translation_2d(
+        T = affine.multiply(
+            affine.rotation_2d(pose['angle']),
+            affine.translation_2d(
                 pose['position'][0], pose['position'][1]))
 
         # update legs with heights computed from pixels
@@ -183,7 +183,7 @@ class FakeTerrain(signaler.Signaler):
             bxyz = kinematics.body.leg_to_body(
                 ln, leg.xyz['x'], leg.xyz['y'], leg.xyz['z'])
             # convert to 'global' coordinates
-            x, y = transforms.transform_2d(T, bxyz[0], bxyz[1])
+            x, y = affine.transform_2d(T, bxyz[0], bxyz[1])
             # offset by pixel center
             ix = min(
                 self.im.shape[1] - 1, max(
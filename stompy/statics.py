@@ -20,8 +20,8 @@ import math
 
 import numpy
 
+from . import affine
 from . import signaler
-from . import transforms
 
 
 def point_to_line_2d(pt, l1, l2):
@@ -178,8 +178,8 @@ class Stance(signaler.Signaler):
         # TODO throttle?
         # project COM down by height by pitch and roll
         roll, pitch, yaw = self.heading
-        R = transforms.rotation_3d(pitch, roll, 0., degrees=True)
-        self.COG = transforms.transform_3d(
+        R = affine.rotation_3d(pitch, roll, 0., degrees=True)
+        self.COG = affine.transform_3d(
             R, self.COM[0], self.COM[1], self.height)
         self.trigger('COG', self.COG)
         if self.support_polygon is not None and len(self.support_polygon):
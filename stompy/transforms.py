@@ -1,39 +1,34 @@
 #!/usr/bin/env python
+"""
+numpy.matrix versions of the transforms in affine.py
 
-import math
+These are kept for older code and scripts that compose transforms with '*'.
+New code (and anything in the control loop) should use affine.py.
+"""
 
 import numpy
 
+from . import affine
+
 
 def translation_2d(x, y):
-    return numpy.matrix(
-        [[1., 0., x], [0., 1., y], [0., 0., 1.]])
+    return numpy.asmatrix(affine.translation_2d(x, y))
 
 
 def rotation_2d(a, degrees=False):
-    if degrees:
-        a = math.radians(a)
-    sa = math.sin(a)
-    ca = math.cos(a)
-    return numpy.matrix(
-        [[ca, -sa, 0.], [sa, ca, 0.], [0., 0., 1.]])
+    return numpy.asmatrix(affine.rotation_2d(a, degrees))
 
 
 def affine_2d(x, y, a, degrees=False):
-    #return rotation(a, degrees) * translation(x, y)
-    return translation_2d(x, y) * rotation_2d(a, degrees)
+    return numpy.asmatrix(affine.affine_2d(x, y, a, degrees))
 
 
 def rotation_about_point_2d(x, y, a, degrees=False):
-    return (
-        translation_2d(x, y) *
-        rotation_2d(a, degrees) *
-        translation_2d(-x, -y))
+    return numpy.asmatrix(affine.rotation_about_point_2d(x, y, a, degrees))
 
 
 def transform_2d(m, x, y):
-    r = m * [[x], [y], [1.]]
-    return float(r[0]), float(r[1])
+    return affine.transform_2d(m, x, y)
 
 
 def homogeneous_2d(pts):
@@ -49,78 +44,30 @@ def nonhomogeneous_2d(pts):
 
 
 def transform_2d_array(m, pts):
-    r = m * homogeneous_2d(pts)
-    return nonhomogeneous_2d(r)
+    return affine.transform_2d_array(m, pts)
 
 
 def translation_3d(x, y, z):
-    return numpy.matrix([
-        [1.0, 0., 0., x],
-        [0., 1.0, 0., y],
-        [0., 0., 1.0, z],
-        [0., 0., 0., 1.]])
+    return numpy.asmatrix(affine.translation_3d(x, y, z))
 
 
 def rotation_3d(xa, ya, za, degrees=False):
     """Applied as x, y, z"""
-    if xa != 0.:
-        if degrees:
-            xa = math.radians(xa)
-        sx = math.sin(xa)
-        cx = math.cos(xa)
-        rx = numpy.matrix([
-            [1.0, 0., 0., 0.],
-            [0., cx, -sx, 0.],
-            [0., sx, cx, 0.],
-            [0., 0., 0., 1.]])
-    else:
-        rx = numpy.matrix(numpy.identity(4, dtype='f8'))
-    if ya != 0.:
-        if degrees:
-            ya = math.radians(ya)
-        sy = math.sin(ya)
-        cy = math.cos(ya)
-        ry = numpy.matrix([
-            [cy, 0., sy, 0.],
-            [0., 1., 0., 0.],
-            [-sy, 0., cy, 0.],
-            [0., 0., 0., 1.]])
-    else:
-        ry = numpy.matrix(numpy.identity(4, dtype='f8'))
-    if za != 0.:
-        if degrees:
-            za = math.radians(za)
-        sz = math.sin(za)
-        cz = math.cos(za)
-        rz = numpy.matrix([
-            [cz, -sz, 0., 0.],
-            [sz, cz, 0., 0.],
-            [0., 0., 1., 0.],
-            [0., 0., 0., 1.]])
-    else:
-        rz = numpy.matrix(numpy.identity(4, dtype='f8'))
-    #return rx * ry * rz
-    return rz * ry * rx
+    return numpy.asmatrix(affine.rotation_3d(xa, ya, za, degrees))
 
 
 def affine_3d(x, y, z, xa, ya, za, degrees=False):
     """Applied as rotation then translation"""
-    #return rotation(a, degrees) * translation(x, y)
-    return (
-        translation_3d(x, y, z) *
-        rotation_3d(xa, ya, za, degrees))
+    return numpy.asmatrix(affine.affine_3d(x, y, z, xa, ya, za, degrees))
 
 
 def rotation_about_point_3d(x, y, z, xa, ya, za, degrees=False):
-    return (
-        translation_3d(x, y, z) *
-        rotation_3d(xa, ya, za, degrees) *
-        translation_3d(-x, -y, -z))
+    return numpy.asmatrix(
+        affine.rotation_about_point_3d(x, y, z, xa, ya, za, degrees))
 
 
 def transform_3d(m, x, y, z):
-    r = m * [[x], [y], [z], [1.]]
-    return float(r[0]), float(r[1]), float(r[2])
+    return affine.transform_3d(m, x, y, z)
 
 
 def homogeneous_3d(pts):
@@ -136,8 +83,7 @@ def nonhomogeneous_3d(pts):
 
 
 def transform_3d_array(m, pts):
-    r = m * homogeneous_3d(pts)
-    return nonhomogeneous_3d(r)
+    return affine.transform_3d_array(m, pts)
 
 
 def blend(t0, t1, n):
@@ -26,10 +26,13 @@ class Leg(object):
         self.knee = 0.
         self.calf = 0.
         self.number = number
-        # TODO make this not a hack
-        self.geometry = kinematics.leg.LegGeometry(self.number)
         self.restriction = {}
 
+    @property
+    def geometry(self):
+        # TODO make this not a hack
+        return kinematics.leg.get_geometry(self.number)
+
     def set_angles(self, hip, thigh, knee, calf=0.):
         self.hip = hip
         self.thigh = thigh
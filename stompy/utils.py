@@ -1,8 +1,11 @@
 #!/usr/bin/env python
 
+import bisect
 #import glob
 import os
 #import subprocess
+import threading
+import time
 
 import teensyloader
 
@@ -102,6 +105,65 @@ def reset_teensies_by_type(teensy_types=None):
                 dev=s, mcu="TEENSY32")
 
 
+def connect_in_parallel(connect, ports, timeout=30.0, close=None):
+    """Call connect(port) for all ports at once (each in a daemon thread)
+
+    Returns dicts of ({port: connect result}, {port: exception}).
+    A port that raises an IOError (serial errors) or does not connect
+    within timeout seconds is put in the errors dict and does not stop
+    the other ports. Any other exception (a configuration error) is
+    re-raised once all ports are done (or timed out) after closing the
+    ports that did connect.
+
+    Threads are daemon threads so a connect that hangs does not block
+    interpreter exit. A connect that finishes after the timeout is
+    closed (with close(result), if provided) as nothing else can reach it.
+    """
+    connected = {}
+    errors = {}
+    if len(ports) == 0:
+        return connected, errors
+    lock = threading.Lock()
+    timed_out = set()
+
+    def run(port):
+        try:
+            r = connect(port)
+        except Exception as e:
+            with lock:
+                errors[port] = e
+            return
+        with lock:
+            late = port in timed_out
+            if not late:
+                connected[port] = r
+        if late and close is not None:
+            close(r)
+
+    threads = {}
+    for p in ports:
+        threads[p] = threading.Thread(target=run, args=(p, ))
+        threads[p].daemon = True
+        threads[p].start()
+    deadline = time.monotonic() + timeout
+    for p in ports:
+        threads[p].join(max(0., deadline - time.monotonic()))
+    with lock:
+        for p in ports:
+            if p not in connected and p not in errors:
+                timed_out.add(p)
+                errors[p] = IOError(
+                    "Timed out connecting to %s after %s seconds" %
+                    (p, timeout))
+    for p in ports:
+        if not isinstance(errors.get(p), (IOError, type(None))):
+            if close is not None:
+                for r in connected.values():
+                    close(r)
+            raise errors[p]
+    return connected, errors
+
+
 class StatsMonitor(object):
     def __init__(self):
         self.reset()
@@ -132,3 +194,27 @@ class StatsMonitor(object):
     def __str__(self):
         return "%s[n=%i, mean=%.2g, min=%.2g, max=%.2g]" % (
             self.__class__.__name__, self.n, self.mean, self.min, self.max)
+
+
+class Histogram(StatsMonitor):
+    """StatsMonitor that also counts values in bins
+
+    counts[i] is the number of values v with edges[i - 1] <= v < edges[i]
+    (counts[0] is below the first edge and counts[-1] is >= the last)
+    """
+    def __init__(self, edges):
+        self.edges = list(edges)
+        super(Histogram, self).__init__()
+
+    def update(self, v):
+        self.counts[bisect.bisect_right(self.edges, v)] += 1
+        super(Histogram, self).update(v)
+
+    def reset(self):
+        self.counts = [0] * (len(self.edges) + 1)
+        super(Histogram, self).reset()
+
+    def as_dict(self):
+        return {
+            'n': self.n, 'mean': self.mean, 'min': self.min, 'max': self.max,
+            'edges': self.edges, 'counts': list(self.counts)}
@@ -0,0 +1,62 @@
+import numpy
+import pytest
+
+clock = pytest.importorskip('stompy.leg.clock')
+
+
+def simulate(n=2000, period=0.03, latency=0.002, jitter=0.005, seed=0):
+    """Returns (send times, receive times) of n reports"""
+    rng = numpy.random.default_rng(seed)
+    # device clock runs slightly fast
+    send = 100. + period * 1.0001 * numpy.arange(n)
+    return send, send + latency + rng.exponential(jitter, n)
+
+
+def test_corrects_jitter():
+    send, recv = simulate()
+    c = clock.ReportClock(latency=0.002)
+    errors = numpy.array([c.update(r) for r in recv]) - send
+    # corrected times are better than receive times once fit
+    assert numpy.max(numpy.abs(errors[100:])) < 0.002
+    assert numpy.mean(numpy.abs(recv[100:] - send[100:])) > 0.005
+    assert c.period == pytest.approx(0.03 * 1.0001, rel=1e-4)
+    assert c.dropped == 0
+
+
+def test_stall_is_not_a_drop():
+    send, recv = simulate()
+    # a stalled loop delivers a burst of late reports
+    recv[1000:1030] = recv[1030]
+    c = clock.ReportClock(latency=0.002)
+    errors = numpy.array([c.update(r) for r in recv]) - send
+    assert c.dropped == 0
+    assert numpy.max(numpy.abs(errors[100:])) < 0.002
+
+
+def test_detects_drops():
+    send, recv = simulate()
+    keep = numpy.ones(len(send), dtype=bool)
+    keep[1000:1003] = False
+    c = clock.ReportClock(latency=0.002)
+    errors = numpy.array([c.update(r) for r in recv[keep]]) - send[keep]
+    assert c.dropped == 3
+    # reports before the drop is detected are a period early
+    assert numpy.max(numpy.abs(errors[1000 + c.drop_check:])) < 0.002
+
+
+def test_reset():
+    send, recv = simulate(n=200)
+    c = clock.ReportClock()
+    for r in recv:
+        c.update(r)
+    c.reset()
+    assert c.period is None and c.offset is None and c.count == 0
+    # too few reports to fit, times are not corrected
+    assert c.update(200.) == 200.
+
+
+def test_measure_latency():
+    calls = []
+    latency = clock.measure_latency(lambda: calls.append(1), n=3)
+    assert len(calls) == 3
+    assert 0. <= latency < 0.01
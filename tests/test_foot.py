@@ -0,0 +1,108 @@
+import pytest
+
+consts = pytest.importorskip('stompy.consts')
+kleg = pytest.importorskip('stompy.kinematics.leg')
+log = pytest.importorskip('stompy.log')
+param = pytest.importorskip('stompy.param')
+plans = pytest.importorskip('stompy.leg.plans')
+rbody = pytest.importorskip('stompy.restriction.body')
+rleg = pytest.importorskip('stompy.restriction.leg')
+signaler = pytest.importorskip('stompy.signaler')
+
+
+class FakeLeg(signaler.Signaler):
+    def __init__(self, leg_number):
+        super(FakeLeg, self).__init__()
+        self.leg_number = leg_number
+        self.geometry = kleg.LegGeometry(leg_number)
+        self.plans = []
+
+    def send_plan(self, **kwargs):
+        self.plans.append(kwargs)
+
+    def move(self, hip, thigh, knee, calf=0., t=0.):
+        """Report the foot at joint angles with calf load"""
+        x, y, z = list(self.geometry.angles_to_points(hip, thigh, knee))[-1]
+        self.trigger('xyz', {'x': x, 'y': y, 'z': z, 'time': t})
+        self.trigger('angles', {
+            'hip': hip, 'thigh': thigh, 'knee': knee, 'calf': calf,
+            'time': t})
+
+
+def make_param():
+    p = param.Param()
+    p.set_param_from_dictionary('res', rbody.parameters)
+    p['min_hip_distance'] = 30.0
+    p['speed.foot'] = 5.0
+    p['speed.scalar'] = 1.0
+    p['speed.swing_scale'] = 2.0
+    p['speed.lift_scale'] = 1.2
+    p['speed.lower_scale'] = 1.2
+    return p
+
+
+@pytest.fixture
+def foot(tmp_path, monkeypatch):
+    monkeypatch.setattr(log, 'log_directory', str(tmp_path))
+    monkeypatch.setattr(consts, 'PLAN_TICK', 0.025)
+    leg = FakeLeg(1)
+    f = rleg.Foot(leg, make_param())
+    f.set_target(rbody.BodyTarget((0., 0.), 0.01, 0.))
+    return f
+
+
+def lift(foot, hip=0., thigh=0.6, knee=-1.2, dthigh=-0.15):
+    """Lift foot from loaded at angles until it starts to swing"""
+    leg = foot.leg
+    leg.move(hip, thigh, knee, calf=1000.)
+    foot.set_state('lift')
+    # unloaded at the starting height
+    leg.move(hip, thigh, knee, calf=100.)
+    assert foot.state == 'lift'
+    # lifted over lift_height
+    leg.move(hip, thigh + dthigh, knee, calf=100.)
+    assert foot.state == 'swing'
+
+
+def test_lift_to_swing_unreachable_target(foot):
+    g = foot.leg.geometry
+    lift(foot)
+    # target xy is picked at lower_height but z is at lift height
+    target = foot.calculate_swing_target()
+    assert not g.is_reachable(*target)
+    assert foot.swing_target is not None
+    assert g.is_reachable(*foot.swing_target)
+    plan = foot.leg.plans[-1]
+    assert plan['mode'] == consts.PLAN_TARGET_MODE
+    assert plan['linear'] == tuple(foot.swing_target)
+    # swinging continues until the foot reaches the (clamped) target
+    foot.leg.move(0., 0.45, -1.2)
+    assert foot.state == 'swing'
+    foot.leg.move(*g.point_to_angles(*foot.swing_target))
+    assert foot.state == 'lower'
+
+
+def test_swing_without_reachable_target(foot):
+    foot.clamp_swing_target = lambda target: None
+    lift(foot)
+    # stop where the foot was
+    assert foot.leg.plans[-1]['mode'] == consts.PLAN_STOP_MODE
+    xyz = foot.last_xyz
+    assert foot.swing_target == (xyz['x'], xyz['y'], xyz['z'])
+    # so swing finishes
+    foot.leg.move(0., 0.45, -1.2)
+    assert foot.state == 'lower'
+
+
+def test_predict_restriction_after_update(foot):
+    with pytest.raises(ValueError):
+        foot.predict_restriction(1.0)
+    foot.leg.move(0., 0.8, -1.2, calf=1000.)
+    # update clears xyz, prediction starts at the last foot position
+    assert foot.xyz is None
+    p = foot.predict_restriction(1.0)
+    assert len(p['time']) == 40
+    assert p['xyz'][0] == pytest.approx(plans.follow_plan(
+        [foot.last_xyz[k] for k in 'xyz'], foot.leg_target.stance_plan))
+    assert all(p['valid'])
+    assert p['r'][0] == pytest.approx(foot.restriction['nr'])
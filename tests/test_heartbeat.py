@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+consts = pytest.importorskip('stompy.consts')
+heartbeat = pytest.importorskip('stompy.heartbeat')
+
+
+class FakeDevice(object):
+    def __init__(self):
+        self.auto_heartbeat = True
+        self.n = 0
+
+    def send_heartbeat(self):
+        self.n += 1
+
+
+def test_stall_timeout():
+    s = heartbeat.HeartbeatService([FakeDevice()])
+    assert s.stall_timeout == consts.HEARTBEAT_TIMEOUT
+    with pytest.raises(ValueError):
+        heartbeat.HeartbeatService(
+            [], stall_timeout=consts.HEARTBEAT_TIMEOUT + 0.1)
+
+
+def test_stall():
+    ds = [FakeDevice(), FakeDevice()]
+    s = heartbeat.HeartbeatService(ds, period=0.5, stall_timeout=1.0)
+    s.feed(0.)
+    t = 0.
+    # slow main loop iterations (up to stall_timeout) keep heartbeats
+    for t in (0.5, 1.0):
+        s._round(t, t)
+    assert [d.n for d in ds] == [2, 2]
+    assert s.n_stalled == 0
+    # stalled main loop stops them
+    for t in (1.5, 2.0):
+        s._round(t, t)
+    assert [d.n for d in ds] == [2, 2]
+    assert s.n_stalled == 2
+    # until it is fed again
+    s.feed(2.1)
+    s._round(2.5, 2.5)
+    assert [d.n for d in ds] == [3, 3]
+    assert s.report()['sent'] == 6
+    assert s.report()['stalled'] == 2
+
+
+def test_jitter():
+    s = heartbeat.HeartbeatService([FakeDevice()], period=0.5)
+    s.feed(0.)
+    # on time
+    assert s._round(0.5, 0.5) == 1.0
+    # late, keeps the schedule
+    assert s._round(1.003, 1.0) == 1.5
+    # missed rounds are skipped
+    assert s._round(2.7, 1.5) == pytest.approx(3.2)
+    j = s.report()['jitter']
+    assert j['n'] == 3
+    # bins: < 0.001, < 0.005, ... >= 0.25
+    assert j['counts'] == [1, 1, 0, 0, 0, 0, 1]
+    assert j['max'] == pytest.approx(1.2)
+
+
+def test_thread():
+    d = FakeDevice()
+    s = heartbeat.HeartbeatService([d], period=0.01)
+    s.start()
+    assert not d.auto_heartbeat
+    deadline = time.monotonic() + 1.
+    while d.n < 5 and time.monotonic() < deadline:
+        s.feed()
+        time.sleep(0.01)
+    s.stop()
+    assert d.n >= 5
+    assert d.auto_heartbeat
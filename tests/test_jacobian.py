@@ -0,0 +1,57 @@
+import numpy
+import pytest
+
+kleg = pytest.importorskip('stompy.kinematics.leg')
+
+
+def random_angles(g, n=100, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return numpy.stack([
+        rng.uniform(j.min_angle, j.max_angle, n)
+        for j in (g.hip, g.thigh, g.knee)], axis=1)
+
+
+def foot(g, angles):
+    return numpy.array(list(g.angles_to_points(*angles))[-1])
+
+
+def test_jacobian_matches_finite_differences():
+    g = kleg.LegGeometry(1)
+    eps = 1e-6
+    for a in random_angles(g):
+        J = g.jacobian(*a)
+        for j in range(3):
+            da = numpy.zeros(3)
+            da[j] = eps
+            d = (foot(g, a + da) - foot(g, a - da)) / (2 * eps)
+            numpy.testing.assert_allclose(J[:, j], d, atol=1e-5)
+
+
+def test_joint_rates():
+    g = kleg.LegGeometry(1)
+    angles = random_angles(g)
+    v = numpy.array([1., -2., 0.5])
+    rates = g.joint_rates_array(angles, v)
+    J = g.jacobian_array(angles)
+    ok = ~numpy.isnan(rates[:, 0])
+    assert numpy.count_nonzero(ok) > 90
+    numpy.testing.assert_allclose(
+        numpy.einsum('nij,nj->ni', J[ok], rates[ok]),
+        numpy.broadcast_to(v, (numpy.count_nonzero(ok), 3)), atol=1e-9)
+    a = angles[numpy.argmax(ok)]
+    numpy.testing.assert_allclose(
+        g.joint_rates(*a, *v), rates[numpy.argmax(ok)], atol=1e-12)
+
+
+def test_cylinder_rates():
+    g = kleg.LegGeometry(1)
+    angles = random_angles(g)
+    v = numpy.array([1., -2., 0.5])
+    rates = g.joint_rates_array(angles, v)
+    crates = g.cylinder_rates_array(angles, v)
+    for (a, r, c) in zip(angles, rates, crates):
+        if numpy.isnan(r[0]):
+            continue
+        numpy.testing.assert_allclose(c, [
+            j.cylinder_rate(ja, jr) for (j, ja, jr) in zip(
+                (g.hip, g.thigh, g.knee), a, r)], atol=1e-9)
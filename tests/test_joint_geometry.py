@@ -0,0 +1,46 @@
+import numpy
+import pytest
+
+kleg = pytest.importorskip('stompy.kinematics.leg')
+
+
+def joints():
+    g = kleg.LegGeometry(1)
+    return [g.hip, g.thigh, g.knee]
+
+
+@pytest.mark.parametrize('joint', joints(), ids=lambda j: j.joint_type)
+def test_array_conversions(joint):
+    lengths = numpy.linspace(joint.cylinder_min, joint.cylinder_max, 50)
+    angles = joint.joint_angle_array(lengths)
+    numpy.testing.assert_allclose(
+        angles, [joint.joint_angle(c) for c in lengths], atol=1e-12)
+    numpy.testing.assert_allclose(
+        joint.to_cylinder_length_array(angles),
+        [joint.to_cylinder_length(a) for a in angles], atol=1e-12)
+    numpy.testing.assert_allclose(
+        joint.cylinder_rate_array(angles, 0.1),
+        [joint.cylinder_rate(a, 0.1) for a in angles], atol=1e-12)
+
+
+@pytest.mark.parametrize('joint', joints(), ids=lambda j: j.joint_type)
+def test_tables(joint):
+    # include lengths outside of the table (use the exact functions)
+    lengths = numpy.linspace(
+        joint.cylinder_min - 0.5, joint.cylinder_max + 0.5, 1000)
+    with numpy.errstate(invalid='ignore'):
+        exact = joint.joint_angle_array(lengths)
+    ok = ~numpy.isnan(exact)
+    angles = joint.table_joint_angle(lengths[ok])
+    assert joint.table_error < 1e-5
+    numpy.testing.assert_allclose(
+        angles, exact[ok], atol=joint.table_error + 1e-12)
+    # table lookups are inverses of each other
+    numpy.testing.assert_allclose(
+        joint.table_cylinder_length(angles), lengths[ok], atol=1e-9)
+
+
+def test_raw_angle_array_nan():
+    j = joints()[1]
+    a = j.raw_angle_array([j.triangle_a + j.triangle_b + 1.])
+    assert numpy.isnan(a[0])
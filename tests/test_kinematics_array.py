@@ -0,0 +1,60 @@
+import numpy
+import pytest
+
+kleg = pytest.importorskip('stompy.kinematics.leg')
+
+
+def random_angles(g, n=200, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return numpy.stack([
+        rng.uniform(j.min_angle, j.max_angle, n)
+        for j in (g.hip, g.thigh, g.knee)], axis=1)
+
+
+@pytest.mark.parametrize('leg_number', [1, 4])
+def test_angles_to_points_array(leg_number):
+    g = kleg.LegGeometry(leg_number)
+    angles = random_angles(g)
+    pts = g.angles_to_points_array(angles)
+    assert pts.shape == (len(angles), 3, 3)
+    for (a, p) in zip(angles, pts):
+        numpy.testing.assert_allclose(
+            p, list(g.angles_to_points(*a)), atol=1e-9)
+
+
+@pytest.mark.parametrize('leg_number', [1, 4])
+def test_points_to_angles_array(leg_number):
+    g = kleg.LegGeometry(leg_number)
+    angles = random_angles(g)
+    pts = g.angles_to_points_array(angles)[:, 2]
+    a, valid = g.points_to_angles_array(pts)
+    # point_to_angles doesn't work for feet behind the hip
+    front = numpy.hypot(pts[:, 0], pts[:, 1]) > g.hip.length
+    assert numpy.all(valid[front])
+    numpy.testing.assert_allclose(a[front], angles[front], atol=1e-6)
+    for (p, r, v) in zip(pts, a, valid):
+        if v:
+            numpy.testing.assert_allclose(
+                g.point_to_angles(*p), r, atol=1e-9)
+        else:
+            with pytest.raises(ValueError):
+                g.point_to_angles(*p)
+
+
+def test_points_to_angles_array_invalid():
+    g = kleg.LegGeometry(1)
+    reach = g.hip.length + g.thigh.length + g.knee.length
+    pts = [[reach + 10., 0., 0.], [100., 0., -20.]]
+    a, valid = g.points_to_angles_array(pts)
+    assert list(valid) == [False, True]
+    assert numpy.all(numpy.isnan(a[0]))
+    with pytest.raises(ValueError):
+        g.point_to_angles(*pts[0])
+
+
+def test_calf_angle_array():
+    g = kleg.LegGeometry(1)
+    angles = random_angles(g)
+    ca = g.angles_to_calf_angle_array(angles)
+    numpy.testing.assert_allclose(
+        ca, [g.angles_to_calf_angle(*a) for a in angles], atol=1e-9)
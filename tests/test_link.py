@@ -0,0 +1,80 @@
+import types
+
+import pytest
+
+consts = pytest.importorskip('stompy.consts')
+link = pytest.importorskip('stompy.leg.link')
+
+
+class FakeStream(object):
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.n_writes = 0
+
+    def counts(self):
+        return (self.bytes_in, self.bytes_out, self.n_writes)
+
+
+def test_report():
+    s = FakeStream()
+    stats = link.LinkStats(period=1.0)
+    stats._start = 10.
+    assert not stats.due(10.5)
+    assert stats.due(11.)
+    for _ in range(4):
+        stats.frame('xyz')
+    stats.frame('angles')
+    stats.decode(0.0002)
+    stats.decode(0.02)
+    stats.queue(3)
+    stats.error()
+    for t in (10., 10.5, 11.1):
+        stats.heartbeat(t)
+    s.bytes_in, s.bytes_out, s.n_writes = 400, 100, 5
+    r = stats.report(s, 2, t=12.)
+    assert r['period'] == 2.
+    assert (r['bytes_in'], r['bytes_out'], r['writes']) == (200., 50., 2.5)
+    assert r['frames'] == {'xyz': 2., 'angles': 0.5}
+    assert (r['errors'], r['dropped']) == (1, 2)
+    assert r['decode_time']['n'] == 2
+    assert r['decode_time']['counts'] == [0, 1, 0, 0, 0, 1, 0]
+    assert r['queue_depth']['counts'] == [0, 0, 1, 0, 0, 0, 0]
+    # intervals of 0.5 (on time) and 0.6 (late) seconds
+    assert r['heartbeat_interval']['n'] == 2
+    assert r['heartbeat_interval']['counts'] == [0, 1, 1, 0, 0, 0]
+    assert stats.last_report is r
+
+
+def test_report_resets_period():
+    s = FakeStream()
+    stats = link.LinkStats()
+    stats._start = 0.
+    stats.frame('xyz')
+    stats.error()
+    s.bytes_in = 100
+    stats.report(s, 3, t=1.)
+    s.bytes_in = 150
+    r = stats.report(s, 3, t=2.)
+    # counts are differences from the last report
+    assert r['bytes_in'] == 50.
+    assert r['dropped'] == 0
+    assert r['frames'] == {}
+    assert r['errors'] == 0
+    assert r['decode_time']['n'] == 0
+
+
+def test_link_report():
+    controller = pytest.importorskip('stompy.controller')
+    teensy = pytest.importorskip('stompy.leg.teensy')
+    stats = link.LinkStats()
+    stats._start = 0.
+    stats.report(FakeStream(), 0, t=1.)
+    legs = {
+        1: types.SimpleNamespace(link=stats),
+        2: types.SimpleNamespace(link=link.LinkStats()),
+    }
+    for leg in legs.values():
+        leg.link_report = lambda leg=leg: teensy.Teensy.link_report(leg)
+    r = controller.MultiLeg.link_report(types.SimpleNamespace(legs=legs))
+    assert r == {1: stats.last_report, 2: {}}
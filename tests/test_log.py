@@ -0,0 +1,138 @@
+import logging
+import os
+
+import numpy
+import pytest
+
+log = pytest.importorskip('stompy.log')
+
+
+def make_events(n=50):
+    evs = []
+    for i in range(n):
+        t = 1000. + i * 0.1
+        evs.append({'timestamp': t, 'xyz': {
+            'x': float(i), 'y': -1.5, 'z': 2.25, 'valid': i % 2 == 0}})
+        evs.append({'timestamp': t, 'pwm': {
+            'hip': i, 'adc': {'hip': 100 + i, 'knee': 200}}})
+        evs.append({'timestamp': t, 'count': i})
+        if i % 10 == 0:
+            evs.append({'timestamp': t, 'note': 'event %i' % i})
+    return evs
+
+
+def write_log(d, events, events_per_file=20, **kwargs):
+    w = log.Writer()
+    l = log.Logger(
+        str(d), events_per_file=events_per_file, writer=w, **kwargs)
+    for e in events:
+        l.log(dict(e), logging.INFO)
+    l._write_events()
+    w.stop()
+    assert w.n_errors == 0
+
+
+def sort_events(evs):
+    return sorted(evs, key=lambda e: (e['timestamp'], sorted(e.keys())))
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_round_trip(tmp_path, columnar):
+    evs = make_events()
+    write_log(tmp_path, evs, columnar=columnar)
+    assert sort_events(log.load_dir(str(tmp_path))) == sort_events(evs)
+
+
+def test_columns(tmp_path):
+    evs = make_events()
+    write_log(tmp_path, evs, columnar=True)
+    cs = log.load_columns(str(tmp_path))
+    assert sorted(cs) == ['count', 'pwm', 'xyz']
+    assert cs['xyz']['timestamp'].dtype == numpy.float64
+    assert cs['xyz']['x'].dtype == numpy.float32
+    assert cs['xyz']['valid'].dtype == numpy.bool_
+    assert cs['pwm']['adc.hip'].dtype == numpy.int64
+    numpy.testing.assert_array_equal(cs['count'][''], numpy.arange(50))
+    # non columnar events are pickled
+    assert [e['note'] for e in log.load_dir(str(tmp_path), columns=False)] \
+        == ['event %i' % i for i in range(0, 50, 10)]
+
+
+def test_dataset(tmp_path):
+    evs = make_events()
+    write_log(tmp_path, evs, columnar=True)
+    ds = log.Dataset(str(tmp_path))
+    assert ds.legs == [None]
+    t0, t1 = 1001., 1002.
+    expected = [
+        e for e in evs if 'xyz' in e and t0 <= e['timestamp'] <= t1]
+    assert list(ds.events(None, 'xyz', t0, t1)) == expected
+    assert ds.get_by_key(None, 'note') == [
+        e['note'] for e in evs if 'note' in e]
+    ts, xs = ds.array(None, 'xyz', 'x', t0, t1)
+    numpy.testing.assert_array_equal(
+        xs, [e['xyz']['x'] for e in expected])
+
+
+def test_index(tmp_path):
+    evs = make_events()
+    write_log(tmp_path, evs, events_per_file=40, columnar=True)
+    index = log.load_index(str(tmp_path))
+    fns = [
+        os.path.basename(fn) for fn in log.chunk_files(str(tmp_path))]
+    assert sorted(index) == sorted(fns)
+    assert sum([e['keys']['note'] for e in index.values()]) == 5
+    assert log.load_dir(str(tmp_path), keys=['note']) == [
+        e for e in evs if 'note' in e]
+
+    cindex = log.load_column_index(str(tmp_path))
+    assert sorted(cindex) == ['count', 'pwm', 'xyz']
+    batches = cindex['xyz']
+    # batches cover all rows in order
+    assert batches[0]['row0'] == 0
+    assert batches[-1]['row1'] == 50
+    for (a, b) in zip(batches[:-1], batches[1:]):
+        assert a['row1'] == b['row0']
+    ts = log.load_columns(str(tmp_path))['xyz']['timestamp']
+    for b in batches:
+        assert b['t0'] == ts[b['row0']]
+        assert b['t1'] == ts[b['row1'] - 1]
+    # only rows of overlapping batches are searched
+    ds = log.Dataset(str(tmp_path))
+    r0, r1 = ds._column_rows(None, 'xyz', 1001., 1002., 50)
+    assert 0 < r1 - r0 < 50
+    assert ds._column_slice(None, 'xyz', 1001., 1002.)['x'].tolist() == [
+        float(i) for i in range(10, 21)]
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'lzma'])
+def test_compression(tmp_path, compression):
+    if compression == 'lzma' and log.lzma is None:
+        pytest.skip('lzma is not available')
+    evs = make_events()
+    write_log(tmp_path, evs, compression=compression)
+    fns = log.chunk_files(str(tmp_path))
+    assert len(fns) > 1
+    assert all([
+        fn.endswith(log.chunk_suffixes[compression]) for fn in fns])
+    assert sort_events(log.load_dir(str(tmp_path))) == sort_events(evs)
+    assert list(log.Dataset(str(tmp_path)).events(None, 'note')) == [
+        e for e in evs if 'note' in e]
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        log.Logger(str(tmp_path), compression='zip')
+
+
+def test_dataset_time_range(tmp_path):
+    evs = make_events()
+    write_log(tmp_path, evs, events_per_file=20)
+    ts = [e['timestamp'] for e in evs]
+    assert len(log.chunk_files(str(tmp_path))) > 2
+    assert log.Dataset(str(tmp_path)).time_range == (min(ts), max(ts))
+    # without the index the first chunk is loaded
+    os.remove(os.path.join(str(tmp_path), 'index.jsonl'))
+    t0, t1 = log.Dataset(str(tmp_path)).time_range
+    assert t0 == min(ts)
+    assert t1 >= max(ts)
@@ -0,0 +1,79 @@
+import pytest
+
+consts = pytest.importorskip('stompy.consts')
+outbox = pytest.importorskip('stompy.leg.outbox')
+
+
+def velocity(x):
+    return [consts.PLAN_VELOCITY_MODE, consts.PLAN_LEG_FRAME, x, 0., 0., 1.]
+
+
+def stop():
+    return [consts.PLAN_STOP_MODE, consts.PLAN_LEG_FRAME, 0.]
+
+
+@pytest.fixture
+def box():
+    sent = []
+    o = outbox.PlanOutbox(
+        lambda packed, plan: sent.append((packed, plan)), window=0.02)
+    o.sent = sent
+    return o
+
+
+def test_drops_repeats(box):
+    assert box.submit(velocity(1.), t=0., plan='a')
+    assert not box.submit(velocity(1.), t=1.)
+    # same float32 bytes
+    assert not box.submit(velocity(1. + 1e-10), t=2.)
+    assert box.sent == [(velocity(1.), 'a')]
+    assert (box.n_sent, box.n_dropped) == (1, 2)
+
+
+def test_merges_bursts(box):
+    assert box.submit(velocity(1.), t=0., plan='a')
+    # within the window, held and replaced by newer plans
+    assert not box.submit(velocity(2.), t=0.005, plan='b')
+    assert not box.submit(velocity(3.), t=0.01, plan='c')
+    assert box.pending_plan == 'c'
+    assert not box.flush(t=0.015)
+    assert box.flush(t=0.02)
+    assert box.pending_plan is None
+    assert not box.flush(t=0.1)
+    assert box.sent == [(velocity(1.), 'a'), (velocity(3.), 'c')]
+    assert (box.n_sent, box.n_merged) == (2, 1)
+    # window starts at the last send
+    assert not box.submit(velocity(4.), t=0.03)
+    assert box.submit(velocity(5.), t=0.045)
+    assert box.n_merged == 2
+
+
+def test_held_plan_reverted(box):
+    box.submit(velocity(1.), t=0.)
+    box.submit(velocity(2.), t=0.005)
+    # back to the plan that was sent, nothing to send
+    assert not box.submit(velocity(1.), t=0.01)
+    assert box.pending_plan is None
+    assert not box.flush(t=1.)
+    assert len(box.sent) == 1
+
+
+def test_stop_is_sent_immediately(box):
+    box.submit(velocity(1.), t=0.)
+    box.submit(velocity(2.), t=0.005, plan='held')
+    assert box.submit(stop(), t=0.006, plan='stop')
+    assert box.pending_plan is None
+    assert box.sent[-1] == (stop(), 'stop')
+    assert not box.flush(t=1.)
+    # repeated stops are dropped
+    assert not box.submit(stop(), t=0.007)
+
+
+def test_reset(box):
+    box.submit(stop(), t=0.)
+    box.submit(velocity(1.), t=0.005)
+    # estop changed, the leg may have stopped on its own
+    box.reset()
+    assert box.pending_plan is None
+    assert box.submit(stop(), t=0.006)
+    assert [p for (p, _) in box.sent] == [stop(), stop()]
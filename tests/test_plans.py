@@ -0,0 +1,91 @@
+import numpy
+import pytest
+
+affine = pytest.importorskip('stompy.affine')
+consts = pytest.importorskip('stompy.consts')
+plans = pytest.importorskip('stompy.leg.plans')
+
+
+@pytest.fixture
+def tick(monkeypatch):
+    # set by Teensy (from the firmware) when a leg connects
+    monkeypatch.setattr(consts, 'PLAN_TICK', 0.025)
+    return consts.PLAN_TICK
+
+
+def step_matrix():
+    return affine.multiply(
+        affine.rotation_about_point_3d(80., 10., -40., 0.001, 0.002, 0.01),
+        affine.translation_3d(0.01, -0.02, 0.005))
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 7, 64, 1000])
+def test_matrix_power(n):
+    m = step_matrix()
+    r = numpy.identity(4)
+    for _ in range(n):
+        r = affine.multiply(m, r)
+    numpy.testing.assert_allclose(affine.matrix_power(m, n), r, atol=1e-9)
+
+
+@pytest.mark.parametrize('ticks', [1, 3, 40])
+def test_follow_matrix_plan(tick, ticks):
+    plan = plans.Plan(
+        consts.PLAN_MATRIX_MODE, consts.PLAN_LEG_FRAME, matrix=step_matrix())
+    xyz = [100., 5., -40.]
+    stepped = xyz
+    for _ in range(ticks):
+        stepped = plans.follow_plan(stepped, plan)
+    numpy.testing.assert_allclose(
+        plans.follow_plan(xyz, plan, tick * ticks), stepped, atol=1e-9)
+
+
+@pytest.mark.parametrize('n', [0, 1, 5, 33])
+def test_matrix_powers(n):
+    m = step_matrix()
+    ps = affine.matrix_powers(m, n)
+    assert ps.shape == (n, 4, 4)
+    for (i, p) in enumerate(ps):
+        numpy.testing.assert_allclose(
+            p, affine.matrix_power(m, i + 1), atol=1e-9)
+
+
+def leg_plans():
+    return [
+        None,
+        plans.stop(),
+        plans.Plan(
+            consts.PLAN_VELOCITY_MODE, consts.PLAN_LEG_FRAME,
+            linear=(1., -0.5, 0.2), speed=2.),
+        plans.Plan(
+            consts.PLAN_TARGET_MODE, consts.PLAN_LEG_FRAME,
+            linear=(110., 10., -45.), speed=12.),
+        plans.Plan(
+            consts.PLAN_ARC_MODE, consts.PLAN_LEG_FRAME,
+            linear=(60., -20., 0.), angular=(0., 0., 0.3), speed=0.5),
+        plans.Plan(
+            consts.PLAN_MATRIX_MODE, consts.PLAN_LEG_FRAME,
+            matrix=step_matrix()),
+    ]
+
+
+@pytest.mark.parametrize('plan', leg_plans())
+@pytest.mark.parametrize('ticks', [1, 2])
+def test_predict_path(tick, plan, ticks):
+    xyz = (100., 5., -40.)
+    dt = tick * ticks
+    times, pts = plans.predict_path(xyz, plan, 2.0, dt)
+    assert len(times) == len(pts) == int(round(2.0 / dt))
+    numpy.testing.assert_allclose(times, numpy.arange(1, len(times) + 1) * dt)
+    p = list(xyz)
+    for (t, pt) in zip(times, pts):
+        p = plans.follow_plan(p, plan, dt)
+        numpy.testing.assert_allclose(pt, p, atol=1e-6)
+
+
+def test_predict_path_frame(tick):
+    plan = plans.Plan(
+        consts.PLAN_VELOCITY_MODE, consts.PLAN_BODY_FRAME,
+        linear=(1., 0., 0.), speed=1.)
+    with pytest.raises(ValueError):
+        plans.predict_path((100., 0., -40.), plan, 1.0)
@@ -0,0 +1,103 @@
+import types
+
+import numpy
+import pytest
+
+kleg = pytest.importorskip('stompy.kinematics.leg')
+rleg = pytest.importorskip('stompy.restriction.leg')
+
+
+def scalar_reachable(g, x, y, z):
+    try:
+        angles = g.point_to_angles(x, y, z)
+    except ValueError:
+        return False
+    for (a, j) in zip(angles, (g.hip, g.thigh, g.knee)):
+        if not min(j.min_angle, j.max_angle) <= a <= max(
+                j.min_angle, j.max_angle):
+            return False
+    return True
+
+
+def random_points(n=2000, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return numpy.stack([
+        rng.uniform(5., 140., n),
+        rng.uniform(-100., 100., n),
+        rng.uniform(-90., 60., n)], axis=1)
+
+
+@pytest.mark.parametrize('leg_number', [1, 4])
+def test_is_reachable(leg_number):
+    g = kleg.LegGeometry(leg_number)
+    for p in random_points():
+        assert g.is_reachable(*p) == scalar_reachable(g, *p), p
+
+
+def boundary_angles(g, offset, n=160, seed=0):
+    """Angles offset (radians, > 0 is inside) from a random joint limit"""
+    rng = numpy.random.default_rng(seed)
+    joints = (g.hip, g.thigh, g.knee)
+    angles = []
+    for i in range(n):
+        a = [
+            rng.uniform(
+                min(j.min_angle, j.max_angle) + 0.1,
+                max(j.min_angle, j.max_angle) - 0.1)
+            for j in joints]
+        ji = rng.integers(3)
+        j = joints[ji]
+        lo, hi = min(j.min_angle, j.max_angle), max(j.min_angle, j.max_angle)
+        if rng.integers(2):
+            a[ji] = lo + offset
+        else:
+            a[ji] = hi - offset
+        angles.append(a)
+    return angles
+
+
+@pytest.mark.parametrize('leg_number', [1, 4])
+def test_is_reachable_near_limits(leg_number):
+    g = kleg.LegGeometry(leg_number)
+    n_outside = 0
+    for offset in (0.005, 0.01, 0.02):
+        for a in boundary_angles(g, offset):
+            p = list(g.angles_to_points(*a))[-1]
+            if numpy.hypot(p[0], p[1]) <= g.hip.length:
+                # point_to_angles doesn't work for feet behind the hip
+                continue
+            assert g.is_reachable(*p), (a, g.distance_to_limit(*p))
+        for a in boundary_angles(g, -offset):
+            p = list(g.angles_to_points(*a))[-1]
+            if numpy.hypot(p[0], p[1]) <= g.hip.length:
+                continue
+            assert not g.is_reachable(*p), (a, g.distance_to_limit(*p))
+            n_outside += 1
+    assert n_outside > 300
+
+
+def make_foot(g, xyz, center):
+    return types.SimpleNamespace(
+        leg=types.SimpleNamespace(geometry=g),
+        last_xyz=None if xyz is None else dict(zip('xyz', xyz)),
+        calculate_center_position=lambda: center)
+
+
+def test_clamp_swing_target():
+    g = kleg.LegGeometry(1)
+    foot = list(g.angles_to_points(0., 0.5, -1.))[-1]
+    center = list(g.angles_to_points(0., 0.7, -1.2))[-1]
+    clamp = rleg.Foot.clamp_swing_target
+    f = make_foot(g, foot, center)
+    assert clamp(f, foot) == foot
+    target = (foot[0] + 200., foot[1], foot[2])
+    t = clamp(f, target)
+    assert g.is_reachable(*t)
+    assert t[0] > foot[0]
+    # clamp toward the center without a (reachable) foot position
+    for xyz in (None, target):
+        t = clamp(make_foot(g, xyz, center), target)
+        assert g.is_reachable(*t)
+        assert t[0] > center[0]
+    # or give up
+    assert clamp(make_foot(g, None, target), target) is None
@@ -0,0 +1,134 @@
+import threading
+import types
+
+import numpy
+import pytest
+
+sync = pytest.importorskip('stompy.leg.sync')
+
+
+class FakeSerial(object):
+    def __init__(self):
+        self.writes = []
+
+    def write(self, bs):
+        self.writes.append(bytes(bs))
+        return len(bs)
+
+
+class FakeTeensy(object):
+    """Fake leg: applies commands (float32 values) and replies to queries
+
+    Commands are written to the stream as 8 + 4 * len(args) byte messages
+    """
+    def __init__(self):
+        self._serial = FakeSerial()
+        self._stream = sync.BatchedStream(self._serial)
+        self._io_lock = threading.RLock()
+        # replies are handled by the (fake) reader thread
+        self._reader = object()
+        self.cmd = types.SimpleNamespace(callbacks={})
+        self.mgr = self
+        self.log = types.SimpleNamespace(
+            debug=lambda e: None, error=lambda e: self.errors.append(e))
+        self.errors = []
+        self.values = {}
+        self.sent = []
+        # {name: function(args) -> args set} for commands that don't stick
+        self.modify = {}
+
+    def on(self, name, callback):
+        self.cmd.callbacks[name] = callback
+
+    def trigger(self, name, *args):
+        self._stream.write(b'x' * (8 + 4 * len(args)))
+        nkey = 1 if name in sync.joint_commands else 0
+        if name in sync.readable_commands and len(args) == nkey:
+            v = self.values.get(sync.setting_key(name, args))
+            if v is not None:
+                self.cmd.callbacks[name](
+                    *[types.SimpleNamespace(value=a) for a in v])
+            return
+        self.sent.append((name, args))
+        if name in self.modify:
+            args = self.modify[name](args)
+        self.values[sync.setting_key(name, args)] = tuple(
+            numpy.float32(args).tolist())
+
+
+def test_same_values():
+    assert sync.same_values((0.1, 2), (float(numpy.float32(0.1)), 2))
+    assert not sync.same_values((1.0, ), (1.001, ))
+    assert not sync.same_values(None, (1.0, ))
+    assert not sync.same_values((1.0, ), (1.0, 2.0))
+
+
+def test_batch_packing():
+    s = FakeSerial()
+    bs = sync.BatchedStream(s)
+    bs.write(b'a' * 10)
+    with bs.batch():
+        for _ in range(7):
+            bs.write(b'b' * 20)
+        with bs.batch():
+            bs.write(b'c' * 70)
+        bs.write(b'd' * 4)
+        assert len(s.writes) == 1
+    # messages are not split across (64 byte) packets
+    assert [len(w) for w in s.writes] == [10, 60, 60, 20, 70, 4]
+    assert bs.counts() == (0, 224, 6)
+
+
+def test_diff_repeated_keys():
+    c = sync.ConfigSync(FakeTeensy())
+    desired, changed = c.diff([
+        ('pid_config', (0, 1., 2.)),
+        ('dither', (5, )),
+        ('pid_config', (0, 3., 4.)),
+        ('pid_config', (1, 3., 4.)),
+    ])
+    assert changed == [
+        ('pid_config', 0), ('dither', ), ('pid_config', 1)]
+    assert desired[('pid_config', 0)] == ('pid_config', (0, 3., 4.))
+    c.known[('pid_config', 0)] = (0, 3., 4.)
+    _, changed = c.diff([('pid_config', (0, 3., 4.))])
+    assert changed == []
+
+
+def test_sync():
+    leg = FakeTeensy()
+    leg.values[('pid_config', 0)] = (0, 1., 2.)
+    leg.values[('pid_config', 1)] = (1, 0., 0.)
+    c = sync.ConfigSync(leg)
+    settings = [
+        ('pid_config', (0, 1., 2.)),
+        ('pid_config', (1, 0.1, 0.2)),
+        ('set_geometry', (0, 1, 10.5)),
+    ]
+    assert c.sync(settings) == {}
+    # known values (read back) are not resent
+    assert leg.sent == [
+        ('pid_config', (1, 0.1, 0.2)), ('set_geometry', (0, 1, 10.5))]
+    # one write each to read known values, send settings and verify
+    assert [len(w) for w in leg._serial.writes] == [24, 40, 12]
+    # nothing changed
+    assert c.sync(settings) == {}
+    assert len(leg.sent) == 2
+    c.sync([('set_geometry', (0, 1, 11.))])
+    assert leg.sent[-1] == ('set_geometry', (0, 1, 11.))
+
+
+def test_failed_verify_is_resent():
+    leg = FakeTeensy()
+    leg.values[('dither', )] = (0, )
+    c = sync.ConfigSync(leg)
+    leg.modify['dither'] = lambda args: (1, )
+    failed = c.sync([('dither', (5, ))])
+    assert failed == {('dither', ): ((5, ), (1, ))}
+    assert len(leg.errors) == 1
+    assert c.known[('dither', )] == (1, )
+    # sent again on the next sync
+    del leg.modify['dither']
+    assert c.sync([('dither', (5, ))]) == {}
+    assert leg.sent == [('dither', (5, )), ('dither', (5, ))]
+    assert c.known[('dither', )] == (5, )
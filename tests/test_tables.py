@@ -0,0 +1,55 @@
+import math
+
+import numpy
+import pytest
+
+kleg = pytest.importorskip('stompy.kinematics.leg')
+tables = pytest.importorskip('stompy.kinematics.tables')
+
+
+def sample_z(g, n=500):
+    return numpy.linspace(g.z_min - 1., g.z_max + 1., n)
+
+
+def assert_close(a, b, tol):
+    if a is None or b is None or None in a or None in b:
+        assert a == b
+    else:
+        numpy.testing.assert_allclose(a, b, atol=tol)
+
+
+def test_limits_at_z_2d():
+    g = kleg.LegGeometry(1, build_tables=True)
+    assert g.tables.limits.error <= 0.01
+    for z in sample_z(g):
+        assert_close(g.limits_at_z_2d(z), g._limits_at_z_2d(z), 0.01)
+
+
+def test_calf_tables():
+    g = kleg.LegGeometry(1, build_tables=True)
+    t = tables.CalfTables(g)
+    assert t.limits is g.tables.limits
+    tca = math.radians(0.)
+    mca = math.radians(30.)
+    for z in numpy.linspace(-60., -20., 200):
+        assert_close(
+            t.center_limits_at_z(z, tca, mca),
+            g._center_limits_at_z(z, tca, mca), 0.01)
+        numpy.testing.assert_allclose(
+            g.xy_center_at_z(z, tca, mca, tables=t),
+            g.xy_center_at_z(z, tca, mca), atol=0.01)
+        try:
+            x = g._x_with_calf_angle(z, mca)
+        except ValueError:
+            continue
+        assert abs(g.x_with_calf_angle(z, mca, tables=t) - x) <= 0.01
+
+
+def test_calf_tables_clear():
+    g = kleg.LegGeometry(1, build_tables=True)
+    t = tables.CalfTables(g)
+    t.x_with_calf_angle(-40., 0.5)
+    assert len(t._calf_tables) == 1
+    t.clear()
+    assert len(t._calf_tables) == 0
+